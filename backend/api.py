@@ -10,16 +10,56 @@ if sys.platform == "win32":
 
 import asyncio
 import json
+import time
+from contextlib import asynccontextmanager
+from typing import List, Optional
 
-from app.agent.manus import Manus
 from app.config import config
-from app.logger import logger
-from fastapi import FastAPI, HTTPException, WebSocket
+from app.metrics import REGISTRY, monitor_event_loop_lag
+from app.sandbox.client import SANDBOX_CLIENT
+from app.sandbox.core.docker_client import close_docker_client
+from app.server import (
+    BatchJob,
+    BatchManager,
+    OutputChannel,
+    RunManager,
+    RunScheduler,
+    SQLiteRunStore,
+    WorkspaceIndex,
+    install_output_capture,
+)
+from app.server.files import file_etag, http_date, not_modified
+from app.server.runs import DEFAULT_RUN_DIR
+from app.tool.python_execute import get_worker_pool
+from fastapi import Body, FastAPI, HTTPException, Query, Request, Response, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-
-
-app = FastAPI()
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Route logs and prints to the websocket of the session producing them
+    install_output_capture()
+    lag_monitor = asyncio.create_task(monitor_event_loop_lag())
+    await runs.fail_orphaned()
+    run_store.delete_expired(time.time() - config.server_config.run_retention)
+    # Pre-start sandbox containers so the first file operation of a run is fast
+    if config.sandbox and config.sandbox.use_sandbox:
+        await SANDBOX_CLIENT.warm_pool(config.sandbox)
+    # Start Python workers in the background so the first python_execute is fast
+    await get_worker_pool().warm()
+    yield
+    lag_monitor.cancel()
+    await batches.shutdown()
+    await runs.shutdown()
+    if SANDBOX_CLIENT.manager:
+        await SANDBOX_CLIENT.manager.cleanup()
+    close_docker_client()
+    get_worker_pool().close()
+    run_store.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware to allow requests from frontend
 app.add_middleware(
@@ -30,170 +70,355 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Admission control shared by all runs
+scheduler = RunScheduler(
+    max_concurrent_runs=config.server_config.max_concurrent_runs,
+    max_queue_size=config.server_config.max_queue_size,
+    max_queued_per_client=config.server_config.max_queued_per_client,
+)
 
-# ---- Capture print/stdout -----
-class StdoutInterceptor:
-    def __init__(self, queue: asyncio.Queue):
-        self.queue = queue
-        self._orig_stdout = sys.stdout
-
-    def write(self, data):
-        text = data.strip()
-        if text:
-            try:
-                self.queue.put_nowait(text)
-            except:
-                pass
-        self._orig_stdout.write(data)
-
-    def flush(self):
-        try:
-            self._orig_stdout.flush()
-        except:
-            pass
-
-
-@app.websocket("/generate")
-async def websocket_generate(ws: WebSocket):
-    await ws.accept()
-
-    # Queue for incoming messages from the client
-    input_queue: asyncio.Queue[str] = asyncio.Queue()
-
-    # Background task to receive messages
-    async def receive_loop():
-        try:
-            while True:
-                data = await ws.receive_text()
-                await input_queue.put(data)
-        except:
-            pass  # Connection closed or error
+# Listing of the workspace, rebuilt only when its contents change
+workspace_index = WorkspaceIndex(config.workspace_root)
+SANDBOX_CLIENT.add_sync_listener(lambda result: workspace_index.invalidate())
 
-    receiver_task = asyncio.create_task(receive_loop())
+# Run state shared with the other workers, so any of them can answer queries
+run_store = SQLiteRunStore(
+    config.server_config.run_store_path or str(DEFAULT_RUN_DIR / "runs.sqlite3")
+)
 
-    try:
-        # Wait for the initial prompt
-        try:
-            prompt = await input_queue.get()
-            prompt = prompt.strip()
-        except:
-            return
+# Runs outlive the websocket connections that started them
+runs = RunManager(
+    scheduler,
+    spill_dir=config.server_config.run_spill_dir,
+    max_memory_events=config.server_config.event_log_memory_events,
+    retention=config.server_config.run_retention,
+    token_flush_interval=config.server_config.token_flush_interval,
+    store=run_store,
+    workspace=workspace_index,
+    cancel_grace=config.server_config.cancel_grace_seconds,
+)
 
-        if not prompt:
-            await ws.send_text("⚠ Empty prompt provided.")
-            return
+# Batches of prompts run as background jobs under the same scheduler
+batches = BatchManager(
+    runs,
+    parallelism=config.server_config.batch_parallelism,
+    max_jobs=config.server_config.max_batch_jobs,
+)
 
-        agent = Manus()
+ACTIVE_SESSIONS = REGISTRY.gauge(
+    "openmanus_websocket_sessions", "Open /generate websocket connections"
+)
+ACTIVE_SESSIONS.set(0)
+RUN_SLOTS = REGISTRY.gauge("openmanus_runs_active", "Runs holding an execution slot")
+RUN_QUEUE_DEPTH = REGISTRY.gauge(
+    "openmanus_runs_queued", "Runs waiting for an execution slot"
+)
+RUN_QUEUE_WAIT_MAX = REGISTRY.gauge(
+    "openmanus_run_queue_wait_max_seconds", "Longest queue wait of a run"
+)
+RUNS_BY_STATUS = REGISTRY.gauge(
+    "openmanus_runs", "Known runs by status", labels=("status",)
+)
 
-        # Define the callback for user input
-        async def ask_user(question: str) -> str:
-            # Send the question to the frontend
-            # We send a JSON object to distinguish it from normal logs
-            logger.info(f"📨 Asking user: {question}")
-            msg = json.dumps({"type": "input_request", "content": question})
-            await ws.send_text(msg)
-            logger.debug(f"📤 Sent input request to frontend")
 
-            # Wait for the user's response
-            response = await input_queue.get()
-            logger.info(f"📬 Received user response: {response}")
+def collect_run_metrics():
+    """Updates run scheduling gauges before metrics are rendered."""
+    stats = scheduler.get_stats()
+    RUN_SLOTS.set(stats["active_runs"])
+    RUN_QUEUE_DEPTH.set(stats["queued_runs"])
+    RUN_QUEUE_WAIT_MAX.set(stats["queue_wait_seconds_max"])
+    for status, count in runs.get_stats()["runs_by_status"].items():
+        RUNS_BY_STATUS.set(count, status=status)
 
-            # Try to parse as JSON if the frontend sends structured data
-            try:
-                data = json.loads(response)
-                if isinstance(data, dict) and data.get("type") == "user_input":
-                    logger.debug(f"📝 Parsed structured response")
-                    return data.get("content", "")
-            except:
-                pass
 
-            return response
+REGISTRY.add_collector(collect_run_metrics)
 
-        # Register the callback
-        agent.set_input_callback(ask_user)
 
-        # Async queue for both logs + prints
-        log_queue: asyncio.Queue[str] = asyncio.Queue()
+def message_type(data: str) -> Optional[str]:
+    """Return the type of a JSON control message, or None for plain text."""
+    if not data.startswith("{"):
+        return None
+    try:
+        message = json.loads(data)
+    except json.JSONDecodeError:
+        return None
+    return message.get("type") if isinstance(message, dict) else None
 
-        # ---- Intercept Loguru logs ----
-        def loguru_sink(message):
-            text = message.strip()
-            if text:
-                try:
-                    log_queue.put_nowait(text)
-                except:
-                    pass
 
-        sink_id = logger.add(loguru_sink, format="{level} - {message}")
+@app.websocket("/generate")
+async def websocket_generate(ws: WebSocket):
+    """Start a run, or resume following one, and stream its events.
+
+    The first message is either a plain-text prompt (legacy text protocol) or
+    a JSON object: ``{"type": "start", "prompt": ...}`` to start a run, with
+    an optional ``"session_id"`` whose sandbox the run continues in, or
+    ``{"type": "resume", "run_id": ..., "last_offset": ...}`` to reconnect to
+    a run and receive only the events after ``last_offset``. JSON clients
+    receive offset-tagged JSON frames, including ``token`` frames carrying the
+    LLM's text as it is generated. The run keeps going if the connection
+    drops; later messages are forwarded to the run as answers to its questions,
+    except ``{"type": "cancel"}``, which cancels the run.
+    """
+    await ws.accept()
+    ACTIVE_SESSIONS.inc()
 
-        # ---- Intercept print() output ----
-        interceptor = StdoutInterceptor(log_queue)
-        original_stdout = sys.stdout
-        sys.stdout = interceptor  # redirect stdout
+    try:
+        # Wait for the initial message
+        try:
+            first = (await ws.receive_text()).strip()
+        except:
+            return
 
-        # ---- Task to forward logs + prints to WebSocket ----
-        async def forward():
+        request = {"type": "start", "prompt": first}
+        structured = False
+        if first.startswith("{"):
+            try:
+                message = json.loads(first)
+            except json.JSONDecodeError:
+                message = None
+            if isinstance(message, dict) and message.get("type") in ("start", "resume"):
+                request, structured = message, True
+
+        if request.get("type") == "resume":
+            run_id = str(request.get("run_id", ""))
+            run = runs.get(run_id)
+            if not run:
+                # Runs are pinned to their worker; others can only replay over HTTP
+                info = await runs.describe(run_id)
+                error = {"type": "error", "content": "Unknown or expired run"}
+                if info:
+                    error["content"] = "Run belongs to another worker"
+                    error["worker_id"] = info["worker_id"]
+                await ws.send_text(json.dumps(error))
+                return
+            try:
+                offset = max(0, int(request.get("last_offset", -1)) + 1)
+            except (TypeError, ValueError):
+                error = {"type": "error", "content": "Invalid last_offset"}
+                await ws.send_text(json.dumps(error))
+                return
+        else:
+            prompt = str(request.get("prompt") or "").strip()
+            if not prompt:
+                await ws.send_text("⚠ Empty prompt provided.")
+                return
+
+            client_id = ws.query_params.get("client_id") or (
+                ws.client.host if ws.client else "anonymous"
+            )
+            # Only an explicit session continues in an earlier run's sandbox;
+            # the client address may be shared by several users
+            session_id = request.get("session_id") or ws.query_params.get("session_id")
+            run = runs.start(
+                prompt, client_id, session_id=str(session_id) if session_id else None
+            )
+            offset = 0
+
+        if structured:
+            await ws.send_text(json.dumps({"type": "run", **run.to_dict()}))
+
+        channel = OutputChannel(
+            ws,
+            run.events,
+            offset=offset,
+            structured=structured,
+            max_lag=config.server_config.output_queue_size,
+            flush_interval=config.server_config.output_flush_interval,
+            max_frame_bytes=config.server_config.output_max_frame_bytes,
+        )
+
+        # Forward further messages to the run as answers to its questions
+        async def receive_loop():
             try:
                 while True:
-                    msg = await log_queue.get()
-                    await ws.send_text(msg)
+                    data = await ws.receive_text()
+                    if message_type(data) == "cancel":
+                        runs.cancel(run.run_id)
+                        continue
+                    await run.input_queue.put(data)
             except:
-                pass
+                pass  # Connection closed or error
 
-        forward_task = asyncio.create_task(forward())
-
-        # ---- Run the agent ----
+        forward_task = asyncio.create_task(channel.run())
+        receiver_task = asyncio.create_task(receive_loop())
         try:
-            logger.info("🚀 Starting Manus agent...")
-            await agent.run(prompt)  # All prints and logs captured!
-            logger.info("🎉 Request finished!")
-            await ws.send_text("DONE")
-
-        except Exception as e:
-            logger.exception("❌ Manus error occurred.")
-            await ws.send_text(f"❌ Error: {e}")
-
+            await asyncio.wait(
+                {forward_task, receiver_task}, return_when=asyncio.FIRST_COMPLETED
+            )
         finally:
-            try:
-                await agent.cleanup()
-            except:
-                pass
-
-            # restore stdout
-            sys.stdout = original_stdout
-
-            logger.remove(sink_id)
-            forward_task.cancel()
-            try:
-                await forward_task
-            except:
-                pass
+            # The run itself continues; only this connection ends
+            for task in (forward_task, receiver_task):
+                task.cancel()
+            await asyncio.gather(forward_task, receiver_task, return_exceptions=True)
 
     finally:
-        receiver_task.cancel()
+        ACTIVE_SESSIONS.dec()
         try:
-            await receiver_task
+            await ws.close()
         except:
             pass
-        await ws.close()
 
 
 @app.get("/files")
-async def list_files():
-    """List all files in the workspace directory."""
-    files = []
-    workspace = config.workspace_root
-    if workspace.exists():
-        for file in workspace.iterdir():
-            if file.is_file() and not file.name.startswith("."):
-                files.append(file.name)
-    return {"files": sorted(files)}
+async def list_files(
+    offset: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=10000),
+    pattern: str = "",
+):
+    """List files in the workspace directory, a page at a time.
+
+    ``pattern`` is an optional case-insensitive glob such as ``*.pptx``.
+    """
+    total, entries = workspace_index.list(offset, limit, pattern or None)
+    return {
+        "files": [entry["name"] for entry in entries],
+        "entries": entries,
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+    }
+
+
+@app.get("/archive")
+async def download_archive(names: List[str] = Query(...)):
+    """Stream a zip archive of several workspace files."""
+    missing = [name for name in names if workspace_index.stat(name) is None]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Files not found: {missing}")
+    return StreamingResponse(
+        workspace_index.iter_zip(names),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="workspace.zip"'},
+    )
 
 
 @app.get("/files/{filename}")
-async def get_file(filename: str):
-    """Read and return the content of a specific file."""
-    file_path = config.workspace_root / filename
-    if not file_path.exists() or not file_path.is_file():
+async def get_file(filename: str, request: Request):
+    """Return the content of a specific file.
+
+    Responses carry ``ETag`` and ``Last-Modified`` so clients can revalidate
+    with a 304, and byte ranges can be requested for large files.
+    """
+    st = workspace_index.stat(filename)
+    if st is None:
         raise HTTPException(status_code=404, detail="File not found")
-    return FileResponse(file_path)
+
+    headers = {
+        "ETag": file_etag(st),
+        "Last-Modified": http_date(st.st_mtime),
+        "Cache-Control": "no-cache",
+    }
+    if not_modified(request.headers, headers["ETag"], st.st_mtime):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(
+        config.workspace_root / filename, headers=headers, stat_result=st
+    )
+
+
+@app.get("/runs/{run_id}")
+async def get_run(run_id: str, wait: float = Query(0, ge=0, le=60)):
+    """Return the status of a run, waiting up to `wait` seconds for it to finish."""
+    await runs.wait(run_id, wait)
+    info = await runs.describe(run_id)
+    if not info:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return info
+
+
+@app.get("/runs/{run_id}/events")
+async def get_run_events(run_id: str, offset: int = 0, limit: int = 1000):
+    """Replay the events of a run starting at an offset."""
+    replay = await runs.replay(run_id, offset, max(1, min(limit, 10000)))
+    if replay is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    events, complete = replay
+    return {
+        "run_id": run_id,
+        "offset": offset,
+        "events": events,
+        "next_offset": offset + len(events),
+        "complete": complete,
+    }
+
+
+@app.post("/runs/{run_id}/cancel")
+async def cancel_run(run_id: str):
+    """Cancel a run executing on this worker."""
+    if runs.cancel(run_id):
+        return {"run_id": run_id, "cancelling": True}
+    info = await runs.describe(run_id)
+    if not info:
+        raise HTTPException(status_code=404, detail="Run not found")
+    if info["finished_at"] is None and not runs.get(run_id):
+        raise HTTPException(
+            status_code=409,
+            detail=f"Run belongs to worker {info['worker_id']}",
+        )
+    return {"run_id": run_id, "cancelling": False}
+
+
+@app.get("/runs/{run_id}/artifacts")
+async def get_run_artifacts(run_id: str):
+    """List the workspace files a run created or modified."""
+    artifacts = await runs.list_artifacts(run_id)
+    if artifacts is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return {"run_id": run_id, "artifacts": artifacts}
+
+
+@app.post("/batches", status_code=202)
+async def submit_batch(jobs: List[BatchJob] = Body(..., embed=True)):
+    """Submit prompts to run in the background as a batch of jobs."""
+    try:
+        batch = batches.submit(jobs)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return batch.to_dict()
+
+
+@app.get("/batches/{batch_id}")
+async def get_batch(batch_id: str, wait: float = Query(0, ge=0, le=60)):
+    """Return a batch's progress, waiting up to `wait` seconds for a change."""
+    batch = batches.get(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    await batch.wait(wait)
+    return batch.to_dict()
+
+
+@app.get("/batches/{batch_id}/jobs/{job_id}")
+async def get_batch_job(
+    batch_id: str, job_id: str, wait: float = Query(0, ge=0, le=60)
+):
+    """Return a job's status, result and artifacts, waiting up to `wait` seconds."""
+    batch = batches.get(batch_id)
+    if not batch or job_id not in batch.jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+    await runs.wait(job_id, wait)
+    return {"batch_id": batch_id, **batch.job_info(job_id)}
+
+
+@app.post("/batches/{batch_id}/cancel")
+async def cancel_batch(batch_id: str):
+    """Cancel the unfinished jobs of a batch."""
+    if not batches.get(batch_id):
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return {"batch_id": batch_id, "cancelling": batches.cancel(batch_id)}
+
+
+@app.get("/stats")
+async def get_stats():
+    """Return run scheduling statistics."""
+    return {
+        "scheduler": scheduler.get_stats(),
+        "runs": runs.get_stats(),
+        "batches": batches.get_stats(),
+    }
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Return metrics in the Prometheus text format."""
+    return PlainTextResponse(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
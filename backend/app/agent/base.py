@@ -2,6 +2,8 @@ from abc import ABC, abstractmethod
 from contextlib import asynccontextmanager
 from typing import List, Optional
 
+from app.cancellation import current_token
+from app.config import config
 from app.llm import LLM
 from app.logger import logger
 from app.sandbox.client import SANDBOX_CLIENT
@@ -123,6 +125,8 @@ class BaseAgent(BaseModel, ABC):
 
         Raises:
             RuntimeError: If the agent is not in IDLE state at start.
+            RunCancelled: If the run is cancelled; checked between steps and
+                raised from in-flight LLM requests and tool executions.
         """
         if self.state != AgentState.IDLE:
             raise RuntimeError(f"Cannot run agent from state: {self.state}")
@@ -131,27 +135,50 @@ class BaseAgent(BaseModel, ABC):
             self.update_memory("user", request)
 
         results: List[str] = []
-        async with self.state_context(AgentState.RUNNING):
-            while (
-                self.current_step < self.max_steps and self.state != AgentState.FINISHED
-            ):
-                self.current_step += 1
-                logger.info(f"Executing step {self.current_step}/{self.max_steps}")
-                step_result = await self.step()
-
-                # Check for stuck state
-                if self.is_stuck():
-                    self.handle_stuck_state()
-
-                results.append(f"Step {self.current_step}: {step_result}")
-
-            if self.current_step >= self.max_steps:
-                self.current_step = 0
-                self.state = AgentState.IDLE
-                results.append(f"Terminated: Reached max steps ({self.max_steps})")
-        await SANDBOX_CLIENT.cleanup()
+        cancellation = current_token()
+        try:
+            async with self.state_context(AgentState.RUNNING):
+                while (
+                    self.current_step < self.max_steps
+                    and self.state != AgentState.FINISHED
+                ):
+                    if cancellation:
+                        cancellation.raise_if_cancelled()
+                    self.current_step += 1
+                    logger.info(f"Executing step {self.current_step}/{self.max_steps}")
+                    step_result = await self.step()
+                    await self.sync_workspace()
+
+                    # Check for stuck state
+                    if self.is_stuck():
+                        self.handle_stuck_state()
+
+                    results.append(f"Step {self.current_step}: {step_result}")
+
+                if self.current_step >= self.max_steps:
+                    self.current_step = 0
+                    self.state = AgentState.IDLE
+                    results.append(f"Terminated: Reached max steps ({self.max_steps})")
+        finally:
+            # Release the sandbox even if the run failed or was cancelled; a
+            # session keeps it for its next run
+            await self.sync_workspace()
+            await SANDBOX_CLIENT.release()
         return "\n".join(results) if results else "No steps executed"
 
+    async def sync_workspace(self) -> None:
+        """Syncs files changed in the workspace or the sandbox to the other side.
+
+        Does nothing unless enabled by the ``sync_workspace`` sandbox
+        setting; failures are logged and do not stop the run.
+        """
+        if not (config.sandbox and config.sandbox.sync_workspace):
+            return
+        try:
+            await SANDBOX_CLIENT.sync_workspace()
+        except Exception as e:
+            logger.warning(f"Workspace sync failed: {e}")
+
     @abstractmethod
     async def step(self) -> str:
         """Execute a single step in the agent's workflow.
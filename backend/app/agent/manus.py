@@ -68,4 +68,4 @@ class Manus(ToolCallAgent):
 
     async def cleanup(self):
         """Clean up Manus agent resources."""
-        pass
+        await super().cleanup()
@@ -3,7 +3,7 @@ import json
 from typing import Any, List, Optional, Union
 
 from app.agent.react import ReActAgent
-from app.exceptions import TokenLimitExceeded
+from app.exceptions import RunCancelled, TokenLimitExceeded
 from app.logger import logger
 from app.prompt.toolcall import NEXT_STEP_PROMPT, SYSTEM_PROMPT
 from app.schema import TOOL_CHOICE_TYPE, AgentState, Message, ToolCall, ToolChoice
@@ -203,6 +203,8 @@ class ToolCallAgent(ReActAgent):
             )
 
             return observation
+        except RunCancelled:
+            raise
         except json.JSONDecodeError:
             error_msg = f"Error parsing arguments for {name}: Invalid JSON format"
             logger.error(
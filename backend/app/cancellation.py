@@ -0,0 +1,139 @@
+"""Cooperative cancellation of agent runs."""
+
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Optional, TypeVar
+
+from app.exceptions import RunCancelled
+
+
+T = TypeVar("T")
+
+
+class CancellationToken:
+    """Signals that a run should stop.
+
+    Agents check the token between steps. Awaitables run through ``guard``
+    are also interrupted as soon as the token is cancelled, so in-flight LLM
+    requests and tool executions stop early and release their resources.
+
+    Attributes:
+        reason: Why the run was cancelled.
+        cancelled_at: Monotonic time the token was cancelled at.
+        release_timeout: Seconds an interrupted awaitable may take to unwind.
+    """
+
+    def __init__(self, release_timeout: float = 5.0):
+        """Initializes an uncancelled token.
+
+        Args:
+            release_timeout: Seconds an interrupted awaitable may take to unwind.
+        """
+        self.reason: Optional[str] = None
+        self.cancelled_at: Optional[float] = None
+        self.release_timeout = release_timeout
+        self._event = asyncio.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether cancellation was requested."""
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "Cancelled by user") -> bool:
+        """Requests cancellation.
+
+        Args:
+            reason: Why the run is cancelled.
+
+        Returns:
+            bool: False if cancellation was already requested.
+        """
+        if self.cancelled:
+            return False
+        self.reason = reason
+        self.cancelled_at = time.monotonic()
+        self._event.set()
+        return True
+
+    def raise_if_cancelled(self) -> None:
+        """Raises RunCancelled if cancellation was requested."""
+        if self.cancelled:
+            raise RunCancelled(self.reason)
+
+    async def guard(self, awaitable: Awaitable[T]) -> T:
+        """Awaits an awaitable unless the token is cancelled first.
+
+        On cancellation the awaitable is cancelled and given up to
+        ``release_timeout`` seconds to unwind before RunCancelled is raised.
+
+        Args:
+            awaitable: Awaitable to run.
+
+        Returns:
+            T: Result of the awaitable.
+
+        Raises:
+            RunCancelled: If the token is cancelled before the awaitable completes.
+        """
+        task = asyncio.ensure_future(awaitable)
+        if self.cancelled:
+            task.cancel()
+            raise RunCancelled(self.reason)
+
+        waiter = asyncio.ensure_future(self._event.wait())
+        try:
+            await asyncio.wait({task, waiter}, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        finally:
+            waiter.cancel()
+
+        if task.done():
+            return task.result()
+
+        task.cancel()
+        await asyncio.wait({task}, timeout=self.release_timeout)
+        raise RunCancelled(self.reason)
+
+
+# Token of the run whose code is currently executing
+_current_token: ContextVar[Optional[CancellationToken]] = ContextVar(
+    "cancellation_token", default=None
+)
+
+
+@contextmanager
+def cancellation_scope(token: CancellationToken):
+    """Makes ``token`` the cancellation token of the current task.
+
+    Args:
+        token: Token of the run.
+    """
+    reset = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        _current_token.reset(reset)
+
+
+def current_token() -> Optional[CancellationToken]:
+    """Gets the cancellation token of the current task, if any."""
+    return _current_token.get()
+
+
+async def guard(awaitable: Awaitable[T]) -> T:
+    """Awaits an awaitable, interrupting it if the current run is cancelled.
+
+    Args:
+        awaitable: Awaitable to run.
+
+    Returns:
+        T: Result of the awaitable.
+    """
+    token = _current_token.get()
+    if token is None:
+        return await awaitable
+    return await token.guard(awaitable)
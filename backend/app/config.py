@@ -1,7 +1,7 @@
 import threading
 import tomllib
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -88,6 +88,9 @@ class SandboxSettings(BaseModel):
     """Configuration for the execution sandbox"""
 
     use_sandbox: bool = Field(False, description="Whether to use the sandbox")
+    backend: Literal["docker", "namespace"] = Field(
+        "docker", description="Isolation of sandboxes: containers or Linux namespaces"
+    )
     image: str = Field("python:3.12-slim", description="Base image")
     work_dir: str = Field("/workspace", description="Container working directory")
     memory_limit: str = Field("512m", description="Memory limit")
@@ -96,6 +99,57 @@ class SandboxSettings(BaseModel):
     network_enabled: bool = Field(
         False, description="Whether network access is allowed"
     )
+    pool_size: int = Field(
+        0, description="Pre-started containers kept ready per sandbox profile"
+    )
+    pool_recycle: bool = Field(
+        False,
+        description="Whether used containers are reset and returned to the pool",
+    )
+    sync_workspace: bool = Field(
+        False,
+        description="Whether agents sync the workspace and sandbox after each step",
+    )
+    docker_pool_size: int = Field(
+        32, description="Connections to the Docker daemon kept open for reuse"
+    )
+    docker_workers: int = Field(
+        32, description="Threads executing blocking Docker calls"
+    )
+    exec_sessions: int = Field(
+        4, description="Shells per sandbox running parallel commands"
+    )
+    max_output: int = Field(
+        1024 * 1024, description="Bytes of stdout and of stderr kept per command"
+    )
+    right_size: bool = Field(
+        False,
+        description="Whether limits of new sandboxes are lowered to observed usage",
+    )
+    right_size_headroom: float = Field(
+        1.5, description="Factor applied to the p95 usage when right-sizing limits"
+    )
+    package_cache_dir: Optional[str] = Field(
+        None, description="Host wheelhouse mounted read-only for offline pip installs"
+    )
+    package_requirements: Optional[str] = Field(
+        None, description="Requirements manifest the wheelhouse is built from"
+    )
+
+
+class PythonExecuteSettings(BaseModel):
+    """Configuration of the worker processes running Python code"""
+
+    worker_pool_size: int = Field(
+        2, description="Warm worker processes kept ready to run code"
+    )
+    worker_max_runs: int = Field(
+        100, description="Runs after which a worker process is replaced"
+    )
+    preload_modules: List[str] = Field(
+        default_factory=list,
+        description="Modules imported by workers before their first run",
+    )
 
 
 class MCPSettings(BaseModel):
@@ -106,6 +160,56 @@ class MCPSettings(BaseModel):
     )
 
 
+class ServerSettings(BaseModel):
+    """Configuration for the API server"""
+
+    max_concurrent_runs: int = Field(
+        4, description="Maximum number of agent runs executing at once"
+    )
+    max_queue_size: int = Field(
+        32, description="Maximum number of runs waiting for a free slot"
+    )
+    max_queued_per_client: int = Field(
+        4, description="Maximum number of queued runs per client"
+    )
+    output_flush_interval: float = Field(
+        0.02, description="Seconds to coalesce output lines into one websocket frame"
+    )
+    output_max_frame_bytes: int = Field(
+        16384, description="Pending output size that triggers an immediate send"
+    )
+    output_queue_size: int = Field(
+        1000, description="Maximum number of output lines buffered per session"
+    )
+    ws_compression: bool = Field(
+        True, description="Whether to negotiate permessage-deflate on websockets"
+    )
+    event_log_memory_events: int = Field(
+        2000, description="Events kept in memory per run before spilling to disk"
+    )
+    run_spill_dir: Optional[str] = Field(
+        None, description="Directory for run event logs (temp dir if unset)"
+    )
+    run_retention: int = Field(
+        3600, description="Seconds finished runs stay available for replay"
+    )
+    run_store_path: Optional[str] = Field(
+        None,
+        description="SQLite database of run state shared by the server workers "
+        "(defaults to runs.sqlite3 in the system temp dir)",
+    )
+    cancel_grace_seconds: float = Field(
+        10.0, description="Seconds a cancelled run may take to stop by itself"
+    )
+    token_flush_interval: float = Field(
+        0.05, description="Seconds streamed LLM tokens are batched into one event"
+    )
+    batch_parallelism: int = Field(
+        4, description="Jobs of one batch running or queued at the same time"
+    )
+    max_batch_jobs: int = Field(1000, description="Maximum number of jobs per batch")
+
+
 class AppConfig(BaseModel):
     llm: Dict[str, LLMSettings]
     sandbox: Optional[SandboxSettings] = Field(
@@ -118,6 +222,12 @@ class AppConfig(BaseModel):
         None, description="Search configuration"
     )
     mcp_config: Optional[MCPSettings] = Field(None, description="MCP configuration")
+    server_config: Optional[ServerSettings] = Field(
+        None, description="API server configuration"
+    )
+    python_execute_config: Optional[PythonExecuteSettings] = Field(
+        None, description="Python execution configuration"
+    )
 
     class Config:
         arbitrary_types_allowed = True
@@ -227,6 +337,18 @@ class Config:
         else:
             mcp_settings = MCPSettings()
 
+        server_config = raw_config.get("server", {})
+        if server_config:
+            server_settings = ServerSettings(**server_config)
+        else:
+            server_settings = ServerSettings()
+
+        python_execute_config = raw_config.get("python_execute", {})
+        if python_execute_config:
+            python_execute_settings = PythonExecuteSettings(**python_execute_config)
+        else:
+            python_execute_settings = PythonExecuteSettings()
+
         config_dict = {
             "llm": {
                 "default": default_settings,
@@ -239,6 +361,8 @@ class Config:
             "browser_config": browser_settings,
             "search_config": search_settings,
             "mcp_config": mcp_settings,
+            "server_config": server_settings,
+            "python_execute_config": python_execute_settings,
         }
 
         self._config = AppConfig(**config_dict)
@@ -264,6 +388,16 @@ class Config:
         """Get the MCP configuration"""
         return self._config.mcp_config
 
+    @property
+    def server_config(self) -> ServerSettings:
+        """Get the API server configuration"""
+        return self._config.server_config
+
+    @property
+    def python_execute_config(self) -> PythonExecuteSettings:
+        """Get the Python execution configuration"""
+        return self._config.python_execute_config
+
     @property
     def workspace_root(self) -> Path:
         """Get the workspace root directory"""
@@ -11,3 +11,11 @@ class OpenManusError(Exception):
 
 class TokenLimitExceeded(OpenManusError):
     """Exception raised when the token limit is exceeded"""
+
+
+class RunRejected(OpenManusError):
+    """Exception raised when a run cannot be admitted by the scheduler"""
+
+
+class RunCancelled(OpenManusError):
+    """Exception raised when a run is cancelled by its client"""
@@ -1,11 +1,17 @@
+import functools
 import math
-from typing import Dict, List, Optional, Union
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Protocol, Union
 
 import tiktoken
 from app.bedrock import BedrockClient
+from app.cancellation import guard
 from app.config import LLMSettings, config
-from app.exceptions import TokenLimitExceeded
+from app.exceptions import RunCancelled, TokenLimitExceeded
 from app.logger import logger  # Assuming a logger is set up in your app
+from app.metrics import REGISTRY
 from app.schema import (
     ROLE_VALUES,
     TOOL_CHOICE_TYPE,
@@ -18,6 +24,7 @@ from openai import (
     AsyncAzureOpenAI,
     AsyncOpenAI,
     AuthenticationError,
+    BadRequestError,
     OpenAIError,
     RateLimitError,
 )
@@ -25,12 +32,16 @@ from openai.types.chat import ChatCompletion, ChatCompletionMessage
 from tenacity import (
     retry,
     retry_if_exception_type,
+    retry_if_not_exception_type,
     stop_after_attempt,
     wait_random_exponential,
 )
 
 
 REASONING_MODELS = ["o1", "o3-mini"]
+# API types whose streaming requests accept ``stream_options``, which older
+# Azure API versions and some OpenAI-compatible servers reject
+STREAM_USAGE_API_TYPES = ["", "openai"]
 MULTIMODAL_MODELS = [
     "gpt-4-vision-preview",
     "gpt-4o",
@@ -41,6 +52,121 @@ MULTIMODAL_MODELS = [
 ]
 
 
+LLM_REQUEST_DURATION = REGISTRY.histogram(
+    "openmanus_llm_request_duration_seconds",
+    "Duration of LLM requests, including streaming the response",
+    labels=("model", "method", "status"),
+)
+LLM_TOKENS = REGISTRY.counter(
+    "openmanus_llm_tokens_total",
+    "Tokens used by LLM requests",
+    labels=("model", "kind"),
+)
+
+
+def _observe_request(method: str):
+    """Records the duration and outcome of each LLM request attempt.
+
+    The attempt is also interrupted if the current run is cancelled.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            start = time.perf_counter()
+            status = "error"
+            try:
+                result = await guard(func(self, *args, **kwargs))
+                status = "ok"
+                return result
+            except RunCancelled:
+                status = "cancelled"
+                raise
+            finally:
+                LLM_REQUEST_DURATION.observe(
+                    time.perf_counter() - start,
+                    model=self.model,
+                    method=method,
+                    status=status,
+                )
+
+        return wrapper
+
+    return decorator
+
+
+class TokenStreamHandler(Protocol):
+    """Receiver of response text as the LLM generates it."""
+
+    def on_token(self, text: str) -> None:
+        """Handles a chunk of generated text."""
+        ...
+
+    def on_stream_end(self, discarded: bool = False) -> None:
+        """Handles the end of a streamed response.
+
+        Args:
+            discarded: Whether the response broke off, so the text received
+                since the last end is void; a retried request streams anew.
+        """
+        ...
+
+
+# Handler of the run whose code is currently executing; requests stream when set
+_token_handler: ContextVar[Optional[TokenStreamHandler]] = ContextVar(
+    "token_handler", default=None
+)
+
+
+class TokenUsageHandler(Protocol):
+    """Receiver of the token usage of LLM requests."""
+
+    def on_usage(self, model: str, input_tokens: int, completion_tokens: int) -> None:
+        """Handles the tokens used by a request."""
+        ...
+
+
+# Handler the token usage of the current task is attributed to
+_usage_handler: ContextVar[Optional[TokenUsageHandler]] = ContextVar(
+    "usage_handler", default=None
+)
+
+
+@contextmanager
+def track_usage(handler: TokenUsageHandler):
+    """Reports the token usage of LLM requests in the current task to ``handler``.
+
+    ``LLM`` instances are shared by every run in the process, so their
+    cumulative counters cannot tell runs apart; this attributes usage to the
+    run making the request.
+
+    Args:
+        handler: Receiver of the token usage.
+    """
+    token = _usage_handler.set(handler)
+    try:
+        yield handler
+    finally:
+        _usage_handler.reset(token)
+
+
+@contextmanager
+def stream_tokens(handler: TokenStreamHandler):
+    """Streams the text of LLM responses in the current task to ``handler``.
+
+    While active, ``ask_tool`` requests are made in streaming mode and
+    ``ask(stream=True)`` sends its chunks to the handler instead of stdout.
+
+    Args:
+        handler: Receiver of the generated text.
+    """
+    token = _token_handler.set(handler)
+    try:
+        yield handler
+    finally:
+        _token_handler.reset(token)
+
+
 class TokenCounter:
     # Token constants
     BASE_MESSAGE_TOKENS = 4
@@ -202,6 +328,8 @@ class LLM:
             self.api_key = llm_config.api_key
             self.api_version = llm_config.api_version
             self.base_url = llm_config.base_url
+            # Cleared once the API rejects streaming tool requests
+            self.stream_tools = self.api_type != "aws"
 
             # Add token counting related attributes
             self.total_input_tokens = 0
@@ -246,12 +374,21 @@ class LLM:
         # Only track tokens if max_input_tokens is set
         self.total_input_tokens += input_tokens
         self.total_completion_tokens += completion_tokens
+        self._record_usage(input_tokens, completion_tokens)
         logger.info(
             f"Token usage: Input={input_tokens}, Completion={completion_tokens}, "
             f"Cumulative Input={self.total_input_tokens}, Cumulative Completion={self.total_completion_tokens}, "
             f"Total={input_tokens + completion_tokens}, Cumulative Total={self.total_input_tokens + self.total_completion_tokens}"
         )
 
+    def _record_usage(self, input_tokens: int, completion_tokens: int) -> None:
+        """Reports token usage to metrics and the current usage handler."""
+        LLM_TOKENS.inc(input_tokens, model=self.model, kind="input")
+        LLM_TOKENS.inc(completion_tokens, model=self.model, kind="completion")
+        handler = _usage_handler.get()
+        if handler is not None:
+            handler.on_usage(self.model, input_tokens, completion_tokens)
+
     def check_token_limit(self, input_tokens: int) -> bool:
         """Check if token limits are exceeded"""
         if self.max_input_tokens is not None:
@@ -360,10 +497,11 @@ class LLM:
     @retry(
         wait=wait_random_exponential(min=1, max=60),
         stop=stop_after_attempt(6),
-        retry=retry_if_exception_type(
-            (OpenAIError, Exception, ValueError)
-        ),  # Don't retry TokenLimitExceeded
+        retry=retry_if_exception_type((OpenAIError, Exception, ValueError))
+        # Token limits and cancelled runs do not improve on retry
+        & retry_if_not_exception_type((TokenLimitExceeded, RunCancelled)),
     )
+    @_observe_request("ask")
     async def ask(
         self,
         messages: List[Union[dict, Message]],
@@ -443,15 +581,27 @@ class LLM:
 
             response = await self.client.chat.completions.create(**params, stream=True)
 
+            handler = _token_handler.get()
             collected_messages = []
             completion_text = ""
-            async for chunk in response:
-                chunk_message = chunk.choices[0].delta.content or ""
-                collected_messages.append(chunk_message)
-                completion_text += chunk_message
-                print(chunk_message, end="", flush=True)
-
-            print()  # Newline after streaming
+            try:
+                async for chunk in response:
+                    chunk_message = chunk.choices[0].delta.content or ""
+                    collected_messages.append(chunk_message)
+                    completion_text += chunk_message
+                    if handler is None:
+                        print(chunk_message, end="", flush=True)
+                    elif chunk_message:
+                        handler.on_token(chunk_message)
+            except BaseException:
+                if handler is not None:
+                    handler.on_stream_end(discarded=True)
+                raise
+            finally:
+                if handler is None:
+                    print()  # Newline after streaming
+            if handler is not None:
+                handler.on_stream_end()
             full_response = "".join(collected_messages).strip()
             if not full_response:
                 raise ValueError("Empty response from streaming LLM")
@@ -462,6 +612,7 @@ class LLM:
                 f"Estimated completion tokens for streaming response: {completion_tokens}"
             )
             self.total_completion_tokens += completion_tokens
+            self._record_usage(0, completion_tokens)
 
             return full_response
 
@@ -487,10 +638,11 @@ class LLM:
     @retry(
         wait=wait_random_exponential(min=1, max=60),
         stop=stop_after_attempt(6),
-        retry=retry_if_exception_type(
-            (OpenAIError, Exception, ValueError)
-        ),  # Don't retry TokenLimitExceeded
+        retry=retry_if_exception_type((OpenAIError, Exception, ValueError))
+        # Token limits and cancelled runs do not improve on retry
+        & retry_if_not_exception_type((TokenLimitExceeded, RunCancelled)),
     )
+    @_observe_request("ask_with_images")
     async def ask_with_images(
         self,
         messages: List[Union[dict, Message]],
@@ -633,10 +785,11 @@ class LLM:
     @retry(
         wait=wait_random_exponential(min=1, max=60),
         stop=stop_after_attempt(6),
-        retry=retry_if_exception_type(
-            (OpenAIError, Exception, ValueError)
-        ),  # Don't retry TokenLimitExceeded
+        retry=retry_if_exception_type((OpenAIError, Exception, ValueError))
+        # Token limits and cancelled runs do not improve on retry
+        & retry_if_not_exception_type((TokenLimitExceeded, RunCancelled)),
     )
+    @_observe_request("ask_tool")
     async def ask_tool(
         self,
         messages: List[Union[dict, Message]],
@@ -724,10 +877,28 @@ class LLM:
                     temperature if temperature is not None else self.temperature
                 )
 
+            # Stream when someone is watching the thoughts being generated;
+            # the Bedrock adapter only prints its stream, so it is not used there
+            handler = _token_handler.get()
+            streamed = handler is not None and self.stream_tools
+            if streamed:
+                try:
+                    return await self._stream_tool_response(
+                        params, input_tokens, handler
+                    )
+                except BadRequestError as e:
+                    # Rejected before any token was generated
+                    logger.warning(
+                        f"Streaming tool request rejected, sending it unstreamed: {e}"
+                    )
+
             params["stream"] = False  # Always use non-streaming for tool requests
             response: ChatCompletion = await self.client.chat.completions.create(
                 **params
             )
+            if streamed:
+                logger.warning(f"Not streaming tool requests to {self.model} anymore")
+                self.stream_tools = False
 
             # Check if response is valid
             if not response.choices or not response.choices[0].message:
@@ -760,3 +931,80 @@ class LLM:
         except Exception as e:
             logger.error(f"Unexpected error in ask_tool: {e}")
             raise
+
+    async def _stream_tool_response(
+        self, params: dict, input_tokens: int, handler: TokenStreamHandler
+    ) -> ChatCompletionMessage | None:
+        """Makes a streaming tool request and reassembles the response message.
+
+        Content deltas are forwarded to ``handler`` as they arrive; tool call
+        deltas are accumulated by index. If the stream breaks off, the handler
+        is told to discard the forwarded text, which a retry streams again.
+
+        Args:
+            params: Completion request parameters.
+            input_tokens: Estimated prompt tokens, used if the API reports no usage.
+            handler: Receiver of the generated text.
+
+        Returns:
+            ChatCompletionMessage: The reassembled response message.
+
+        Raises:
+            BadRequestError: If the API rejects the streaming request.
+        """
+        if self.api_type.lower() in STREAM_USAGE_API_TYPES:
+            params = {**params, "stream_options": {"include_usage": True}}
+        response = await self.client.chat.completions.create(**params, stream=True)
+
+        content_parts: List[str] = []
+        tool_calls: Dict[int, dict] = {}
+        usage = None
+        try:
+            async for chunk in response:
+                if chunk.usage:
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.content:
+                    content_parts.append(delta.content)
+                    handler.on_token(delta.content)
+                for call in delta.tool_calls or []:
+                    entry = tool_calls.setdefault(
+                        call.index,
+                        {
+                            "id": "",
+                            "type": "function",
+                            "function": {"name": "", "arguments": ""},
+                        },
+                    )
+                    if call.id:
+                        entry["id"] = call.id
+                    if call.function and call.function.name:
+                        entry["function"]["name"] += call.function.name
+                    if call.function and call.function.arguments:
+                        entry["function"]["arguments"] += call.function.arguments
+        except BaseException:
+            handler.on_stream_end(discarded=True)
+            raise
+        handler.on_stream_end()
+
+        content = "".join(content_parts)
+        if not content and not tool_calls:
+            return None
+
+        # Update token counts, estimating them if the API did not report usage
+        if usage:
+            self.update_token_count(usage.prompt_tokens, usage.completion_tokens)
+        else:
+            completion_tokens = self.count_tokens(content) + sum(
+                self.count_tokens(call["function"]["arguments"])
+                for call in tool_calls.values()
+            )
+            self.update_token_count(input_tokens, completion_tokens)
+
+        return ChatCompletionMessage(
+            role="assistant",
+            content=content or None,
+            tool_calls=[tool_calls[index] for index in sorted(tool_calls)] or None,
+        )
@@ -8,6 +8,8 @@ from app.sandbox.client import (
     BaseSandboxClient,
     LocalSandboxClient,
     create_sandbox_client,
+    current_sandbox_client,
+    sandbox_session,
 )
 from app.sandbox.core.exceptions import (
     SandboxError,
@@ -15,15 +17,27 @@ from app.sandbox.core.exceptions import (
     SandboxTimeoutError,
 )
 from app.sandbox.core.manager import SandboxManager
-from app.sandbox.core.sandbox import DockerSandbox
+from app.sandbox.core.namespace import NamespaceSandbox
+from app.sandbox.core.sandbox import DockerSandbox, FileResult, SandboxSnapshot
+from app.sandbox.core.sync import SyncResult, WorkspaceSync
+from app.sandbox.core.terminal import CommandResult, CommandStream
 
 
 __all__ = [
     "DockerSandbox",
+    "FileResult",
+    "NamespaceSandbox",
     "SandboxManager",
+    "SandboxSnapshot",
+    "SyncResult",
+    "CommandResult",
+    "CommandStream",
+    "WorkspaceSync",
     "BaseSandboxClient",
     "LocalSandboxClient",
     "create_sandbox_client",
+    "current_sandbox_client",
+    "sandbox_session",
     "SandboxError",
     "SandboxTimeoutError",
     "SandboxResourceError",
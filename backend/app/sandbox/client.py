@@ -1,8 +1,15 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Optional, Protocol
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Protocol, Tuple, Union
 
-from app.config import SandboxSettings
-from app.sandbox.core.sandbox import DockerSandbox
+from app.config import SandboxSettings, config
+from app.logger import logger
+from app.sandbox.core.manager import SandboxManager
+from app.sandbox.core.namespace import NamespaceSandbox
+from app.sandbox.core.sandbox import DockerSandbox, FileResult
+from app.sandbox.core.sync import SyncResult, WorkspaceSync
+from app.sandbox.core.terminal import CommandResult, CommandStream
 
 
 class SandboxFileOperations(Protocol):
@@ -59,9 +66,29 @@ class BaseSandboxClient(ABC):
         """Creates sandbox."""
 
     @abstractmethod
-    async def run_command(self, command: str, timeout: Optional[int] = None) -> str:
+    async def run_command(
+        self, command: str, timeout: Optional[int] = None, stateful: bool = True
+    ) -> str:
         """Executes command."""
 
+    @abstractmethod
+    async def execute(
+        self, command: str, timeout: Optional[int] = None, stateful: bool = True
+    ) -> CommandResult:
+        """Executes command, returning exit code, stdout and stderr."""
+
+    @abstractmethod
+    def stream(
+        self, command: str, timeout: Optional[int] = None, stateful: bool = True
+    ) -> CommandStream:
+        """Executes command, streaming its output."""
+
+    @abstractmethod
+    async def exec_once(
+        self, command: Union[str, List[str]], timeout: Optional[int] = None
+    ) -> Tuple[int, str]:
+        """Executes a stateless command without waiting for the shell."""
+
     @abstractmethod
     async def copy_from(self, container_path: str, local_path: str) -> None:
         """Copies file from container."""
@@ -78,17 +105,75 @@ class BaseSandboxClient(ABC):
     async def write_file(self, path: str, content: str) -> None:
         """Writes file."""
 
+    @abstractmethod
+    async def read_files(self, paths: List[str]) -> List[FileResult]:
+        """Reads several files in one transfer."""
+
+    @abstractmethod
+    async def write_files(self, files: Dict[str, str]) -> List[FileResult]:
+        """Writes several files in one transfer."""
+
+    @abstractmethod
+    async def sync_workspace(self) -> Optional[SyncResult]:
+        """Synchronizes the host workspace with the sandbox."""
+
+    @abstractmethod
+    async def release(self) -> None:
+        """Gives up the sandbox at the end of a run."""
+
     @abstractmethod
     async def cleanup(self) -> None:
         """Cleans up resources."""
 
 
 class LocalSandboxClient(BaseSandboxClient):
-    """Local sandbox client implementation."""
+    """Local sandbox client implementation.
+
+    Configurations with a ``pool_size`` get their sandbox from the warm
+    pool of a sandbox manager, which is created on first use if none is
+    given, and return it there on cleanup.
 
-    def __init__(self):
-        """Initializes local sandbox client."""
-        self.sandbox: Optional[DockerSandbox] = None
+    A client bound to a session gets the session's sandbox from the
+    manager instead, and ``release`` hands it back for the session's next
+    run rather than destroying it.
+
+    The sandbox is a container, or a namespace sandbox if the
+    configuration's ``backend`` is "namespace"; those are never pooled.
+
+    The host workspace is synchronized with the sandbox working directory
+    on demand; listeners registered with ``add_sync_listener`` are called
+    whenever that changed host files.
+    """
+
+    def __init__(
+        self,
+        manager: Optional[SandboxManager] = None,
+        session_id: Optional[str] = None,
+        parent: Optional["LocalSandboxClient"] = None,
+    ):
+        """Initializes local sandbox client.
+
+        Args:
+            manager: Sandbox manager providing pooled sandboxes.
+            session_id: Session whose sandbox the client uses.
+            parent: Client whose manager and sync listeners are shared.
+        """
+        self.sandbox: Optional[Union[DockerSandbox, NamespaceSandbox]] = None
+        self.manager = manager
+        self.session_id = session_id
+        self._parent = parent
+        self._sandbox_id: Optional[str] = None
+        self._sync: Optional[WorkspaceSync] = None
+        self._sync_listeners: List[Callable[[SyncResult], None]] = (
+            parent._sync_listeners if parent else []
+        )
+
+    def _get_manager(self) -> SandboxManager:
+        if self.manager is None:
+            self.manager = (
+                self._parent._get_manager() if self._parent else SandboxManager()
+            )
+        return self.manager
 
     async def create(
         self,
@@ -104,15 +189,43 @@ class LocalSandboxClient(BaseSandboxClient):
         Raises:
             RuntimeError: If sandbox creation fails.
         """
-        self.sandbox = DockerSandbox(config, volume_bindings)
+        config = config or SandboxSettings()
+        if self.session_id and not volume_bindings:
+            manager = self._get_manager()
+            self._sandbox_id = await manager.acquire_session(self.session_id, config)
+            self.sandbox = await manager.get_sandbox(self._sandbox_id)
+            return
+        if config.pool_size > 0 and not volume_bindings:
+            manager = self._get_manager()
+            # Leased until cleanup, as the client uses the sandbox directly
+            self._sandbox_id = await manager.create_sandbox(config, lease=True)
+            self.sandbox = await manager.get_sandbox(self._sandbox_id)
+            return
+
+        if config.backend == "namespace":
+            self.sandbox = NamespaceSandbox(config, volume_bindings)
+        else:
+            self.sandbox = DockerSandbox(config, volume_bindings)
         await self.sandbox.create()
 
-    async def run_command(self, command: str, timeout: Optional[int] = None) -> str:
+    async def warm_pool(self, config: SandboxSettings) -> None:
+        """Starts pre-starting sandboxes for a configuration with a ``pool_size``.
+
+        Args:
+            config: Sandbox configuration.
+        """
+        if config.pool_size > 0:
+            await self._get_manager().warm_pool(config)
+
+    async def run_command(
+        self, command: str, timeout: Optional[int] = None, stateful: bool = True
+    ) -> str:
         """Runs command in sandbox.
 
         Args:
             command: Command to execute.
             timeout: Execution timeout in seconds.
+            stateful: Whether to run in the main shell or in parallel with it.
 
         Returns:
             Command output.
@@ -122,7 +235,66 @@ class LocalSandboxClient(BaseSandboxClient):
         """
         if not self.sandbox:
             raise RuntimeError("Sandbox not initialized")
-        return await self.sandbox.run_command(command, timeout)
+        return await self.sandbox.run_command(command, timeout, stateful)
+
+    async def execute(
+        self, command: str, timeout: Optional[int] = None, stateful: bool = True
+    ) -> CommandResult:
+        """Runs command in sandbox, keeping its exit code and stderr.
+
+        Args:
+            command: Command to execute.
+            timeout: Execution timeout in seconds.
+            stateful: Whether to run in the main shell or in parallel with it.
+
+        Returns:
+            CommandResult: Exit code, stdout, stderr and duration.
+
+        Raises:
+            RuntimeError: If sandbox not initialized.
+        """
+        if not self.sandbox:
+            raise RuntimeError("Sandbox not initialized")
+        return await self.sandbox.execute(command, timeout, stateful)
+
+    def stream(
+        self, command: str, timeout: Optional[int] = None, stateful: bool = True
+    ) -> CommandStream:
+        """Runs command in sandbox, streaming its stdout as it arrives.
+
+        Args:
+            command: Command to execute.
+            timeout: Execution timeout in seconds.
+            stateful: Whether to run in the main shell or in parallel with it.
+
+        Returns:
+            CommandStream: Stdout chunks, then the result.
+
+        Raises:
+            RuntimeError: If sandbox not initialized.
+        """
+        if not self.sandbox:
+            raise RuntimeError("Sandbox not initialized")
+        return self.sandbox.stream(command, timeout, stateful)
+
+    async def exec_once(
+        self, command: Union[str, List[str]], timeout: Optional[int] = None
+    ) -> Tuple[int, str]:
+        """Runs a stateless command in sandbox as its own exec.
+
+        Args:
+            command: Argument list, or a shell command run by bash.
+            timeout: Execution timeout in seconds.
+
+        Returns:
+            Tuple of (exit_code, output).
+
+        Raises:
+            RuntimeError: If sandbox not initialized.
+        """
+        if not self.sandbox:
+            raise RuntimeError("Sandbox not initialized")
+        return await self.sandbox.exec_once(command, timeout)
 
     async def copy_from(self, container_path: str, local_path: str) -> None:
         """Copies file from container to local.
@@ -182,9 +354,104 @@ class LocalSandboxClient(BaseSandboxClient):
             raise RuntimeError("Sandbox not initialized")
         await self.sandbox.write_file(path, content)
 
+    async def read_files(self, paths: List[str]) -> List[FileResult]:
+        """Reads several files from container in one archive.
+
+        Args:
+            paths: File paths in container.
+
+        Returns:
+            List[FileResult]: Content or error of each file, in order.
+
+        Raises:
+            RuntimeError: If sandbox not initialized.
+        """
+        if not self.sandbox:
+            raise RuntimeError("Sandbox not initialized")
+        return await self.sandbox.read_files(paths)
+
+    async def write_files(self, files: Dict[str, str]) -> List[FileResult]:
+        """Writes several files to container in one archive.
+
+        Args:
+            files: Content by file path in container.
+
+        Returns:
+            List[FileResult]: Outcome of each file, in order.
+
+        Raises:
+            RuntimeError: If sandbox not initialized.
+        """
+        if not self.sandbox:
+            raise RuntimeError("Sandbox not initialized")
+        return await self.sandbox.write_files(files)
+
+    def add_sync_listener(self, callback: Callable[[SyncResult], None]) -> None:
+        """Registers a function called when a synchronization changed host files.
+
+        Args:
+            callback: Function receiving the synchronization result.
+        """
+        self._sync_listeners.append(callback)
+
+    async def sync_workspace(self) -> Optional[SyncResult]:
+        """Synchronizes the host workspace with the sandbox working directory.
+
+        Only files changed on either side since the previous call are
+        transferred; the first call after the sandbox was created compares
+        full content hashes.
+
+        Returns:
+            Optional[SyncResult]: Changes applied, or None without a Docker
+                sandbox, as synchronization uses the container archive API.
+        """
+        if not self.sandbox or not self.sandbox.container:
+            return None
+        if self._sync is None or self._sync.sandbox is not self.sandbox:
+            self._sync = WorkspaceSync(self.sandbox, str(config.workspace_root))
+        result = await self._sync.sync()
+        if result.downloaded or result.deleted_on_host:
+            for callback in self._sync_listeners:
+                try:
+                    callback(result)
+                except Exception as e:
+                    logger.warning(f"Workspace sync listener failed: {e}")
+        return result
+
+    async def release(self) -> None:
+        """Gives up the sandbox at the end of a run.
+
+        A session's sandbox is kept for the session's next run; any other
+        sandbox is cleaned up.
+        """
+        if not (self.session_id and self._sandbox_id):
+            await self.cleanup()
+            return
+        self._sync = None
+        self._get_manager().release_session(self.session_id)
+        self._sandbox_id = None
+        self.sandbox = None
+
+    async def end_session(self) -> None:
+        """Releases the sandbox of the client's session for good."""
+        self._sync = None
+        self._sandbox_id = None
+        self.sandbox = None
+        manager = self.manager or (self._parent.manager if self._parent else None)
+        if self.session_id and manager:
+            await manager.end_session(self.session_id)
+
     async def cleanup(self) -> None:
         """Cleans up resources."""
-        if self.sandbox:
+        if self.session_id:
+            await self.end_session()
+            return
+        self._sync = None
+        if self._sandbox_id:
+            await self.manager.release_sandbox(self._sandbox_id)
+            self._sandbox_id = None
+            self.sandbox = None
+        elif self.sandbox:
             await self.sandbox.cleanup()
             self.sandbox = None
 
@@ -198,4 +465,46 @@ def create_sandbox_client() -> LocalSandboxClient:
     return LocalSandboxClient()
 
 
-SANDBOX_CLIENT = create_sandbox_client()
+_default_client = create_sandbox_client()
+
+# Client of the session the current task runs in, if any
+_session_client: ContextVar[Optional[LocalSandboxClient]] = ContextVar(
+    "sandbox_session_client", default=None
+)
+
+
+@contextmanager
+def sandbox_session(session_id: str) -> Iterator[LocalSandboxClient]:
+    """Binds ``SANDBOX_CLIENT`` to a session's sandbox within the block.
+
+    Tasks started inside the block inherit the binding, so every agent and
+    tool of a run uses the session's sandbox, and runs of the same session
+    find the sandbox the previous run left behind.
+
+    Args:
+        session_id: Session ID, e.g. the client of a run.
+
+    Yields:
+        LocalSandboxClient: Client bound to the session.
+    """
+    client = LocalSandboxClient(session_id=session_id, parent=_default_client)
+    token = _session_client.set(client)
+    try:
+        yield client
+    finally:
+        _session_client.reset(token)
+
+
+def current_sandbox_client() -> LocalSandboxClient:
+    """Gets the client of the current session, or the default client."""
+    return _session_client.get() or _default_client
+
+
+class _CurrentSandboxClient:
+    """Forwards to the sandbox client of the current session."""
+
+    def __getattr__(self, name: str):
+        return getattr(current_sandbox_client(), name)
+
+
+SANDBOX_CLIENT = _CurrentSandboxClient()
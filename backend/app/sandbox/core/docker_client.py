@@ -0,0 +1,90 @@
+"""Docker client and thread pool shared by all sandboxes.
+
+Every sandbox, terminal session and manager talks to the daemon through one
+client, so connections to the Docker socket are pooled and reused instead
+of each object opening its own. Blocking Docker calls run on a dedicated,
+bounded thread pool, which keeps heavy sandbox traffic from exhausting the
+event loop's default executor used by the rest of the application.
+"""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+import docker
+from app.config import SandboxSettings, config
+
+
+T = TypeVar("T")
+
+_client: Optional[docker.DockerClient] = None
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def _settings() -> SandboxSettings:
+    return config.sandbox or SandboxSettings()
+
+
+def get_docker_client() -> docker.DockerClient:
+    """Gets the shared Docker client, creating it on first use.
+
+    The client is thread-safe; its connection pool holds up to the
+    ``docker_pool_size`` sandbox setting connections to the daemon.
+
+    Returns:
+        docker.DockerClient: The shared client.
+    """
+    global _client
+    with _lock:
+        if _client is None:
+            _client = docker.from_env(max_pool_size=_settings().docker_pool_size)
+        return _client
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=_settings().docker_workers,
+                thread_name_prefix="docker",
+            )
+        return _executor
+
+
+async def run_docker(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Runs a blocking Docker call on the Docker thread pool.
+
+    Use instead of ``asyncio.to_thread`` for anything that talks to the
+    daemon, including reading streamed responses.
+
+    Args:
+        func: Blocking function to call.
+        *args: Positional arguments of the function.
+        **kwargs: Keyword arguments of the function.
+
+    Returns:
+        The function's return value.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_executor(), functools.partial(func, *args, **kwargs)
+    )
+
+
+def close_docker_client() -> None:
+    """Shuts down the Docker thread pool and closes the shared client.
+
+    Both are created again if used afterwards.
+    """
+    global _client, _executor
+    with _lock:
+        client, executor = _client, _executor
+        _client = _executor = None
+    if executor:
+        executor.shutdown(wait=False, cancel_futures=True)
+    if client:
+        client.close()
@@ -1,13 +1,76 @@
 import asyncio
+import heapq
+import itertools
 import uuid
+import weakref
+from collections import deque
 from contextlib import asynccontextmanager
-from typing import Dict, Optional, Set
+from typing import Deque, Dict, List, Optional, Set, Tuple
 
-import docker
 from app.config import SandboxSettings
 from app.logger import logger
-from app.sandbox.core.sandbox import DockerSandbox
+from app.metrics import REGISTRY, Gauge
+from app.sandbox.core.docker_client import get_docker_client, run_docker
+from app.sandbox.core.namespace import NamespaceSandbox
+from app.sandbox.core.sandbox import DockerSandbox, SandboxSnapshot
+from app.sandbox.core.usage import UsageReading, UsageWindow, parse_stats, summarize
 from docker.errors import APIError, ImageNotFound
+from docker.utils import parse_bytes
+
+
+# Live managers, whose statistics are exported as metrics
+_managers: "weakref.WeakSet[SandboxManager]" = weakref.WeakSet()
+_manager_ids = itertools.count()
+_stat_gauges: Dict[str, Gauge] = {}
+
+
+def _collect_metrics() -> None:
+    """Exports the numeric statistics of every live manager as gauges."""
+    for gauge in _stat_gauges.values():
+        gauge.clear()
+    for manager in list(_managers):
+        for key, value in manager.get_stats().items():
+            if not isinstance(value, (int, float)):
+                continue
+            if key not in _stat_gauges:
+                _stat_gauges[key] = REGISTRY.gauge(
+                    f"openmanus_sandbox_{key}",
+                    f"Sandbox manager statistic {key}",
+                    labels=("manager",),
+                )
+            _stat_gauges[key].set(float(value), manager=manager.metrics_id)
+
+
+REGISTRY.add_collector(_collect_metrics)
+
+# Settings that make containers interchangeable: image, memory, cpu, network, work dir
+ProfileKey = Tuple[str, str, float, bool, str]
+
+
+def _profile_key(config: SandboxSettings) -> ProfileKey:
+    return (
+        config.image,
+        config.memory_limit,
+        config.cpu_limit,
+        config.network_enabled,
+        config.work_dir,
+    )
+
+
+# Settings whose sandboxes are expected to use similar resources
+UsageKey = Tuple[str, bool, str]
+
+
+def _usage_key(config: SandboxSettings) -> UsageKey:
+    return (config.image, config.network_enabled, config.work_dir)
+
+
+# Samples of a profile needed before its limits are right-sized
+_RIGHT_SIZE_MIN_SAMPLES = 60
+
+# Right-sized limits are never set below these
+_MIN_MEMORY_BYTES = 64 * 1024 * 1024
+_MIN_CPUS = 0.1
 
 
 class SandboxManager:
@@ -17,12 +80,40 @@ class SandboxManager:
     monitoring, and cleanup. Provides concurrent access control and automatic
     cleanup mechanisms for sandbox resources.
 
+    For configurations with a ``pool_size``, a pool of started containers
+    with an open terminal is kept per profile (image, memory, cpu, network),
+    so creating a sandbox only takes one from the pool. Pools are refilled
+    in the background. Released sandboxes are reset and returned to their
+    pool if the configuration allows it, and destroyed otherwise.
+
+    Sandboxes can be snapshotted, restored to a snapshot, and forked into
+    several sandboxes starting from the same snapshot. Snapshots are kept
+    until deleted or the manager is cleaned up.
+
+    Every ``usage_interval`` seconds the CPU, memory and IO use of each
+    sandbox is sampled into a ring buffer per sandbox and per image
+    profile, and their percentiles are reported by ``get_stats``. Sandboxes
+    whose configuration sets ``right_size`` get their limits lowered to
+    the p95 usage of their profile times a headroom.
+
+    A session, such as the conversation of one client, can keep a sandbox
+    across agent runs: ``acquire_session`` returns the session's sandbox,
+    creating it on first use, and ``release_session`` hands it back without
+    destroying it. Sandboxes are expired once idle for ``idle_timeout``
+    seconds, using a heap of last use times so that a use costs O(log n)
+    and an expiry check only looks at expired entries. When
+    ``max_sandboxes`` is reached, the least recently used sandbox that is
+    neither leased to a session nor in use is evicted to make room.
+
     Attributes:
         max_sandboxes: Maximum allowed number of sandboxes.
         idle_timeout: Sandbox idle timeout in seconds.
         cleanup_interval: Cleanup check interval in seconds.
         _sandboxes: Active sandbox instance mapping.
         _last_used: Last used time record for sandboxes.
+        _expiry: Heap of (last used time, sandbox ID); entries older than
+            ``_last_used`` are stale and skipped.
+        _pools: Ready sandboxes per profile.
     """
 
     def __init__(
@@ -30,6 +121,8 @@ class SandboxManager:
         max_sandboxes: int = 100,
         idle_timeout: int = 3600,
         cleanup_interval: int = 300,
+        usage_interval: float = 5.0,
+        usage_window: int = 120,
     ):
         """Initializes sandbox manager.
 
@@ -37,29 +130,75 @@ class SandboxManager:
             max_sandboxes: Maximum sandbox count limit.
             idle_timeout: Idle timeout in seconds.
             cleanup_interval: Cleanup check interval in seconds.
+            usage_interval: Seconds between resource usage samples; 0
+                disables sampling.
+            usage_window: Samples kept per sandbox; ten times as many are
+                kept per profile.
         """
         self.max_sandboxes = max_sandboxes
         self.idle_timeout = idle_timeout
         self.cleanup_interval = cleanup_interval
-
-        # Docker client
-        self._client = docker.from_env()
+        self.usage_interval = usage_interval
+        self.usage_window = usage_window
 
         # Resource mappings
         self._sandboxes: Dict[str, DockerSandbox] = {}
         self._last_used: Dict[str, float] = {}
+        self._expiry: List[Tuple[float, str]] = []
+        self._evicted = 0
+
+        # Session affinity
+        self._sessions: Dict[str, str] = {}  # Session ID to sandbox ID
+        self._session_of: Dict[str, str] = {}  # Sandbox ID to session ID
+        self._session_locks: Dict[str, asyncio.Lock] = {}
+        self._leases: Dict[str, int] = {}  # Runs using a session's sandbox
 
         # Concurrency control
         self._locks: Dict[str, asyncio.Lock] = {}
         self._global_lock = asyncio.Lock()
         self._active_operations: Set[str] = set()
 
+        # Warm pools
+        self._pools: Dict[ProfileKey, Deque[DockerSandbox]] = {}
+        self._pool_configs: Dict[ProfileKey, SandboxSettings] = {}
+        self._refill_tasks: Dict[ProfileKey, asyncio.Task] = {}
+        self._profiles: Dict[str, ProfileKey] = {}
+        self._pool_hits = 0
+        self._pool_misses = 0
+        self._recycled = 0
+
+        # Snapshots
+        self._snapshots: Dict[str, SandboxSnapshot] = {}
+        self._restores = 0
+        self._restore_seconds = 0.0
+
+        # Resource usage
+        self._usage: Dict[str, UsageWindow] = {}
+        self._readings: Dict[str, UsageReading] = {}
+        self._profile_usage: Dict[UsageKey, UsageWindow] = {}
+        self._right_sized = 0
+        self._usage_task: Optional[asyncio.Task] = None
+
         # Cleanup task
         self._cleanup_task: Optional[asyncio.Task] = None
         self._is_shutting_down = False
 
+        # Label of this manager's metrics
+        self.metrics_id = str(next(_manager_ids))
+        _managers.add(self)
+
         # Start automatic cleanup
         self.start_cleanup_task()
+        if usage_interval > 0:
+            self._usage_task = asyncio.create_task(self._usage_loop())
+
+    @property
+    def _client(self):
+        """Gets the Docker client, connecting on first use.
+
+        Hosts running only namespace sandboxes need no Docker daemon.
+        """
+        return get_docker_client()
 
     async def ensure_image(self, image: str) -> bool:
         """Ensures Docker image is available.
@@ -71,14 +210,12 @@ class SandboxManager:
             bool: Whether image is available.
         """
         try:
-            self._client.images.get(image)
+            await run_docker(self._client.images.get, image)
             return True
         except ImageNotFound:
             try:
                 logger.info(f"Pulling image {image}...")
-                await asyncio.get_event_loop().run_in_executor(
-                    None, self._client.images.pull, image
-                )
+                await run_docker(self._client.images.pull, image)
                 return True
             except (APIError, Exception) as e:
                 logger.error(f"Failed to pull image {image}: {e}")
@@ -105,7 +242,7 @@ class SandboxManager:
 
             self._active_operations.add(sandbox_id)
             try:
-                self._last_used[sandbox_id] = asyncio.get_event_loop().time()
+                self._touch(sandbox_id)
                 yield self._sandboxes[sandbox_id]
             finally:
                 self._active_operations.remove(sandbox_id)
@@ -114,37 +251,61 @@ class SandboxManager:
         self,
         config: Optional[SandboxSettings] = None,
         volume_bindings: Optional[Dict[str, str]] = None,
+        lease: bool = False,
     ) -> str:
         """Creates a new sandbox instance.
 
         Args:
             config: Sandbox configuration.
             volume_bindings: Volume mapping configuration.
+            lease: Whether the sandbox is leased to the caller until
+                ``release_sandbox``, so it is neither expired nor evicted
+                while the caller uses it outside ``sandbox_operation``.
 
         Returns:
             str: Sandbox ID.
 
         Raises:
-            RuntimeError: If max sandbox count reached or creation fails.
+            RuntimeError: If max sandbox count reached and no sandbox can be
+                evicted, or creation fails.
         """
         async with self._global_lock:
-            if len(self._sandboxes) >= self.max_sandboxes:
-                raise RuntimeError(
-                    f"Maximum number of sandboxes ({self.max_sandboxes}) reached"
-                )
+            await self._make_room(1)
 
             config = config or SandboxSettings()
-            if not await self.ensure_image(config.image):
+            # Namespace sandboxes start in milliseconds and use no image, so
+            # they are neither pooled nor right-sized from container stats
+            docker_backend = config.backend == "docker"
+            pooled = docker_backend and config.pool_size > 0 and not volume_bindings
+            if pooled:
+                sandbox = self._checkout(config)
+                if sandbox:
+                    sandbox_id = self._register(sandbox, _profile_key(config))
+                    if lease:
+                        self._leases[sandbox_id] = 1
+                    return sandbox_id
+            elif docker_backend and config.right_size:
+                # Pooled sandboxes were started with the configured limits
+                config = self._right_size(config)
+
+            if docker_backend and not await self.ensure_image(config.image):
                 raise RuntimeError(f"Failed to ensure Docker image: {config.image}")
 
             sandbox_id = str(uuid.uuid4())
             try:
-                sandbox = DockerSandbox(config, volume_bindings)
+                if docker_backend:
+                    sandbox = DockerSandbox(config, volume_bindings)
+                else:
+                    sandbox = NamespaceSandbox(config, volume_bindings)
                 await sandbox.create()
 
                 self._sandboxes[sandbox_id] = sandbox
-                self._last_used[sandbox_id] = asyncio.get_event_loop().time()
+                self._touch(sandbox_id)
                 self._locks[sandbox_id] = asyncio.Lock()
+                if pooled:
+                    self._profiles[sandbox_id] = _profile_key(config)
+                if lease:
+                    self._leases[sandbox_id] = 1
 
                 logger.info(f"Created sandbox {sandbox_id}")
                 return sandbox_id
@@ -155,6 +316,495 @@ class SandboxManager:
                     await self.delete_sandbox(sandbox_id)
                 raise RuntimeError(f"Failed to create sandbox: {e}")
 
+    def _touch(self, sandbox_id: str) -> None:
+        """Records that a sandbox was just used."""
+        now = asyncio.get_event_loop().time()
+        self._last_used[sandbox_id] = now
+        heapq.heappush(self._expiry, (now, sandbox_id))
+        if len(self._expiry) > 2 * len(self._last_used) + 64:
+            # Drop the stale entries left behind by earlier uses
+            self._expiry = [(t, sid) for sid, t in self._last_used.items()]
+            heapq.heapify(self._expiry)
+
+    def _is_stale(self, entry: Tuple[float, str]) -> bool:
+        last_used, sandbox_id = entry
+        return self._last_used.get(sandbox_id) != last_used
+
+    def _in_use(self, sandbox_id: str) -> bool:
+        return sandbox_id in self._active_operations or bool(
+            self._leases.get(sandbox_id)
+        )
+
+    async def _make_room(self, count: int) -> None:
+        """Evicts least recently used sandboxes until ``count`` more fit.
+
+        Called with the global lock held.
+
+        Raises:
+            RuntimeError: If every remaining sandbox is in use.
+        """
+        while len(self._sandboxes) + count > self.max_sandboxes:
+            if not await self._evict_lru():
+                raise RuntimeError(
+                    f"Maximum number of sandboxes ({self.max_sandboxes}) reached"
+                )
+
+    async def _evict_lru(self) -> bool:
+        """Deletes the least recently used sandbox not in use.
+
+        Called with the global lock held.
+
+        Returns:
+            bool: Whether a sandbox was evicted.
+        """
+        busy = []
+        victim = None
+        while self._expiry:
+            entry = heapq.heappop(self._expiry)
+            if self._is_stale(entry):
+                continue
+            if self._in_use(entry[1]):
+                busy.append(entry)
+                continue
+            victim = entry[1]
+            break
+        for entry in busy:
+            heapq.heappush(self._expiry, entry)
+        if victim is None:
+            return False
+
+        sandbox = self._forget(victim)
+        try:
+            await sandbox.cleanup()
+        except Exception as e:
+            logger.error(f"Error evicting sandbox {victim}: {e}")
+        self._evicted += 1
+        logger.info(f"Evicted least recently used sandbox {victim}")
+        return True
+
+    def _forget(self, sandbox_id: str) -> Optional[DockerSandbox]:
+        """Removes every record of a sandbox and returns it."""
+        sandbox = self._sandboxes.pop(sandbox_id, None)
+        self._last_used.pop(sandbox_id, None)
+        self._locks.pop(sandbox_id, None)
+        self._profiles.pop(sandbox_id, None)
+        self._usage.pop(sandbox_id, None)
+        self._readings.pop(sandbox_id, None)
+        self._leases.pop(sandbox_id, None)
+        session_id = self._session_of.pop(sandbox_id, None)
+        if session_id is not None and self._sessions.get(session_id) == sandbox_id:
+            del self._sessions[session_id]
+            lock = self._session_locks.get(session_id)
+            if lock and not lock.locked():
+                del self._session_locks[session_id]
+        return sandbox
+
+    async def acquire_session(
+        self, session_id: str, config: Optional[SandboxSettings] = None
+    ) -> str:
+        """Gets the sandbox of a session, creating it on first use.
+
+        The sandbox is leased until ``release_session``, so it is neither
+        expired nor evicted while a run uses it.
+
+        Args:
+            session_id: Session ID.
+            config: Configuration of the sandbox if one is created.
+
+        Returns:
+            str: Sandbox ID.
+
+        Raises:
+            RuntimeError: If the sandbox cannot be created.
+        """
+        lock = self._session_locks.setdefault(session_id, asyncio.Lock())
+        async with lock:
+            sandbox_id = self._sessions.get(session_id)
+            if sandbox_id not in self._sandboxes:
+                sandbox_id = await self.create_sandbox(config)
+                self._sessions[session_id] = sandbox_id
+                self._session_of[sandbox_id] = session_id
+            self._leases[sandbox_id] = self._leases.get(sandbox_id, 0) + 1
+            self._touch(sandbox_id)
+            return sandbox_id
+
+    def release_session(self, session_id: str) -> None:
+        """Ends a run's lease of its session's sandbox, keeping the sandbox.
+
+        Args:
+            session_id: Session ID.
+        """
+        sandbox_id = self._sessions.get(session_id)
+        if sandbox_id is None or sandbox_id not in self._leases:
+            return
+        self._leases[sandbox_id] -= 1
+        if self._leases[sandbox_id] <= 0:
+            del self._leases[sandbox_id]
+        self._touch(sandbox_id)
+
+    async def end_session(self, session_id: str) -> None:
+        """Releases the sandbox of a session that will not be resumed.
+
+        Args:
+            session_id: Session ID.
+        """
+        self._session_locks.pop(session_id, None)
+        sandbox_id = self._sessions.pop(session_id, None)
+        if sandbox_id is None:
+            return
+        self._session_of.pop(sandbox_id, None)
+        self._leases.pop(sandbox_id, None)
+        await self.release_sandbox(sandbox_id)
+
+    def _right_size(self, config: SandboxSettings) -> SandboxSettings:
+        """Lowers the limits of a configuration to the usage of its profile.
+
+        Limits are only ever lowered, and only once the profile has enough
+        samples.
+
+        Args:
+            config: Sandbox configuration.
+
+        Returns:
+            SandboxSettings: The configuration with right-sized limits.
+        """
+        window = self._profile_usage.get(_usage_key(config))
+        if window is None or len(window.samples) < _RIGHT_SIZE_MIN_SAMPLES:
+            return config
+
+        headroom = config.right_size_headroom
+        configured_memory = parse_bytes(config.memory_limit)
+        memory = int(window.percentile("memory", 0.95) * headroom)
+        memory = min(configured_memory, max(_MIN_MEMORY_BYTES, memory))
+        cpus = round(window.percentile("cpu", 0.95) * headroom, 2)
+        cpus = min(config.cpu_limit, max(_MIN_CPUS, cpus))
+        if memory == configured_memory and cpus == config.cpu_limit:
+            return config
+
+        self._right_sized += 1
+        logger.info(
+            f"Right-sized {config.image} sandbox to {memory // (1024 * 1024)}m "
+            f"and {cpus} CPUs (configured {config.memory_limit}, {config.cpu_limit})"
+        )
+        return config.model_copy(
+            update={"memory_limit": str(memory), "cpu_limit": cpus}
+        )
+
+    async def _usage_loop(self) -> None:
+        """Samples resource usage until the manager shuts down."""
+        while not self._is_shutting_down:
+            try:
+                await self._sample_usage()
+            except Exception as e:
+                logger.error(f"Error sampling sandbox usage: {e}")
+            await asyncio.sleep(self.usage_interval)
+
+    async def _sample_usage(self) -> None:
+        """Records a usage sample of every sandbox."""
+        sandboxes = [
+            (sandbox_id, sandbox)
+            for sandbox_id, sandbox in self._sandboxes.items()
+            if sandbox.container
+        ]
+        responses = await asyncio.gather(
+            *(
+                run_docker(
+                    self._client.api.stats,
+                    sandbox.container.id,
+                    stream=False,
+                    one_shot=True,
+                )
+                for _, sandbox in sandboxes
+            ),
+            return_exceptions=True,
+        )
+        for (sandbox_id, sandbox), stats in zip(sandboxes, responses):
+            if isinstance(stats, BaseException) or sandbox_id not in self._sandboxes:
+                continue  # Removed meanwhile
+            sample, self._readings[sandbox_id] = parse_stats(
+                stats, self._readings.get(sandbox_id)
+            )
+            if sample is None:
+                continue
+            if sandbox_id not in self._usage:
+                self._usage[sandbox_id] = UsageWindow(self.usage_window)
+            self._usage[sandbox_id].add(sample)
+            key = _usage_key(sandbox.config)
+            if key not in self._profile_usage:
+                self._profile_usage[key] = UsageWindow(self.usage_window * 10)
+            self._profile_usage[key].add(sample)
+
+    def get_usage(self, sandbox_id: str) -> Dict[str, float]:
+        """Gets the p50 and p95 resource usage of a sandbox.
+
+        Args:
+            sandbox_id: Sandbox ID.
+
+        Returns:
+            Dict[str, float]: Sample count, and CPU in cores, memory in bytes
+                and IO in bytes per second at p50 and p95.
+        """
+        window = self._usage.get(sandbox_id)
+        return summarize([window] if window else [])
+
+    def _checkout(self, config: SandboxSettings) -> Optional[DockerSandbox]:
+        """Takes a ready sandbox from the pool of a configuration's profile.
+
+        The pool is refilled in the background either way.
+
+        Args:
+            config: Sandbox configuration.
+
+        Returns:
+            Optional[DockerSandbox]: A ready sandbox, or None if the pool is
+                empty.
+        """
+        key = _profile_key(config)
+        self._pool_configs[key] = config
+        pool = self._pools.setdefault(key, deque())
+        sandbox = pool.popleft() if pool else None
+        self._schedule_refill(key)
+        if sandbox is None:
+            self._pool_misses += 1
+            return None
+
+        self._pool_hits += 1
+        sandbox.config = config  # Same profile, but e.g. the timeout may differ
+        return sandbox
+
+    def _register(self, sandbox: DockerSandbox, key: ProfileKey) -> str:
+        """Starts tracking a sandbox taken from a pool."""
+        sandbox_id = str(uuid.uuid4())
+        self._sandboxes[sandbox_id] = sandbox
+        self._touch(sandbox_id)
+        self._locks[sandbox_id] = asyncio.Lock()
+        self._profiles[sandbox_id] = key
+        logger.info(f"Checked out sandbox {sandbox_id} from the pool")
+        return sandbox_id
+
+    async def warm_pool(self, config: SandboxSettings, wait: bool = False) -> None:
+        """Starts filling the pool of a configuration's profile.
+
+        Args:
+            config: Sandbox configuration with a ``pool_size``.
+            wait: Whether to wait until the pool is filled.
+        """
+        if config.pool_size <= 0 or config.backend != "docker":
+            return
+        key = _profile_key(config)
+        self._pool_configs[key] = config
+        self._pools.setdefault(key, deque())
+        self._schedule_refill(key)
+        if wait and key in self._refill_tasks:
+            await asyncio.shield(self._refill_tasks[key])
+
+    def _pooled_count(self) -> int:
+        return sum(len(pool) for pool in self._pools.values())
+
+    def _schedule_refill(self, key: ProfileKey) -> None:
+        """Starts refilling a pool unless a refill is already running."""
+        task = self._refill_tasks.get(key)
+        if self._is_shutting_down or (task and not task.done()):
+            return
+        self._refill_tasks[key] = asyncio.create_task(self._refill(key))
+
+    async def _refill(self, key: ProfileKey) -> None:
+        """Starts sandboxes until the pool is full or the sandbox limit is hit."""
+        config = self._pool_configs[key]
+        pool = self._pools[key]
+        if not await self.ensure_image(config.image):
+            return
+
+        while (
+            not self._is_shutting_down
+            and len(pool) < config.pool_size
+            and len(self._sandboxes) + self._pooled_count() < self.max_sandboxes
+        ):
+            sandbox = DockerSandbox(config)
+            try:
+                await sandbox.create()
+            except asyncio.CancelledError:
+                await sandbox.cleanup()
+                raise
+            except Exception as e:
+                logger.error(f"Failed to refill sandbox pool: {e}")
+                return  # Retried on the next checkout
+            if self._is_shutting_down:
+                await sandbox.cleanup()
+                return
+            pool.append(sandbox)
+            logger.debug(f"Sandbox pool {key[0]} has {len(pool)} ready")
+
+    async def release_sandbox(self, sandbox_id: str) -> None:
+        """Returns a sandbox that is no longer used.
+
+        A pooled sandbox whose configuration has ``pool_recycle`` set is
+        reset and returned to its pool if the pool has room. Any other
+        sandbox is deleted. The caller's lease, if any, ends.
+
+        Args:
+            sandbox_id: Sandbox ID.
+        """
+        self._leases.pop(sandbox_id, None)
+        key = self._profiles.get(sandbox_id)
+        config = self._pool_configs.get(key) if key else None
+        pool = self._pools.get(key) if key else None
+        if (
+            config is None
+            or not config.pool_recycle
+            or len(pool) >= config.pool_size
+            or sandbox_id in self._active_operations
+            or self._is_shutting_down
+        ):
+            await self.delete_sandbox(sandbox_id)
+            return
+
+        async with self._global_lock:
+            sandbox = self._forget(sandbox_id)
+        if sandbox is None:
+            return
+
+        try:
+            await sandbox.reset()
+        except Exception as e:
+            logger.warning(f"Failed to recycle sandbox {sandbox_id}, deleting it: {e}")
+            await sandbox.cleanup()
+            self._schedule_refill(key)
+            return
+        pool.append(sandbox)
+        self._recycled += 1
+        logger.info(f"Recycled sandbox {sandbox_id} into the pool")
+
+    async def snapshot_sandbox(
+        self, sandbox_id: str, include_system: bool = True
+    ) -> SandboxSnapshot:
+        """Saves the state of a sandbox.
+
+        Args:
+            sandbox_id: Sandbox ID.
+            include_system: Whether to commit the container filesystem in
+                addition to the working directory.
+
+        Returns:
+            SandboxSnapshot: The snapshot.
+
+        Raises:
+            KeyError: If sandbox does not exist.
+            RuntimeError: If the snapshot fails.
+        """
+        async with self.sandbox_operation(sandbox_id) as sandbox:
+            snapshot = await sandbox.snapshot(include_system)
+        self._snapshots[snapshot.snapshot_id] = snapshot
+        logger.info(
+            f"Snapshot {snapshot.snapshot_id} of sandbox {sandbox_id}: "
+            f"{snapshot.size / 1e6:.1f} MB in {snapshot.duration:.2f}s"
+        )
+        return snapshot
+
+    async def restore_sandbox(self, sandbox_id: str, snapshot_id: str) -> float:
+        """Rolls a sandbox back to a snapshot.
+
+        Args:
+            sandbox_id: Sandbox ID.
+            snapshot_id: Snapshot ID.
+
+        Returns:
+            float: Seconds the restore took.
+
+        Raises:
+            KeyError: If sandbox or snapshot does not exist.
+            RuntimeError: If the restore fails.
+        """
+        snapshot = self._get_snapshot(snapshot_id)
+        async with self.sandbox_operation(sandbox_id) as sandbox:
+            elapsed = await sandbox.restore(snapshot)
+        self._record_restore(elapsed)
+        logger.info(f"Restored sandbox {sandbox_id} to {snapshot_id} in {elapsed:.2f}s")
+        return elapsed
+
+    async def fork_sandbox(self, snapshot_id: str, count: int) -> List[str]:
+        """Creates sandboxes starting from the same snapshot.
+
+        The sandboxes are started in parallel from the snapshot image, or
+        from the original image if the snapshot has none, and get the
+        snapshot's working directory. They are never taken from a pool.
+
+        Args:
+            snapshot_id: Snapshot ID.
+            count: Number of sandboxes to create.
+
+        Returns:
+            List[str]: IDs of the new sandboxes.
+
+        Raises:
+            KeyError: If snapshot does not exist.
+            RuntimeError: If the sandbox limit would be exceeded even after
+                evicting idle sandboxes, or creation fails; sandboxes created
+                before the failure are deleted.
+        """
+        snapshot = self._get_snapshot(snapshot_id)
+        config = snapshot.config.model_copy(
+            update={"image": snapshot.image or snapshot.config.image, "pool_size": 0}
+        )
+        async with self._global_lock:
+            if count > self.max_sandboxes:
+                raise RuntimeError(
+                    f"Forking {count} sandboxes would exceed the maximum "
+                    f"({self.max_sandboxes})"
+                )
+            await self._make_room(count)
+            # Reserve the slots while the sandboxes start
+            sandbox_ids = [str(uuid.uuid4()) for _ in range(count)]
+            sandboxes = [DockerSandbox(config) for _ in range(count)]
+            for sandbox_id, sandbox in zip(sandbox_ids, sandboxes):
+                self._sandboxes[sandbox_id] = sandbox
+                self._touch(sandbox_id)
+                self._locks[sandbox_id] = asyncio.Lock()
+
+        async def start(sandbox: DockerSandbox) -> float:
+            begin = asyncio.get_event_loop().time()
+            await sandbox.create()
+            await sandbox.load_workspace(snapshot)
+            return asyncio.get_event_loop().time() - begin
+
+        results = await asyncio.gather(
+            *(start(sandbox) for sandbox in sandboxes), return_exceptions=True
+        )
+        errors = [r for r in results if isinstance(r, BaseException)]
+        if errors:
+            await asyncio.gather(
+                *(self.delete_sandbox(sandbox_id) for sandbox_id in sandbox_ids)
+            )
+            raise RuntimeError(f"Failed to fork sandbox: {errors[0]}")
+
+        for elapsed in results:
+            self._record_restore(elapsed)
+        logger.info(
+            f"Forked {count} sandboxes from snapshot {snapshot_id} "
+            f"in {max(results, default=0.0):.2f}s"
+        )
+        return sandbox_ids
+
+    async def delete_snapshot(self, snapshot_id: str) -> None:
+        """Removes a snapshot's image and archive.
+
+        Args:
+            snapshot_id: Snapshot ID.
+        """
+        snapshot = self._snapshots.pop(snapshot_id, None)
+        if snapshot:
+            await run_docker(snapshot.discard, self._client)
+
+    def _get_snapshot(self, snapshot_id: str) -> SandboxSnapshot:
+        snapshot = self._snapshots.get(snapshot_id)
+        if snapshot is None:
+            raise KeyError(f"Snapshot {snapshot_id} not found")
+        return snapshot
+
+    def _record_restore(self, elapsed: float) -> None:
+        self._restores += 1
+        self._restore_seconds += elapsed
+
     async def get_sandbox(self, sandbox_id: str) -> DockerSandbox:
         """Gets a sandbox instance.
 
@@ -184,17 +834,26 @@ class SandboxManager:
         self._cleanup_task = asyncio.create_task(cleanup_loop())
 
     async def _cleanup_idle_sandboxes(self) -> None:
-        """Cleans up idle sandboxes."""
-        current_time = asyncio.get_event_loop().time()
+        """Cleans up idle sandboxes.
+
+        Only the expired entries at the top of the expiry heap are visited.
+        Sandboxes in use are considered used now.
+        """
+        deadline = asyncio.get_event_loop().time() - self.idle_timeout
         to_cleanup = []
+        in_use = []
 
         async with self._global_lock:
-            for sandbox_id, last_used in self._last_used.items():
-                if (
-                    sandbox_id not in self._active_operations
-                    and current_time - last_used > self.idle_timeout
-                ):
-                    to_cleanup.append(sandbox_id)
+            while self._expiry and self._expiry[0][0] < deadline:
+                entry = heapq.heappop(self._expiry)
+                if self._is_stale(entry):
+                    continue
+                if self._in_use(entry[1]):
+                    in_use.append(entry[1])
+                else:
+                    to_cleanup.append(entry[1])
+            for sandbox_id in in_use:
+                self._touch(sandbox_id)
 
         for sandbox_id in to_cleanup:
             try:
@@ -207,13 +866,28 @@ class SandboxManager:
         logger.info("Starting manager cleanup...")
         self._is_shutting_down = True
 
-        # Cancel cleanup task
-        if self._cleanup_task:
-            self._cleanup_task.cancel()
-            try:
-                await asyncio.wait_for(self._cleanup_task, timeout=1.0)
-            except (asyncio.CancelledError, asyncio.TimeoutError):
-                pass
+        # Cancel cleanup and sampling tasks
+        for task in (self._cleanup_task, self._usage_task):
+            if task:
+                task.cancel()
+                try:
+                    await asyncio.wait_for(task, timeout=1.0)
+                except (asyncio.CancelledError, asyncio.TimeoutError):
+                    pass
+
+        # Stop refilling and destroy the ready sandboxes
+        refills = list(self._refill_tasks.values())
+        for task in refills:
+            task.cancel()
+        if refills:
+            await asyncio.gather(*refills, return_exceptions=True)
+        pooled = [sandbox for pool in self._pools.values() for sandbox in pool]
+        self._pools.clear()
+        self._refill_tasks.clear()
+        if pooled:
+            await asyncio.gather(
+                *(sandbox.cleanup() for sandbox in pooled), return_exceptions=True
+            )
 
         # Get all sandbox IDs to clean up
         async with self._global_lock:
@@ -235,8 +909,24 @@ class SandboxManager:
         # Clean up remaining references
         self._sandboxes.clear()
         self._last_used.clear()
+        self._expiry.clear()
+        self._sessions.clear()
+        self._session_of.clear()
+        self._session_locks.clear()
+        self._leases.clear()
         self._locks.clear()
         self._active_operations.clear()
+        self._profiles.clear()
+        self._usage.clear()
+        self._readings.clear()
+
+        # Remove snapshot images and archives
+        snapshot_ids = list(self._snapshots)
+        if snapshot_ids:
+            await asyncio.gather(
+                *(self.delete_snapshot(snapshot_id) for snapshot_id in snapshot_ids),
+                return_exceptions=True,
+            )
 
         logger.info("Manager cleanup completed")
 
@@ -267,9 +957,7 @@ class SandboxManager:
 
                 # Remove sandbox record from manager
                 async with self._global_lock:
-                    self._sandboxes.pop(sandbox_id, None)
-                    self._last_used.pop(sandbox_id, None)
-                    self._locks.pop(sandbox_id, None)
+                    self._forget(sandbox_id)
                     logger.info(f"Deleted sandbox {sandbox_id}")
         except Exception as e:
             logger.error(f"Error during cleanup of sandbox {sandbox_id}: {e}")
@@ -309,4 +997,26 @@ class SandboxManager:
             "idle_timeout": self.idle_timeout,
             "cleanup_interval": self.cleanup_interval,
             "is_shutting_down": self._is_shutting_down,
+            "pooled_sandboxes": self._pooled_count(),
+            "pool_hits": self._pool_hits,
+            "pool_misses": self._pool_misses,
+            "recycled_sandboxes": self._recycled,
+            "evicted_sandboxes": self._evicted,
+            "sessions": len(self._sessions),
+            "leased_sandboxes": len(self._leases),
+            "snapshots": len(self._snapshots),
+            "snapshot_bytes": sum(s.size for s in self._snapshots.values()),
+            "restores": self._restores,
+            "avg_restore_seconds": (
+                self._restore_seconds / self._restores if self._restores else 0.0
+            ),
+            "right_sized_sandboxes": self._right_sized,
+            **{
+                f"usage_{key}": value
+                for key, value in summarize(self._usage.values()).items()
+            },
+            "usage_by_sandbox": {
+                sandbox_id: window.summary()
+                for sandbox_id, window in self._usage.items()
+            },
         }
@@ -0,0 +1,1134 @@
+"""Sandboxes isolated by Linux namespaces instead of containers.
+
+A namespace sandbox is started by ``bwrap`` if installed, or else by
+``unshare`` and a short setup script, in new user, mount, PID, IPC, UTS
+and, without network access, network namespaces. Its root directory holds
+the host's system directories read-only, an /etc sharing only what
+commands need with the host, and private, writable working, home and
+temporary directories, so it starts in milliseconds instead of the
+second or so a container takes. The host kernel is shared, and the
+isolation is weaker than a container's; use the Docker backend for
+untrusted code that needs stronger guarantees.
+
+A long-lived init process keeps the namespaces alive. Shells, one-off
+commands and file transfers join them with ``nsenter``, so they share the
+processes, files and network of the sandbox just like Docker execs share a
+container. Memory is capped with rlimits, and memory, CPU and process
+count with a cgroup when cgroup v2 is delegated to the server.
+"""
+
+import asyncio
+import io
+import os
+import pty
+import shlex
+import shutil
+import stat
+import subprocess
+import sys
+import tarfile
+import tempfile
+import termios
+import threading
+import time
+import uuid
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
+
+from app.config import SandboxSettings
+from app.logger import logger
+from app.sandbox.core.exceptions import SandboxTimeoutError
+from app.sandbox.core.packages import WHEELHOUSE_PATH, package_cache_env
+from app.sandbox.core.sandbox import (
+    _STREAM_CHUNK_SIZE,
+    FileResult,
+    _ArchivePipe,
+    _unpack_copy,
+    _unpack_files,
+)
+from app.sandbox.core.terminal import (
+    CommandResult,
+    CommandStream,
+    ShellSession,
+    ShellTerminal,
+)
+from docker.utils import parse_bytes
+
+
+# Host directories shared read-only with every sandbox
+_SYSTEM_DIRS = ("usr", "bin", "sbin", "lib", "lib32", "lib64")
+
+# Entries of the host's /etc shared read-only: the dynamic linker's cache,
+# CA certificates, name resolution and the time zone. The rest of /etc,
+# e.g. host accounts and service configuration, stays hidden
+_ETC_ENTRIES = (
+    "alternatives",
+    "ld.so.cache",
+    "ld.so.conf",
+    "ld.so.conf.d",
+    "ssl/certs",
+    "ssl/openssl.cnf",
+    "pki/tls/certs",
+    "pki/ca-trust/extracted",
+    "resolv.conf",
+    "hosts",
+    "nsswitch.conf",
+    "localtime",
+)
+
+# Files generated in the sandbox's /etc instead of the host's
+_ETC_FILES = {
+    "passwd": (
+        "root:x:0:0:root:/root:/bin/sh\n"
+        "nobody:x:65534:65534:nobody:/nonexistent:/usr/sbin/nologin\n"
+    ),
+    "group": "root:x:0:\nnogroup:x:65534:\n",
+    "hostname": "sandbox\n",
+}
+
+# Host devices available in the sandbox's /dev
+_DEVICES = ("null", "zero", "full", "random", "urandom", "tty")
+
+# Search path inside the sandbox; the server's environment is not inherited
+_PATH = "/usr/local/sbin:/usr/local/bin:/usr/sbin:/usr/bin:/sbin:/bin"
+
+_CGROUP_ROOT = "/sys/fs/cgroup"
+
+# Processes per sandbox at most, when limited by a cgroup
+_MAX_PIDS = 1024
+
+# Seconds the sandbox's init process may take to start
+_START_TIMEOUT = 10
+
+# Printed by the init process once the sandbox is set up; it then waits
+# for its stdin to close, and stays a shell so it reaps orphaned processes
+_INIT_COMMAND = "echo ready; cat >/dev/null; exit 0"
+
+
+def namespace_tool() -> Optional[str]:
+    """Gets the program that creates sandbox namespaces on this host.
+
+    Returns:
+        Optional[str]: "bwrap" or "unshare", or None if namespace sandboxes
+            are not supported.
+    """
+    if not sys.platform.startswith("linux") or not shutil.which("nsenter"):
+        return None
+    for tool in ("bwrap", "unshare"):
+        if shutil.which(tool):
+            return tool
+    return None
+
+
+def _descendant(pid: int) -> int:
+    """Follows the first child of each process down to the last one."""
+    while True:
+        try:
+            with open(f"/proc/{pid}/task/{pid}/children") as f:
+                children = f.read().split()
+        except OSError:
+            return pid
+        if not children:
+            return pid
+        pid = int(children[0])
+
+
+def _create_cgroup(config: SandboxSettings) -> Optional[str]:
+    """Creates a cgroup limiting memory, CPU and processes of a sandbox.
+
+    Only possible on cgroup v2 when the server's cgroup is delegated to it,
+    e.g. by systemd; otherwise the sandbox runs with rlimits only.
+
+    Returns:
+        Optional[str]: Path of the cgroup, or None if unavailable.
+    """
+    try:
+        with open("/proc/self/cgroup") as f:
+            own = next(line for line in f if line.startswith("0::"))
+    except (OSError, StopIteration):
+        return None
+    parent = os.path.join(_CGROUP_ROOT, own[3:].strip().lstrip("/"))
+    if not os.path.exists(os.path.join(parent, "cgroup.controllers")):
+        return None
+
+    path = os.path.join(parent, f"sandbox_{uuid.uuid4().hex[:8]}")
+    try:
+        os.mkdir(path)
+    except OSError as e:
+        logger.debug(f"Sandbox cgroup unavailable: {e}")
+        return None
+    limits = {
+        "memory.max": str(parse_bytes(config.memory_limit)),
+        "cpu.max": f"{int(100000 * config.cpu_limit)} 100000",
+        "pids.max": str(_MAX_PIDS),
+    }
+    for name, value in limits.items():
+        try:
+            with open(os.path.join(path, name), "w") as f:
+                f.write(value)
+        except OSError as e:
+            logger.debug(f"Sandbox cgroup limit {name} not applied: {e}")
+    return path
+
+
+def _prepare_etc(etc_dir: str) -> List[Tuple[str, str]]:
+    """Writes the generated files of a sandbox's /etc into a directory.
+
+    Shared host entries get an empty file or directory to be mounted on.
+    Symbolic links are resolved on the host, as their targets, e.g. under
+    /run, may be missing in the sandbox.
+
+    Args:
+        etc_dir: Empty host directory mounted as the sandbox's /etc.
+
+    Returns:
+        List[Tuple[str, str]]: (host path, sandbox path) of the host
+            entries to mount.
+    """
+    for name, content in _ETC_FILES.items():
+        with open(os.path.join(etc_dir, name), "w") as f:
+            f.write(content)
+
+    mounts = []
+    for name in _ETC_ENTRIES:
+        source = os.path.realpath(os.path.join("/etc", name))
+        if not os.path.exists(source):
+            continue
+        target = os.path.join(etc_dir, name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.isdir(source):
+            os.mkdir(target)
+        else:
+            open(target, "w").close()
+        mounts.append((source, f"/etc/{name}"))
+    return mounts
+
+
+def _force_remove(func, path, exc_info) -> None:
+    """Makes read-only directories writable while removing a tree."""
+    parent = os.path.dirname(path)
+    try:
+        os.chmod(parent, os.stat(parent).st_mode | stat.S_IWUSR)
+        func(path)
+    except OSError:
+        pass
+
+
+class NamespaceSession(ShellSession):
+    """Interactive bash session in a namespace sandbox, driven over a pty.
+
+    The pty is the shell's controlling terminal, so interrupts are sent as
+    Ctrl-C like in a container. Reads and writes wait for readiness of the
+    pty in the event loop.
+    """
+
+    def __init__(self, sandbox: "NamespaceSandbox") -> None:
+        """Initializes a session.
+
+        Args:
+            sandbox: Sandbox the shell runs in.
+        """
+        super().__init__()
+        self.sandbox = sandbox
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self._fd: Optional[int] = None
+        self._waiter: Optional[asyncio.Future] = None
+
+    @property
+    def connected(self) -> bool:
+        return self._fd is not None
+
+    async def create(self, working_dir: str, env_vars: Dict[str, str]) -> None:
+        """Starts bash in the sandbox.
+
+        Args:
+            working_dir: Working directory inside the sandbox.
+            env_vars: Environment variables to set.
+
+        Raises:
+            RuntimeError: If the shell cannot be started.
+        """
+        master, slave = pty.openpty()
+        # No echo, so the pty carries nothing but command output
+        attrs = termios.tcgetattr(slave)
+        attrs[3] &= ~termios.ECHO
+        termios.tcsetattr(slave, termios.TCSANOW, attrs)
+        try:
+            self.process = await self.sandbox._spawn(
+                ["bash", "--norc", "--noprofile", "--noediting"],
+                env={**env_vars, "TERM": "dumb"},
+                working_dir=working_dir,
+                tty=True,
+                stdin=slave,
+                stdout=slave,
+                stderr=slave,
+            )
+        except OSError as e:
+            os.close(master)
+            raise RuntimeError(f"Failed to start shell: {e}") from e
+        finally:
+            os.close(slave)
+        os.set_blocking(master, False)
+        self._fd = master
+        await self._prepare()
+
+    async def close(self) -> None:
+        """Hangs up the pty, which ends the shell, and reaps it."""
+        fd, self._fd = self._fd, None
+        if fd is not None:
+            if self._waiter and not self._waiter.done():
+                self._waiter.set_result(None)
+            os.close(fd)
+        if self.process and self.process.returncode is None:
+            try:
+                await asyncio.wait_for(self.process.wait(), 1)
+            except asyncio.TimeoutError:
+                self.process.kill()
+                await self.process.wait()
+
+    async def _wait(self, writable: bool) -> None:
+        """Waits until the pty is readable or writable, or closed."""
+        loop = asyncio.get_running_loop()
+        fd = self._fd
+        self._waiter = waiter = loop.create_future()
+        add, remove = (
+            (loop.add_writer, loop.remove_writer)
+            if writable
+            else (loop.add_reader, loop.remove_reader)
+        )
+        add(fd, lambda: waiter.done() or waiter.set_result(None))
+        try:
+            await waiter
+        finally:
+            remove(fd)
+
+    async def _write(self, data: bytes) -> None:
+        view = memoryview(data)
+        while view:
+            if self._fd is None:
+                raise RuntimeError("Session closed")
+            try:
+                view = view[os.write(self._fd, view) :]
+            except BlockingIOError:
+                await self._wait(writable=True)
+
+    async def _recv(self) -> bytes:
+        """Receives output as soon as the pty is readable."""
+        while self._fd is not None:
+            try:
+                return os.read(self._fd, 65536)
+            except BlockingIOError:
+                await self._wait(writable=False)
+            except OSError:
+                return b""  # The shell exited
+        return b""
+
+    def _send_interrupt(self) -> None:
+        try:
+            os.write(self._fd, b"\x03")
+        except (TypeError, OSError):
+            pass
+
+
+class NamespaceTerminal(ShellTerminal):
+    """Command execution in a namespace sandbox, stateful or in parallel."""
+
+    def __init__(self, sandbox: "NamespaceSandbox", **kwargs) -> None:
+        """Initializes the terminal.
+
+        Args:
+            sandbox: Sandbox the commands run in.
+            **kwargs: Arguments of ``ShellTerminal``.
+        """
+        super().__init__(**kwargs)
+        self.sandbox = sandbox
+
+    def _new_session(self) -> NamespaceSession:
+        return NamespaceSession(self.sandbox)
+
+    async def exec_once(
+        self, cmd: Union[str, List[str]], timeout: Optional[int] = None
+    ) -> Tuple[int, str]:
+        """Runs a command as a separate process in the sandbox.
+
+        Args:
+            cmd: Argument list, or a shell command run by bash.
+            timeout: Maximum execution time in seconds; the command is
+                killed when it is exceeded.
+
+        Returns:
+            Tuple of (exit_code, output) with stdout and stderr combined.
+
+        Raises:
+            TimeoutError: If command execution exceeds timeout.
+        """
+        timeout = timeout or self.default_timeout
+        argv = ["bash", "-c", cmd] if isinstance(cmd, str) else list(cmd)
+        exit_code, output, _ = await self.sandbox._run(
+            ["timeout", "-k", "1", str(int(timeout)), *argv],
+            env=self.env_vars,
+            working_dir=self.working_dir,
+            merge_stderr=True,
+        )
+        if exit_code == 124:
+            raise TimeoutError(f"Command execution timed out after {timeout} seconds")
+        return exit_code, output.decode("utf-8", errors="replace")
+
+
+class NamespaceSandbox:
+    """Sandbox isolated by Linux namespaces.
+
+    Has the command and file API of ``DockerSandbox``. Files outside the
+    working directory, /tmp, the home directory /root and volume bindings
+    are read-only or private to one process, so packages are installed
+    with ``pip install --user``. Snapshots are not supported.
+
+    Attributes:
+        config: Sandbox configuration.
+        volume_bindings: Volume mapping configuration.
+        terminal: Sandbox terminal interface.
+        container: Always None; there is no container to sample.
+    """
+
+    def __init__(
+        self,
+        config: Optional[SandboxSettings] = None,
+        volume_bindings: Optional[Dict[str, str]] = None,
+    ):
+        """Initializes a sandbox instance.
+
+        Args:
+            config: Sandbox configuration. Default configuration used if None.
+            volume_bindings: Volume mappings in {host_path: container_path} format.
+        """
+        self.config = config or SandboxSettings()
+        self.volume_bindings = volume_bindings or {}
+        self.terminal: Optional[NamespaceTerminal] = None
+        self.container = None
+        self._root: Optional[str] = None
+        self._etc_mounts: List[Tuple[str, str]] = []
+        self._cgroup: Optional[str] = None
+        self._init: Optional[asyncio.subprocess.Process] = None
+        self._target: Optional[int] = None  # Host PID of a process inside
+        self._env = {
+            "PYTHONUNBUFFERED": "1",
+            **package_cache_env(self.config),
+        }
+
+    async def create(self) -> "NamespaceSandbox":
+        """Sets up the namespaces and starts the sandbox shell.
+
+        Returns:
+            Current sandbox instance.
+
+        Raises:
+            RuntimeError: If namespaces are not supported or setup fails.
+        """
+        tool = namespace_tool()
+        if tool is None:
+            raise RuntimeError(
+                "Failed to create sandbox: namespace sandboxes need Linux with "
+                "bwrap or unshare, and nsenter"
+            )
+        try:
+            self._root = tempfile.mkdtemp(prefix="sandbox_ns_")
+            for name in ("fs", "etc", "work", "tmp", "home"):
+                os.mkdir(os.path.join(self._root, name))
+            os.chmod(os.path.join(self._root, "tmp"), 0o1777)
+            self._etc_mounts = _prepare_etc(os.path.join(self._root, "etc"))
+            self._cgroup = _create_cgroup(self.config)
+
+            argv = self._bwrap_args() if tool == "bwrap" else self._unshare_args()
+            self._init = await asyncio.create_subprocess_exec(
+                *self._limited(argv),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                env=self._environment(),
+            )
+            line = await asyncio.wait_for(self._init.stdout.readline(), _START_TIMEOUT)
+            if line.strip() != b"ready":
+                error = (await self._init.stderr.read()).decode(errors="replace")
+                raise RuntimeError(f"{tool} failed: {error.strip()}")
+            self._target = _descendant(self._init.pid)
+
+            self.terminal = NamespaceTerminal(
+                self,
+                working_dir=self.config.work_dir,
+                env_vars=self._env,
+                max_sessions=self.config.exec_sessions,
+                max_output=self.config.max_output,
+            )
+            await self.terminal.init()
+            return self
+
+        except Exception as e:
+            await self.cleanup()
+            raise RuntimeError(f"Failed to create sandbox: {e}") from e
+
+    def _writable_mounts(self) -> List[Tuple[str, str, bool]]:
+        """Lists (host path, sandbox path, read-only) of the bound directories."""
+        mounts = [
+            (os.path.join(self._root, "work"), self.config.work_dir, False),
+            (os.path.join(self._root, "tmp"), "/tmp", False),
+            (os.path.join(self._root, "home"), "/root", False),
+        ]
+        for host_path, container_path in self.volume_bindings.items():
+            mounts.append((os.path.abspath(host_path), container_path, False))
+        if self.config.package_cache_dir:
+            cache_dir = os.path.abspath(
+                os.path.expanduser(self.config.package_cache_dir)
+            )
+            if os.path.isdir(cache_dir):
+                mounts.append((cache_dir, WHEELHOUSE_PATH, True))
+        return mounts
+
+    def _bwrap_args(self) -> List[str]:
+        """Builds the ``bwrap`` command starting the init process."""
+        args = [
+            shutil.which("bwrap"),
+            "--unshare-all",
+            "--unshare-user",
+            "--uid",
+            "0",
+            "--gid",
+            "0",
+            "--die-with-parent",
+            "--hostname",
+            "sandbox",
+        ]
+        if self.config.network_enabled:
+            args.append("--share-net")
+        for name in _SYSTEM_DIRS:
+            path = f"/{name}"
+            if os.path.islink(path):
+                args += ["--symlink", os.readlink(path), path]
+            elif os.path.isdir(path):
+                args += ["--ro-bind", path, path]
+        args += ["--ro-bind", os.path.join(self._root, "etc"), "/etc"]
+        for host_path, sandbox_path in self._etc_mounts:
+            args += ["--ro-bind", host_path, sandbox_path]
+        args += ["--proc", "/proc", "--dev", "/dev"]
+        for host_path, container_path, read_only in self._writable_mounts():
+            args += ["--ro-bind" if read_only else "--bind", host_path, container_path]
+        args += ["--chdir", self.config.work_dir, "sh", "-c", _INIT_COMMAND]
+        return args
+
+    def _unshare_args(self) -> List[str]:
+        """Builds the ``unshare`` command and setup script of the init process.
+
+        The script mounts a private tmpfs as the new root, binds the system
+        directories and the sandbox's /etc read-only, devices and
+        directories into it, and changes root to it.
+        """
+        q = shlex.quote
+        lines = [
+            "set -e",
+            f"r={q(os.path.join(self._root, 'fs'))}",
+            'mount -t tmpfs -o mode=755 tmpfs "$r"',
+        ]
+        for name in _SYSTEM_DIRS:
+            path = f"/{name}"
+            if os.path.islink(path):
+                lines.append(f'ln -s {q(os.readlink(path))} "$r{path}"')
+            elif os.path.isdir(path):
+                lines += [
+                    f'mkdir "$r{path}"',
+                    f'mount --rbind {path} "$r{path}"',
+                    f'mount -o remount,bind,ro "$r{path}"',
+                ]
+        etc_mounts = [(os.path.join(self._root, "etc"), "/etc"), *self._etc_mounts]
+        lines.append('mkdir "$r/etc"')
+        for host_path, sandbox_path in etc_mounts:
+            lines += [
+                f'mount --rbind {q(host_path)} "$r"{q(sandbox_path)}',
+                f'mount -o remount,bind,ro "$r"{q(sandbox_path)}',
+            ]
+        lines += [
+            'mkdir "$r/proc" "$r/dev"',
+            # Fails where /proc is partly masked, e.g. in containers
+            'mount -t proc proc "$r/proc" || true',
+            'mount -t tmpfs -o mode=755 tmpfs "$r/dev"',
+            'mkdir "$r/dev/shm" "$r/dev/pts"',
+            'ln -s /proc/self/fd "$r/dev/fd"',
+        ]
+        for device in _DEVICES:
+            lines += [
+                f'touch "$r/dev/{device}"',
+                f'mount --bind /dev/{device} "$r/dev/{device}"',
+            ]
+        for host_path, container_path, read_only in self._writable_mounts():
+            target = f'"$r"{q(container_path)}'
+            if os.path.isdir(host_path):
+                lines.append(f"mkdir -p {target}")
+            else:
+                lines.append(f"mkdir -p $(dirname {target}) && touch {target}")
+            lines.append(f"mount --rbind {q(host_path)} {target}")
+            if read_only:
+                lines.append(f"mount -o remount,bind,ro {target}")
+        # The init process runs in the working directory, which commands
+        # joining the sandbox start in
+        init = f"cd {q(self.config.work_dir)} && {_INIT_COMMAND}"
+        lines += [
+            "hostname sandbox",
+            f'cd "$r" && exec chroot . /bin/sh -c {q(init)}',
+        ]
+        args = [
+            shutil.which("unshare"),
+            "--user",
+            "--map-root-user",
+            "--mount",
+            "--pid",
+            "--fork",
+            "--kill-child",
+            "--ipc",
+            "--uts",
+        ]
+        if not self.config.network_enabled:
+            args.append("--net")
+        return args + ["/bin/sh", "-c", "\n".join(lines)]
+
+    def _limited(self, argv: List[str], tty: bool = False) -> List[str]:
+        """Prefixes a host command with the resource limits of the sandbox.
+
+        Args:
+            argv: Command to run.
+            tty: Whether the command's stdin becomes its controlling terminal.
+
+        Returns:
+            List[str]: Command applying rlimits, joining the cgroup if any,
+                then running ``argv``.
+        """
+        # Data segment rather than address space, which runtimes reserve
+        # far beyond their use
+        memory_kb = parse_bytes(self.config.memory_limit) // 1024
+        script = f"ulimit -c 0; ulimit -d {memory_kb}; "
+        if self._cgroup:
+            procs = shlex.quote(os.path.join(self._cgroup, "cgroup.procs"))
+            script += f"echo $$ 2>/dev/null >{procs} || true; "
+        script += 'exec "$@"'
+        prefix = [shutil.which("setsid"), "--ctty"] if tty else []
+        return prefix + ["/bin/sh", "-c", script, "sh", *argv]
+
+    def _environment(self, env: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """Gets the environment of sandbox processes, without the server's."""
+        return {"PATH": _PATH, "HOME": "/root", "LANG": "C.UTF-8", **(env or {})}
+
+    async def _spawn(
+        self,
+        argv: List[str],
+        env: Optional[Dict[str, str]] = None,
+        working_dir: Optional[str] = None,
+        tty: bool = False,
+        **kwargs,
+    ) -> asyncio.subprocess.Process:
+        """Starts a process in the sandbox's namespaces and root directory.
+
+        Args:
+            argv: Command to run in the sandbox.
+            env: Environment variables to set.
+            working_dir: Directory to start in, by default the working one.
+            tty: Whether stdin is a terminal to make the controlling one.
+            **kwargs: Arguments of ``asyncio.create_subprocess_exec``.
+
+        Returns:
+            asyncio.subprocess.Process: The process.
+
+        Raises:
+            RuntimeError: If sandbox not initialized.
+        """
+        if self._target is None:
+            raise RuntimeError("Sandbox not initialized")
+        nsenter = [
+            shutil.which("nsenter"),
+            "--target",
+            str(self._target),
+            "--all",
+            "--root",
+            "--wd",  # That of the init process, the working directory
+            "--",
+        ]
+        if working_dir and working_dir != self.config.work_dir:
+            argv = ["/bin/sh", "-c", 'cd "$0" && exec "$@"', working_dir, *argv]
+        return await asyncio.create_subprocess_exec(
+            *self._limited(nsenter + argv, tty),
+            env=self._environment(env),
+            **kwargs,
+        )
+
+    async def _run(
+        self,
+        argv: List[str],
+        input: Optional[bytes] = None,
+        env: Optional[Dict[str, str]] = None,
+        working_dir: Optional[str] = None,
+        merge_stderr: bool = False,
+    ) -> Tuple[int, bytes, bytes]:
+        """Runs a process in the sandbox and collects its output.
+
+        Args:
+            argv: Command to run in the sandbox.
+            input: Data written to its stdin.
+            env: Environment variables to set.
+            working_dir: Directory to start in, by default the working one.
+            merge_stderr: Whether stderr is part of stdout.
+
+        Returns:
+            Tuple of (exit_code, stdout, stderr).
+        """
+        process = await self._spawn(
+            argv,
+            {**self._env, **(env or {})},
+            working_dir,
+            stdin=subprocess.PIPE if input is not None else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT if merge_stderr else subprocess.PIPE,
+        )
+        try:
+            stdout, stderr = await process.communicate(input)
+        except asyncio.CancelledError:
+            process.kill()
+            raise
+        return process.returncode, stdout, stderr or b""
+
+    async def run_command(
+        self, cmd: str, timeout: Optional[int] = None, stateful: bool = True
+    ) -> str:
+        """Runs a command in the sandbox.
+
+        Args:
+            cmd: Command to execute.
+            timeout: Timeout in seconds.
+            stateful: Whether to run in the main shell, keeping its state
+                and waiting for earlier commands, or in parallel in a
+                subshell of a pooled shell.
+
+        Returns:
+            Command output as string.
+
+        Raises:
+            RuntimeError: If sandbox not initialized or command execution fails.
+            SandboxTimeoutError: If command execution times out.
+        """
+        return (await self.execute(cmd, timeout, stateful)).output.strip()
+
+    async def execute(
+        self, cmd: str, timeout: Optional[int] = None, stateful: bool = True
+    ) -> CommandResult:
+        """Runs a command and returns its exit status and separate output.
+
+        Args:
+            cmd: Command to execute.
+            timeout: Timeout in seconds.
+            stateful: Whether to run in the main shell or in parallel.
+
+        Returns:
+            CommandResult: Exit status, stdout, stderr and duration.
+
+        Raises:
+            RuntimeError: If sandbox not initialized or command execution fails.
+            SandboxTimeoutError: If command execution times out.
+        """
+        if not self.terminal:
+            raise RuntimeError("Sandbox not initialized")
+
+        timeout = timeout or self.config.timeout
+        try:
+            return await self.terminal.execute(cmd, timeout, stateful)
+        except TimeoutError:
+            raise SandboxTimeoutError(
+                f"Command execution timed out after {timeout} seconds"
+            )
+
+    def stream(
+        self, cmd: str, timeout: Optional[int] = None, stateful: bool = True
+    ) -> CommandStream:
+        """Runs a command, streaming its stdout as it arrives.
+
+        Args:
+            cmd: Command to execute.
+            timeout: Timeout in seconds.
+            stateful: Whether to run in the main shell or in parallel.
+
+        Returns:
+            CommandStream: Stdout chunks, then the result. Iterating raises
+                SandboxTimeoutError if the command times out.
+
+        Raises:
+            RuntimeError: If sandbox not initialized.
+        """
+        if not self.terminal:
+            raise RuntimeError("Sandbox not initialized")
+
+        timeout = timeout or self.config.timeout
+        stream = self.terminal.stream(cmd, timeout, stateful)
+
+        async def chunks() -> AsyncIterator[str]:
+            try:
+                async for chunk in stream:
+                    yield chunk
+            except TimeoutError:
+                raise SandboxTimeoutError(
+                    f"Command execution timed out after {timeout} seconds"
+                )
+            finally:
+                await stream.aclose()
+
+        return CommandStream(chunks(), stream.result)
+
+    async def exec_once(
+        self, cmd: Union[str, List[str]], timeout: Optional[int] = None
+    ) -> Tuple[int, str]:
+        """Runs a stateless command as its own process, without waiting for shells.
+
+        Args:
+            cmd: Argument list, or a shell command run by bash.
+            timeout: Timeout in seconds.
+
+        Returns:
+            Tuple of (exit_code, output).
+
+        Raises:
+            RuntimeError: If sandbox not initialized.
+            SandboxTimeoutError: If command execution times out.
+        """
+        if not self.terminal:
+            raise RuntimeError("Sandbox not initialized")
+
+        try:
+            return await self.terminal.exec_once(
+                cmd, timeout=timeout or self.config.timeout
+            )
+        except TimeoutError as e:
+            raise SandboxTimeoutError(str(e))
+
+    def _safe_resolve_path(self, path: str) -> str:
+        """Resolves a sandbox path, rejecting path traversal.
+
+        Args:
+            path: Original path.
+
+        Returns:
+            Resolved absolute path.
+
+        Raises:
+            ValueError: If path contains potentially unsafe patterns.
+        """
+        if ".." in path.split("/"):
+            raise ValueError("Path contains potentially unsafe patterns")
+        return os.path.normpath(os.path.join(self.config.work_dir, path))
+
+    async def read_file(self, path: str) -> str:
+        """Reads a file from the sandbox.
+
+        Args:
+            path: File path.
+
+        Returns:
+            File contents as string.
+
+        Raises:
+            FileNotFoundError: If file does not exist.
+            RuntimeError: If read operation fails.
+        """
+        try:
+            exit_code, content, error = await self._run(
+                ["cat", "--", self._safe_resolve_path(path)]
+            )
+        except Exception as e:
+            raise RuntimeError(f"Failed to read file: {e}")
+        if exit_code != 0:
+            if b"No such file" in error:
+                raise FileNotFoundError(f"File not found: {path}")
+            raise RuntimeError(f"Failed to read file: {error.decode().strip()}")
+        try:
+            return content.decode("utf-8")
+        except UnicodeDecodeError as e:
+            raise RuntimeError(f"Failed to read file: {e}")
+
+    async def _extract(self, archive: bytes) -> None:
+        """Extracts a tar archive at the sandbox root, creating parents."""
+        exit_code, _, error = await self._run(
+            ["tar", "-xf", "-", "-C", "/", "--no-same-owner"], input=archive
+        )
+        if exit_code != 0:
+            raise RuntimeError(error.decode(errors="replace").strip())
+
+    async def write_file(self, path: str, content: str) -> None:
+        """Writes content to a file in the sandbox.
+
+        Args:
+            path: Target path.
+            content: File content.
+
+        Raises:
+            RuntimeError: If write operation fails.
+        """
+        result = (await self.write_files({path: content}))[0]
+        if not result.ok:
+            raise RuntimeError(result.error)
+
+    async def read_files(self, paths: List[str]) -> List[FileResult]:
+        """Reads several files from the sandbox with one ``tar`` process.
+
+        Args:
+            paths: File paths.
+
+        Returns:
+            List[FileResult]: Content or error of each file, in order.
+
+        Raises:
+            RuntimeError: If sandbox not initialized or the archive fails.
+        """
+        results = [FileResult(path=path) for path in paths]
+        members: Dict[str, List[FileResult]] = {}
+        for result in results:
+            try:
+                name = self._safe_resolve_path(result.path).lstrip("/")
+                members.setdefault(name, []).append(result)
+            except ValueError as e:
+                result.error = str(e)
+        if not members:
+            return results
+
+        try:
+            # Missing files fail tar, which still archives the others
+            _, archive, _ = await self._run(
+                ["tar", "-cf", "-", "-C", "/", "--", *members]
+            )
+            contents = (
+                await asyncio.to_thread(
+                    _unpack_files, io.BytesIO(archive), list(members)
+                )
+                if archive
+                else {}
+            )
+        except Exception as e:
+            raise RuntimeError(f"Failed to read files: {e}")
+
+        for name, entries in members.items():
+            content = contents.get(name)
+            for result in entries:
+                if content is None:
+                    result.error = f"File not found: {result.path}"
+                elif isinstance(content, Exception):
+                    result.error = str(content)
+                else:
+                    result.content = content
+        return results
+
+    async def write_files(self, files: Dict[str, str]) -> List[FileResult]:
+        """Writes several files to the sandbox with one ``tar`` process.
+
+        Missing parent directories are created. Either all valid files are
+        written or all of them report the same error.
+
+        Args:
+            files: Content by file path.
+
+        Returns:
+            List[FileResult]: Outcome of each file, in order.
+        """
+        results = []
+        archive = io.BytesIO()
+        mtime = int(time.time())
+        with tarfile.open(fileobj=archive, mode="w") as tar:
+            for path, content in files.items():
+                result = FileResult(path=path)
+                results.append(result)
+                try:
+                    name = self._safe_resolve_path(path).lstrip("/")
+                except ValueError as e:
+                    result.error = str(e)
+                    continue
+                data = content.encode("utf-8")
+                tarinfo = tarfile.TarInfo(name=name)
+                tarinfo.size = len(data)
+                tarinfo.mtime = mtime
+                tar.addfile(tarinfo, io.BytesIO(data))
+
+        written = [result for result in results if result.ok]
+        if written:
+            try:
+                await self._extract(archive.getvalue())
+            except Exception as e:
+                for result in written:
+                    result.error = f"Failed to write file: {e}"
+        return results
+
+    async def copy_from(self, src_path: str, dst_path: str) -> None:
+        """Copies a file or directory from the sandbox.
+
+        The archive is unpacked while ``tar`` in the sandbox produces it.
+
+        Args:
+            src_path: Source file path (sandbox).
+            dst_path: Destination path (host).
+
+        Raises:
+            FileNotFoundError: If source file does not exist.
+            RuntimeError: If copy operation fails.
+        """
+        try:
+            parent_dir = os.path.dirname(dst_path)
+            if parent_dir:
+                os.makedirs(parent_dir, exist_ok=True)
+
+            resolved = self._safe_resolve_path(src_path)
+            process = await self._spawn(
+                [
+                    "tar",
+                    "-cf",
+                    "-",
+                    "-C",
+                    os.path.dirname(resolved),
+                    "--",
+                    os.path.basename(resolved),
+                ],
+                self._env,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+            try:
+                first = await process.stdout.read(_STREAM_CHUNK_SIZE)
+                if not first:
+                    raise FileNotFoundError(f"Source file not found: {src_path}")
+                loop = asyncio.get_running_loop()
+
+                def chunks():
+                    yield first
+                    while chunk := asyncio.run_coroutine_threadsafe(
+                        process.stdout.read(_STREAM_CHUNK_SIZE), loop
+                    ).result():
+                        yield chunk
+
+                await asyncio.to_thread(_unpack_copy, chunks(), src_path, dst_path)
+            finally:
+                if process.returncode is None:
+                    process.kill()
+                await process.wait()
+
+        except FileNotFoundError:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Failed to copy file: {e}")
+
+    async def copy_to(self, src_path: str, dst_path: str) -> None:
+        """Copies a file or directory to the sandbox.
+
+        The archive is generated while ``tar`` in the sandbox extracts it,
+        with at most a few chunks of it in memory. Missing parent
+        directories are created.
+
+        Args:
+            src_path: Source file path (host).
+            dst_path: Destination path (sandbox).
+
+        Raises:
+            FileNotFoundError: If source file does not exist.
+            RuntimeError: If copy operation fails.
+        """
+        try:
+            if not os.path.exists(src_path):
+                raise FileNotFoundError(f"Source file not found: {src_path}")
+
+            # Entries carry the full destination path and are extracted at "/"
+            arcname = self._safe_resolve_path(dst_path).lstrip("/")
+            process = await self._spawn(
+                ["tar", "-xf", "-", "-C", "/", "--no-same-owner"],
+                self._env,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+            )
+            pipe = _ArchivePipe()
+            producer = threading.Thread(
+                target=pipe.produce,
+                args=([(src_path, arcname)],),
+                name="sandbox-copy-to",
+                daemon=True,
+            )
+            producer.start()
+            try:
+                chunks = pipe.chunks()
+                while chunk := await asyncio.to_thread(next, chunks, b""):
+                    process.stdin.write(chunk)
+                    await process.stdin.drain()
+                process.stdin.close()
+                _, error = await process.communicate()
+            finally:
+                pipe.close()
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+                await asyncio.to_thread(producer.join)
+            if process.returncode != 0:
+                raise RuntimeError(error.decode(errors="replace").strip())
+
+        except FileNotFoundError:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Failed to copy file: {e}")
+
+    async def snapshot(self, include_system: bool = True):
+        """Not supported: namespace sandboxes keep no image to commit to.
+
+        Raises:
+            RuntimeError: Always.
+        """
+        raise RuntimeError("Snapshots need the Docker sandbox backend")
+
+    async def restore(self, snapshot) -> float:
+        """Not supported, as snapshots of Docker sandboxes need Docker.
+
+        Raises:
+            RuntimeError: Always.
+        """
+        raise RuntimeError("Restoring snapshots needs the Docker sandbox backend")
+
+    async def cleanup(self) -> None:
+        """Cleans up sandbox resources.
+
+        Closing the init process's stdin ends it, and with it every process
+        of the sandbox.
+        """
+        errors = []
+        if self.terminal:
+            try:
+                await self.terminal.close()
+            except Exception as e:
+                errors.append(f"Terminal cleanup error: {e}")
+            finally:
+                self.terminal = None
+
+        init, self._init, self._target = self._init, None, None
+        if init and init.returncode is None:
+            try:
+                init.stdin.close()
+                await asyncio.wait_for(init.wait(), 5)
+            except Exception:
+                init.kill()
+                await init.wait()
+
+        cgroup, self._cgroup = self._cgroup, None
+        if cgroup:
+            try:
+                os.rmdir(cgroup)
+            except OSError as e:
+                errors.append(f"Cgroup remove error: {e}")
+
+        root, self._root = self._root, None
+        if root:
+            # Trees written as another mapped user may not be removable
+            await asyncio.to_thread(shutil.rmtree, root, onerror=_force_remove)
+
+        if errors:
+            print(f"Warning: Errors during cleanup: {', '.join(errors)}")
+
+    async def __aenter__(self) -> "NamespaceSandbox":
+        """Async context manager entry."""
+        return await self.create()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        """Async context manager exit."""
+        await self.cleanup()
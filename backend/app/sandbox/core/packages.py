@@ -0,0 +1,166 @@
+"""Host wheelhouse shared read-only by all sandboxes.
+
+Sandboxes usually run without network access, so packages cannot be
+installed from an index. Instead, a host directory of wheels built from a
+requirements manifest is mounted read-only into every sandbox, and pip is
+configured to find packages there. The wheelhouse is built once in a
+temporary container with network access, and rebuilt only when the
+manifest or the sandbox image changes.
+"""
+
+import hashlib
+import os
+import threading
+from typing import Dict, Optional
+
+from app.config import SandboxSettings
+from app.logger import logger
+from app.sandbox.core.docker_client import get_docker_client, run_docker
+
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+
+# Where the wheelhouse is mounted in sandboxes
+WHEELHOUSE_PATH = "/opt/wheelhouse"
+
+# Hash of the image and manifest the wheelhouse was last built from
+_MANIFEST_HASH_FILE = ".manifest-sha256"
+_LOCK_FILE = ".lock"
+
+# Requirements path inside the build container
+_REQUIREMENTS_PATH = "/tmp/requirements.txt"
+
+_lock = threading.Lock()
+
+
+def package_cache_env(config: SandboxSettings) -> Dict[str, str]:
+    """Gets the environment variables pointing pip at the wheelhouse.
+
+    Without network access, pip is restricted to the wheelhouse, so
+    installs fail fast instead of retrying an unreachable index.
+
+    Args:
+        config: Sandbox configuration.
+
+    Returns:
+        Dict[str, str]: Variables to set in sandbox commands, empty if no
+            wheelhouse is configured.
+    """
+    if not config.package_cache_dir:
+        return {}
+    env = {
+        "PIP_FIND_LINKS": WHEELHOUSE_PATH,
+        "PIP_DISABLE_PIP_VERSION_CHECK": "1",
+    }
+    if not config.network_enabled:
+        env["PIP_NO_INDEX"] = "1"
+    return env
+
+
+def _manifest_hash(config: SandboxSettings) -> str:
+    """Hashes the sandbox image and requirements manifest.
+
+    Wheels depend on the Python version and platform of the image, so a
+    different image needs a rebuild too.
+    """
+    digest = hashlib.sha256(config.image.encode())
+    digest.update(b"\0")
+    with open(config.package_requirements, "rb") as f:
+        digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _read_manifest_hash(cache_dir: str) -> Optional[str]:
+    try:
+        with open(os.path.join(cache_dir, _MANIFEST_HASH_FILE)) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def _build_wheelhouse(config: SandboxSettings, cache_dir: str) -> bool:
+    """Builds wheels of the manifest into the cache directory if outdated.
+
+    Blocking: runs in a worker thread. A file lock keeps several server
+    processes from building the same wheelhouse at once.
+
+    Returns:
+        bool: Whether the wheelhouse was rebuilt.
+
+    Raises:
+        RuntimeError: If ``pip wheel`` fails.
+    """
+    expected = _manifest_hash(config)
+    if _read_manifest_hash(cache_dir) == expected:
+        return False
+
+    with _lock, open(os.path.join(cache_dir, _LOCK_FILE), "w") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        if _read_manifest_hash(cache_dir) == expected:
+            return False  # Built by another process meanwhile
+
+        logger.info(f"Building sandbox wheelhouse in {cache_dir}")
+        # Wheels of earlier manifests are kept: sandboxes may be installing
+        # from the wheelhouse, and unused wheels are harmless
+        container = get_docker_client().containers.run(
+            config.image,
+            [
+                "pip",
+                "wheel",
+                "--no-cache-dir",
+                "--wheel-dir",
+                WHEELHOUSE_PATH,
+                "-r",
+                _REQUIREMENTS_PATH,
+            ],
+            volumes={
+                cache_dir: {"bind": WHEELHOUSE_PATH, "mode": "rw"},
+                os.path.abspath(config.package_requirements): {
+                    "bind": _REQUIREMENTS_PATH,
+                    "mode": "ro",
+                },
+            },
+            network_mode="bridge",
+            detach=True,
+        )
+        try:
+            status = container.wait()
+            if status.get("StatusCode") != 0:
+                logs = container.logs(stdout=False, stderr=True)
+                error = logs.decode("utf-8", errors="replace").strip()
+                raise RuntimeError(f"Failed to build wheelhouse: {error[-2000:]}")
+        finally:
+            container.remove(force=True)
+
+        with open(os.path.join(cache_dir, _MANIFEST_HASH_FILE), "w") as f:
+            f.write(expected)
+        return True
+
+
+async def prepare_package_cache(config: SandboxSettings) -> Optional[str]:
+    """Ensures the wheelhouse is ready before a sandbox mounts it.
+
+    Without a requirements manifest, the directory is mounted as is, so it
+    can also be filled by other means.
+
+    Args:
+        config: Sandbox configuration.
+
+    Returns:
+        Optional[str]: Host path of the wheelhouse, or None if no wheelhouse
+            is configured.
+
+    Raises:
+        RuntimeError: If building the wheelhouse fails.
+    """
+    if not config.package_cache_dir:
+        return None
+    cache_dir = os.path.abspath(os.path.expanduser(config.package_cache_dir))
+    os.makedirs(cache_dir, exist_ok=True)
+    if config.package_requirements:
+        await run_docker(_build_wheelhouse, config, cache_dir)
+    return cache_dir
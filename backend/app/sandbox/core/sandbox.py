@@ -1,17 +1,271 @@
 import asyncio
 import io
 import os
+import queue
+import shlex
+import shutil
 import tarfile
 import tempfile
+import threading
+import time
 import uuid
-from typing import Dict, Optional
+from typing import (
+    IO,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 import docker
 from app.config import SandboxSettings
+from app.sandbox.core.docker_client import get_docker_client, run_docker
 from app.sandbox.core.exceptions import SandboxTimeoutError
-from app.sandbox.core.terminal import AsyncDockerizedTerminal
+from app.sandbox.core.packages import (
+    WHEELHOUSE_PATH,
+    package_cache_env,
+    prepare_package_cache,
+)
+from app.sandbox.core.terminal import (
+    AsyncDockerizedTerminal,
+    CommandResult,
+    CommandStream,
+)
 from docker.errors import NotFound
 from docker.models.containers import Container
+from pydantic import BaseModel
+
+
+# Archives up to this size are kept in memory instead of a temporary file
+_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# Size of the chunks streamed archives are handed over in
+_STREAM_CHUNK_SIZE = 1024 * 1024
+
+# Chunks of a streamed upload buffered ahead of the Docker request
+_STREAM_QUEUE_SIZE = 8
+
+# Repository of the images sandbox snapshots are committed to
+SNAPSHOT_REPOSITORY = "openmanus-snapshot"
+
+# Reject links and devices escaping the destination where supported
+_EXTRACT_OPTIONS = {"filter": "data"} if hasattr(tarfile, "data_filter") else {}
+
+
+class _ChunkReader(io.RawIOBase):
+    """Readable file over an iterator of byte chunks, such as a Docker stream."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._view = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._view:
+            try:
+                self._view = memoryview(next(self._chunks))
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self._view))
+        buffer[:size] = self._view[:size]
+        self._view = self._view[size:]
+        return size
+
+
+class _ArchivePipe:
+    """Tar archive produced by one thread and consumed by another.
+
+    ``produce`` writes the archive in fixed-size chunks to a bounded queue
+    and ``chunks`` yields them, so memory use does not depend on the size of
+    the archived tree.
+    """
+
+    def __init__(self):
+        self._queue: "queue.Queue[object]" = queue.Queue(_STREAM_QUEUE_SIZE)
+        self._buffer = bytearray()
+        self._closed = threading.Event()
+
+    def write(self, data: bytes) -> int:
+        self._buffer += data
+        if len(self._buffer) >= _STREAM_CHUNK_SIZE:
+            self._put(bytes(self._buffer))
+            self._buffer.clear()
+        return len(data)
+
+    def _put(self, item: object) -> None:
+        """Queues an item, giving up once the consumer has stopped."""
+        while not self._closed.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+        raise BrokenPipeError("Archive consumer stopped")
+
+    def produce(self, entries: List[Tuple[str, str]]) -> None:
+        """Archives files or directory trees; runs in the producer thread.
+
+        Args:
+            entries: Pairs of host path and name in the archive.
+        """
+        try:
+            with tarfile.open(fileobj=self, mode="w|") as tar:
+                for src_path, arcname in entries:
+                    tar.add(src_path, arcname=arcname)
+            if self._buffer:
+                self._put(bytes(self._buffer))
+            self._put(None)
+        except BrokenPipeError:
+            pass
+        except Exception as e:
+            try:
+                self._put(e)
+            except BrokenPipeError:
+                pass
+
+    def chunks(self) -> Iterator[bytes]:
+        """Yields the archive as it is produced."""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def close(self) -> None:
+        """Stops the producer if the consumer gave up early."""
+        self._closed.set()
+
+
+def _unpack_files(fileobj: IO[bytes], names: List[str]) -> Dict[str, object]:
+    """Decodes the requested regular files of a tar archive.
+
+    Args:
+        fileobj: Seekable archive.
+        names: Archived names of the files.
+
+    Returns:
+        Dict[str, object]: Decoded content, or the exception raised decoding
+            it, per archived name. Missing files are absent.
+    """
+    contents: Dict[str, object] = {}
+    wanted = set(names)
+    with tarfile.open(fileobj=fileobj) as tar:
+        for member in tar:
+            if member.name not in wanted:
+                continue  # Contents of a requested directory
+            file_content = tar.extractfile(member)
+            if file_content is None:
+                contents[member.name] = RuntimeError(
+                    f"Not a regular file: /{member.name}"
+                )
+                continue
+            try:
+                contents[member.name] = file_content.read().decode("utf-8")
+            except UnicodeDecodeError as e:
+                contents[member.name] = e
+    return contents
+
+
+def _unpack_copy(chunks: Iterable[bytes], src_path: str, dst_path: str) -> None:
+    """Unpacks the archive of a sandbox path to the host while receiving it.
+
+    Args:
+        chunks: Archive of the source path, as ``docker cp`` produces it.
+        src_path: Source path (sandbox).
+        dst_path: Destination path (host).
+    """
+    with tarfile.open(fileobj=_ChunkReader(chunks), mode="r|") as tar:
+        # If destination is a directory, preserve the relative path structure
+        if os.path.isdir(dst_path):
+            for member in tar:
+                tar.extract(member, dst_path, **_EXTRACT_OPTIONS)
+            return
+
+        # Otherwise only the content of a single source file is extracted
+        member = tar.next()
+        if member is None:
+            raise FileNotFoundError(f"Source file is empty: {src_path}")
+        src_file = tar.extractfile(member)
+        if src_file is None:
+            raise RuntimeError(
+                f"Source path is a directory but destination is a file: {src_path}"
+            )
+        with open(dst_path, "wb") as dst:
+            shutil.copyfileobj(src_file, dst, _STREAM_CHUNK_SIZE)
+
+
+class FileResult(BaseModel):
+    """Outcome of one file in a batched transfer.
+
+    Attributes:
+        path: Path as given by the caller.
+        content: File content, for successful reads.
+        error: Why the file could not be transferred, or None on success.
+    """
+
+    path: str
+    content: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class SandboxSnapshot(BaseModel):
+    """Saved state of a sandbox that sandboxes can be restored to or forked from.
+
+    Attributes:
+        snapshot_id: Unique snapshot identifier.
+        config: Configuration of the sandbox the snapshot was taken of.
+        image: Image the container filesystem was committed to, or None if
+            only the working directory was saved.
+        workspace_archive: Host path of the working directory archive.
+        image_bytes: Size of the committed layer.
+        workspace_bytes: Size of the working directory archive.
+        duration: Seconds taking the snapshot took.
+        created_at: Unix time the snapshot was taken.
+    """
+
+    snapshot_id: str
+    config: SandboxSettings
+    image: Optional[str] = None
+    workspace_archive: str
+    image_bytes: int = 0
+    workspace_bytes: int = 0
+    duration: float = 0.0
+    created_at: float
+
+    @property
+    def size(self) -> int:
+        """Total size of the snapshot in bytes."""
+        return self.image_bytes + self.workspace_bytes
+
+    def discard(self, client: docker.DockerClient) -> None:
+        """Removes the image and archive of the snapshot.
+
+        Blocking: runs the Docker call in the calling thread.
+
+        Args:
+            client: Docker client the image was committed with.
+        """
+        if self.image:
+            try:
+                client.images.remove(self.image, force=True)
+            except NotFound:
+                pass
+        try:
+            os.remove(self.workspace_archive)
+        except FileNotFoundError:
+            pass
 
 
 class DockerSandbox:
@@ -41,9 +295,10 @@ class DockerSandbox:
         """
         self.config = config or SandboxSettings()
         self.volume_bindings = volume_bindings or {}
-        self.client = docker.from_env()
+        self.client = get_docker_client()
         self.container: Optional[Container] = None
         self.terminal: Optional[AsyncDockerizedTerminal] = None
+        self._package_cache_dir: Optional[str] = None
 
     async def create(self) -> "DockerSandbox":
         """Creates and starts the sandbox container.
@@ -56,50 +311,256 @@ class DockerSandbox:
             RuntimeError: If container creation or startup fails.
         """
         try:
-            # Prepare container config
-            host_config = self.client.api.create_host_config(
-                mem_limit=self.config.memory_limit,
-                cpu_period=100000,
-                cpu_quota=int(100000 * self.config.cpu_limit),
-                network_mode="none" if not self.config.network_enabled else "bridge",
-                binds=self._prepare_volume_bindings(),
-            )
+            self._package_cache_dir = await prepare_package_cache(self.config)
+            await self._start_container(self.config.image)
+            return self
 
-            # Generate unique container name with sandbox_ prefix
-            container_name = f"sandbox_{uuid.uuid4().hex[:8]}"
-
-            # Create container
-            container = await asyncio.to_thread(
-                self.client.api.create_container,
-                image=self.config.image,
-                command="tail -f /dev/null",
-                hostname="sandbox",
-                working_dir=self.config.work_dir,
-                host_config=host_config,
-                name=container_name,
-                tty=True,
-                detach=True,
-            )
+        except Exception as e:
+            await self.cleanup()  # Ensure resources are cleaned up
+            raise RuntimeError(f"Failed to create sandbox: {e}") from e
 
-            self.container = self.client.containers.get(container["Id"])
+    async def _start_container(self, image: str) -> None:
+        """Creates and starts a container from an image and opens its terminal.
 
-            # Start container
-            await asyncio.to_thread(self.container.start)
+        Args:
+            image: Image to run.
+        """
+        # Prepare container config
+        host_config = self.client.api.create_host_config(
+            mem_limit=self.config.memory_limit,
+            cpu_period=100000,
+            cpu_quota=int(100000 * self.config.cpu_limit),
+            network_mode="none" if not self.config.network_enabled else "bridge",
+            binds=self._prepare_volume_bindings(),
+        )
 
-            # Initialize terminal
-            self.terminal = AsyncDockerizedTerminal(
-                container["Id"],
-                self.config.work_dir,
-                env_vars={"PYTHONUNBUFFERED": "1"}
-                # Ensure Python output is not buffered
-            )
-            await self.terminal.init()
+        # Generate unique container name with sandbox_ prefix
+        container_name = f"sandbox_{uuid.uuid4().hex[:8]}"
+
+        # Create container
+        container = await run_docker(
+            self.client.api.create_container,
+            image=image,
+            command="tail -f /dev/null",
+            hostname="sandbox",
+            working_dir=self.config.work_dir,
+            host_config=host_config,
+            name=container_name,
+            tty=True,
+            detach=True,
+        )
 
-            return self
+        self.container = self.client.containers.get(container["Id"])
+
+        # Start container
+        await run_docker(self.container.start)
+
+        await self._open_terminal()
 
+    async def _open_terminal(self) -> None:
+        """Opens a fresh terminal session in the container."""
+        self.terminal = AsyncDockerizedTerminal(
+            self.container.id,
+            self.config.work_dir,
+            # Ensure Python output is not buffered, and pip uses the wheelhouse
+            env_vars={"PYTHONUNBUFFERED": "1", **package_cache_env(self.config)},
+            max_sessions=self.config.exec_sessions,
+            max_output=self.config.max_output,
+        )
+        await self.terminal.init()
+
+    async def reset(self) -> None:
+        """Restores the sandbox to a clean state so it can be reused.
+
+        Kills every process except the container's init process, empties the
+        working directory and /tmp, and opens a new terminal, so no state
+        of the previous user remains apart from system-wide changes such as
+        installed packages.
+
+        Raises:
+            RuntimeError: If sandbox not initialized or the reset fails.
+        """
+        if not self.container:
+            raise RuntimeError("Sandbox not initialized")
+
+        if self.terminal:
+            await self.terminal.close()
+            self.terminal = None
+
+        work_dir = shlex.quote(self.config.work_dir)
+        exit_code, output = await run_docker(
+            self.container.exec_run,
+            ["sh", "-c", f"kill -9 -1; find {work_dir} /tmp -mindepth 1 -delete"],
+            user="root",
+        )
+        if exit_code != 0:
+            error = output.decode("utf-8", errors="replace")
+            raise RuntimeError(f"Failed to reset sandbox: {error}")
+
+        await self._open_terminal()
+
+    async def snapshot(self, include_system: bool = True) -> SandboxSnapshot:
+        """Saves the state of the sandbox.
+
+        The working directory is a volume, which ``docker commit`` skips, so
+        it is archived by tar in the container and kept in a host file.
+        With ``include_system`` the rest of the container filesystem, such
+        as installed packages, is committed to an image as well. Running
+        processes are not saved.
+
+        Args:
+            include_system: Whether to commit the container filesystem too.
+
+        Returns:
+            SandboxSnapshot: The snapshot, with its size and creation time.
+
+        Raises:
+            RuntimeError: If sandbox not initialized or the snapshot fails.
+        """
+        if not self.container:
+            raise RuntimeError("Sandbox not initialized")
+
+        start = time.perf_counter()
+        snapshot_id = uuid.uuid4().hex[:12]
+        fd, archive = tempfile.mkstemp(prefix=f"sandbox_snapshot_{snapshot_id}_")
+        os.close(fd)
+        snapshot = SandboxSnapshot(
+            snapshot_id=snapshot_id,
+            config=self.config,
+            workspace_archive=archive,
+            created_at=time.time(),
+        )
+        try:
+            snapshot.workspace_bytes = await run_docker(self._save_workspace, archive)
+            if include_system:
+                image = await run_docker(
+                    self.container.commit,
+                    repository=SNAPSHOT_REPOSITORY,
+                    tag=snapshot_id,
+                )
+                snapshot.image = f"{SNAPSHOT_REPOSITORY}:{snapshot_id}"
+                history = await run_docker(image.history)
+                snapshot.image_bytes = history[0].get("Size", 0) if history else 0
         except Exception as e:
-            await self.cleanup()  # Ensure resources are cleaned up
-            raise RuntimeError(f"Failed to create sandbox: {e}") from e
+            await run_docker(snapshot.discard, self.client)
+            raise RuntimeError(f"Failed to snapshot sandbox: {e}") from e
+
+        snapshot.duration = time.perf_counter() - start
+        return snapshot
+
+    def _save_workspace(self, archive: str) -> int:
+        """Streams a tar archive of the working directory to a host file.
+
+        Blocking: the exec output is consumed in the calling thread.
+
+        Returns:
+            int: Archive size in bytes.
+        """
+        result = self.container.exec_run(
+            ["tar", "-cf", "-", "-C", self.config.work_dir, "."],
+            stdout=True,
+            stderr=False,
+            stream=True,
+        )
+        with open(archive, "wb") as f:
+            for chunk in result.output:
+                f.write(chunk)
+            return f.tell()
+
+    async def restore(self, snapshot: SandboxSnapshot) -> float:
+        """Rolls the sandbox back to a snapshot.
+
+        A snapshot with an image replaces the container with a new one
+        started from it; otherwise only the working directory is replaced.
+        Either way the sandbox gets a new terminal.
+
+        Args:
+            snapshot: Snapshot to restore.
+
+        Returns:
+            float: Seconds the restore took.
+
+        Raises:
+            RuntimeError: If sandbox not initialized or the restore fails.
+        """
+        if not self.container:
+            raise RuntimeError("Sandbox not initialized")
+
+        start = time.perf_counter()
+        try:
+            if self.terminal:
+                await self.terminal.close()
+                self.terminal = None
+            if snapshot.image:
+                old_container = self.container
+                try:
+                    await self._start_container(snapshot.image)
+                except Exception:
+                    await self._revert_container(old_container)
+                    raise
+                await run_docker(old_container.remove, force=True)
+                await self.load_workspace(snapshot)
+            else:
+                await self.load_workspace(snapshot)
+                await self._open_terminal()
+        except Exception as e:
+            raise RuntimeError(f"Failed to restore sandbox: {e}") from e
+        return time.perf_counter() - start
+
+    async def _revert_container(self, old_container: Container) -> None:
+        """Goes back to the old container after starting a new one failed.
+
+        The new container, if it was created, is removed, and the old one
+        gets a new terminal, so the sandbox stays usable.
+
+        Args:
+            old_container: Container the sandbox used before.
+        """
+        new_container, self.container = self.container, old_container
+        if self.terminal:
+            try:
+                await self.terminal.close()
+            except Exception:
+                pass
+            self.terminal = None
+        if new_container is not old_container:
+            try:
+                await run_docker(new_container.remove, force=True)
+            except Exception as e:
+                print(f"Warning: Failed to remove container {new_container.id}: {e}")
+        await self._open_terminal()
+
+    async def load_workspace(self, snapshot: SandboxSnapshot) -> None:
+        """Replaces the working directory with the one saved in a snapshot.
+
+        Args:
+            snapshot: Snapshot to take the working directory from.
+
+        Raises:
+            RuntimeError: If emptying the working directory fails.
+        """
+        exit_code, output = await run_docker(
+            self.container.exec_run,
+            ["find", self.config.work_dir, "-mindepth", "1", "-delete"],
+            user="root",
+        )
+        if exit_code != 0:
+            error = output.decode("utf-8", errors="replace")
+            raise RuntimeError(f"Failed to empty working directory: {error}")
+        await run_docker(self._load_archive, snapshot.workspace_archive)
+
+    def _load_archive(self, archive: str) -> None:
+        """Streams a host tar archive into the working directory.
+
+        Blocking: runs in a worker thread.
+        """
+
+        def chunks() -> Iterator[bytes]:
+            with open(archive, "rb") as f:
+                while chunk := f.read(_STREAM_CHUNK_SIZE):
+                    yield chunk
+
+        self.container.put_archive(self.config.work_dir, chunks())
 
     def _prepare_volume_bindings(self) -> Dict[str, Dict[str, str]]:
         """Prepares volume binding configuration.
@@ -117,6 +578,10 @@ class DockerSandbox:
         for host_path, container_path in self.volume_bindings.items():
             bindings[host_path] = {"bind": container_path, "mode": "rw"}
 
+        # Share the wheelhouse, read-only so no sandbox can tamper with it
+        if self._package_cache_dir:
+            bindings[self._package_cache_dir] = {"bind": WHEELHOUSE_PATH, "mode": "ro"}
+
         return bindings
 
     @staticmethod
@@ -136,12 +601,17 @@ class DockerSandbox:
         os.makedirs(host_path, exist_ok=True)
         return host_path
 
-    async def run_command(self, cmd: str, timeout: Optional[int] = None) -> str:
+    async def run_command(
+        self, cmd: str, timeout: Optional[int] = None, stateful: bool = True
+    ) -> str:
         """Runs a command in the sandbox.
 
         Args:
             cmd: Command to execute.
             timeout: Timeout in seconds.
+            stateful: Whether to run in the main shell, keeping its state
+                and waiting for earlier commands, or in parallel in a
+                subshell of a pooled shell.
 
         Returns:
             Command output as string.
@@ -153,15 +623,104 @@ class DockerSandbox:
         if not self.terminal:
             raise RuntimeError("Sandbox not initialized")
 
+        run = self.terminal.run_command if stateful else self.terminal.run_parallel
         try:
-            return await self.terminal.run_command(
-                cmd, timeout=timeout or self.config.timeout
-            )
+            return await run(cmd, timeout=timeout or self.config.timeout)
         except TimeoutError:
             raise SandboxTimeoutError(
                 f"Command execution timed out after {timeout or self.config.timeout} seconds"
             )
 
+    async def execute(
+        self, cmd: str, timeout: Optional[int] = None, stateful: bool = True
+    ) -> CommandResult:
+        """Runs a command and returns its exit status and separate output.
+
+        Args:
+            cmd: Command to execute.
+            timeout: Timeout in seconds.
+            stateful: Whether to run in the main shell or in parallel.
+
+        Returns:
+            CommandResult: Exit status, stdout, stderr and duration.
+
+        Raises:
+            RuntimeError: If sandbox not initialized or command execution fails.
+            SandboxTimeoutError: If command execution times out.
+        """
+        if not self.terminal:
+            raise RuntimeError("Sandbox not initialized")
+
+        timeout = timeout or self.config.timeout
+        try:
+            return await self.terminal.execute(cmd, timeout, stateful)
+        except TimeoutError:
+            raise SandboxTimeoutError(
+                f"Command execution timed out after {timeout} seconds"
+            )
+
+    def stream(
+        self, cmd: str, timeout: Optional[int] = None, stateful: bool = True
+    ) -> CommandStream:
+        """Runs a command, streaming its stdout as it arrives.
+
+        Args:
+            cmd: Command to execute.
+            timeout: Timeout in seconds.
+            stateful: Whether to run in the main shell or in parallel.
+
+        Returns:
+            CommandStream: Stdout chunks, then the result. Iterating raises
+                SandboxTimeoutError if the command times out.
+
+        Raises:
+            RuntimeError: If sandbox not initialized.
+        """
+        if not self.terminal:
+            raise RuntimeError("Sandbox not initialized")
+
+        timeout = timeout or self.config.timeout
+        stream = self.terminal.stream(cmd, timeout, stateful)
+
+        async def chunks() -> AsyncIterator[str]:
+            try:
+                async for chunk in stream:
+                    yield chunk
+            except TimeoutError:
+                raise SandboxTimeoutError(
+                    f"Command execution timed out after {timeout} seconds"
+                )
+            finally:
+                await stream.aclose()
+
+        return CommandStream(chunks(), stream.result)
+
+    async def exec_once(
+        self, cmd: Union[str, List[str]], timeout: Optional[int] = None
+    ) -> Tuple[int, str]:
+        """Runs a stateless command as its own exec, without waiting for shells.
+
+        Args:
+            cmd: Argument list, or a shell command run by bash.
+            timeout: Timeout in seconds.
+
+        Returns:
+            Tuple of (exit_code, output).
+
+        Raises:
+            RuntimeError: If sandbox not initialized.
+            SandboxTimeoutError: If command execution times out.
+        """
+        if not self.terminal:
+            raise RuntimeError("Sandbox not initialized")
+
+        try:
+            return await self.terminal.exec_once(
+                cmd, timeout=timeout or self.config.timeout
+            )
+        except TimeoutError as e:
+            raise SandboxTimeoutError(str(e))
+
     async def read_file(self, path: str) -> str:
         """Reads a file from the container.
 
@@ -179,14 +738,8 @@ class DockerSandbox:
             raise RuntimeError("Sandbox not initialized")
 
         try:
-            # Get file archive
             resolved_path = self._safe_resolve_path(path)
-            tar_stream, _ = await asyncio.to_thread(
-                self.container.get_archive, resolved_path
-            )
-
-            # Read file content from tar stream
-            content = await self._read_from_tar(tar_stream)
+            content = await run_docker(self._read_archive, resolved_path)
             return content.decode("utf-8")
 
         except NotFound:
@@ -209,25 +762,137 @@ class DockerSandbox:
 
         try:
             resolved_path = self._safe_resolve_path(path)
-            parent_dir = os.path.dirname(resolved_path)
 
-            # Create parent directory
-            if parent_dir:
-                await self.run_command(f"mkdir -p {parent_dir}")
-
-            # Prepare file data
+            # Entries are extracted relative to "/", and Docker creates
+            # missing parent directories, so no mkdir round-trip is needed
             tar_stream = await self._create_tar_stream(
-                os.path.basename(path), content.encode("utf-8")
-            )
-
-            # Write file
-            await asyncio.to_thread(
-                self.container.put_archive, parent_dir or "/", tar_stream
+                resolved_path.lstrip("/"), content.encode("utf-8")
             )
+            await run_docker(self.container.put_archive, "/", tar_stream)
 
         except Exception as e:
             raise RuntimeError(f"Failed to write file: {e}")
 
+    async def read_files(self, paths: List[str]) -> List[FileResult]:
+        """Reads several files from the container in one archive.
+
+        The files are packed by a single ``tar`` exec, whatever their number
+        and location.
+
+        Args:
+            paths: File paths.
+
+        Returns:
+            List[FileResult]: Content or error of each file, in order.
+
+        Raises:
+            RuntimeError: If sandbox not initialized or the archive fails.
+        """
+        if not self.container:
+            raise RuntimeError("Sandbox not initialized")
+
+        results = [FileResult(path=path) for path in paths]
+        members: Dict[str, List[FileResult]] = {}
+        for result in results:
+            try:
+                name = os.path.normpath(self._safe_resolve_path(result.path))
+                name = name.lstrip("/")
+                members.setdefault(name, []).append(result)
+            except ValueError as e:
+                result.error = str(e)
+        if not members:
+            return results
+
+        try:
+            contents = await run_docker(self._read_archive_batch, list(members))
+        except Exception as e:
+            raise RuntimeError(f"Failed to read files: {e}")
+
+        for name, entries in members.items():
+            content = contents.get(name)
+            for result in entries:
+                if content is None:
+                    result.error = f"File not found: {result.path}"
+                elif isinstance(content, Exception):
+                    result.error = str(content)
+                else:
+                    result.content = content
+        return results
+
+    def _read_archive_batch(self, names: List[str]) -> Dict[str, object]:
+        """Archives files with tar in the container and unpacks the result.
+
+        Blocking: the exec output is consumed in the calling thread.
+
+        Args:
+            names: File paths relative to the root directory.
+
+        Returns:
+            Dict[str, object]: Decoded content, or the exception raised
+                decoding it, per archived name. Missing files are absent.
+        """
+        result = self.container.exec_run(
+            ["tar", "-cf", "-", "-C", "/", "--", *names],
+            stdout=True,
+            stderr=False,
+            stream=True,
+        )
+        with tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX_SIZE) as tmp:
+            for chunk in result.output:
+                tmp.write(chunk)
+            if not tmp.tell():
+                return {}  # None of the files exist
+            tmp.seek(0)
+            return _unpack_files(tmp, names)
+
+    async def write_files(self, files: Dict[str, str]) -> List[FileResult]:
+        """Writes several files to the container in one archive.
+
+        Missing parent directories are created. The archive is extracted by
+        a single Docker API call, so either all valid files are written or
+        all of them report the same error.
+
+        Args:
+            files: Content by file path.
+
+        Returns:
+            List[FileResult]: Outcome of each file, in order.
+
+        Raises:
+            RuntimeError: If sandbox not initialized.
+        """
+        if not self.container:
+            raise RuntimeError("Sandbox not initialized")
+
+        results = []
+        tar_stream = io.BytesIO()
+        mtime = int(time.time())
+        with tarfile.open(fileobj=tar_stream, mode="w") as tar:
+            for path, content in files.items():
+                result = FileResult(path=path)
+                results.append(result)
+                try:
+                    name = os.path.normpath(self._safe_resolve_path(path))
+                    name = name.lstrip("/")
+                except ValueError as e:
+                    result.error = str(e)
+                    continue
+                data = content.encode("utf-8")
+                tarinfo = tarfile.TarInfo(name=name)
+                tarinfo.size = len(data)
+                tarinfo.mtime = mtime
+                tar.addfile(tarinfo, io.BytesIO(data))
+
+        written = [result for result in results if result.ok]
+        if written:
+            tar_stream.seek(0)
+            try:
+                await run_docker(self.container.put_archive, "/", tar_stream)
+            except Exception as e:
+                for result in written:
+                    result.error = f"Failed to write file: {e}"
+        return results
+
     def _safe_resolve_path(self, path: str) -> str:
         """Safely resolves container path, preventing path traversal.
 
@@ -254,6 +919,9 @@ class DockerSandbox:
     async def copy_from(self, src_path: str, dst_path: str) -> None:
         """Copies a file from the container.
 
+        The archive is unpacked while it is received, so neither a
+        temporary file nor the whole archive in memory is needed.
+
         Args:
             src_path: Source file path (container).
             dst_path: Destination path (host).
@@ -268,52 +936,33 @@ class DockerSandbox:
             if parent_dir:
                 os.makedirs(parent_dir, exist_ok=True)
 
-            # Get file stream
             resolved_src = self._safe_resolve_path(src_path)
-            stream, stat = await asyncio.to_thread(
-                self.container.get_archive, resolved_src
-            )
-
-            # Create temporary directory to extract file
-            with tempfile.TemporaryDirectory() as tmp_dir:
-                # Write stream to temporary file
-                tar_path = os.path.join(tmp_dir, "temp.tar")
-                with open(tar_path, "wb") as f:
-                    for chunk in stream:
-                        f.write(chunk)
-
-                # Extract file
-                with tarfile.open(tar_path) as tar:
-                    members = tar.getmembers()
-                    if not members:
-                        raise FileNotFoundError(f"Source file is empty: {src_path}")
-
-                    # If destination is a directory, we should preserve relative path structure
-                    if os.path.isdir(dst_path):
-                        tar.extractall(dst_path)
-                    else:
-                        # If destination is a file, we only extract the source file's content
-                        if len(members) > 1:
-                            raise RuntimeError(
-                                f"Source path is a directory but destination is a file: {src_path}"
-                            )
-
-                        with open(dst_path, "wb") as dst:
-                            src_file = tar.extractfile(members[0])
-                            if src_file is None:
-                                raise RuntimeError(
-                                    f"Failed to extract file: {src_path}"
-                                )
-                            dst.write(src_file.read())
+            await run_docker(self._copy_from_stream, resolved_src, dst_path)
 
         except docker.errors.NotFound:
             raise FileNotFoundError(f"Source file not found: {src_path}")
         except Exception as e:
             raise RuntimeError(f"Failed to copy file: {e}")
 
+    def _copy_from_stream(self, src_path: str, dst_path: str) -> None:
+        """Unpacks the archive of a container path while receiving it.
+
+        Blocking: runs in a worker thread.
+
+        Args:
+            src_path: Resolved source path (container).
+            dst_path: Destination path (host).
+        """
+        stream, _ = self.container.get_archive(src_path)
+        _unpack_copy(stream, src_path, dst_path)
+
     async def copy_to(self, src_path: str, dst_path: str) -> None:
         """Copies a file to the container.
 
+        The archive is generated while it is uploaded, with at most a few
+        chunks of it in memory. Missing parent directories are created by
+        Docker while extracting it.
+
         Args:
             src_path: Source file path (host).
             dst_path: Destination path (container).
@@ -326,47 +975,21 @@ class DockerSandbox:
             if not os.path.exists(src_path):
                 raise FileNotFoundError(f"Source file not found: {src_path}")
 
-            # Create destination directory in container
-            resolved_dst = self._safe_resolve_path(dst_path)
-            container_dir = os.path.dirname(resolved_dst)
-            if container_dir:
-                await self.run_command(f"mkdir -p {container_dir}")
-
-            # Create tar file to upload
-            with tempfile.TemporaryDirectory() as tmp_dir:
-                tar_path = os.path.join(tmp_dir, "temp.tar")
-                with tarfile.open(tar_path, "w") as tar:
-                    # Handle directory source path
-                    if os.path.isdir(src_path):
-                        os.path.basename(src_path.rstrip("/"))
-                        for root, _, files in os.walk(src_path):
-                            for file in files:
-                                file_path = os.path.join(root, file)
-                                arcname = os.path.join(
-                                    os.path.basename(dst_path),
-                                    os.path.relpath(file_path, src_path),
-                                )
-                                tar.add(file_path, arcname=arcname)
-                    else:
-                        # Add single file to tar
-                        tar.add(src_path, arcname=os.path.basename(dst_path))
-
-                # Read tar file content
-                with open(tar_path, "rb") as f:
-                    data = f.read()
-
-                # Upload to container
-                await asyncio.to_thread(
-                    self.container.put_archive,
-                    os.path.dirname(resolved_dst) or "/",
-                    data,
-                )
-
-                # Verify file was created successfully
-                try:
-                    await self.run_command(f"test -e {resolved_dst}")
-                except Exception:
-                    raise RuntimeError(f"Failed to verify file creation: {dst_path}")
+            # Entries carry the full destination path and are extracted at "/"
+            arcname = self._safe_resolve_path(dst_path).lstrip("/")
+            pipe = _ArchivePipe()
+            producer = threading.Thread(
+                target=pipe.produce,
+                args=([(src_path, arcname)],),
+                name="sandbox-copy-to",
+                daemon=True,
+            )
+            producer.start()
+            try:
+                await run_docker(self.container.put_archive, "/", pipe.chunks())
+            finally:
+                pipe.close()
+                await asyncio.to_thread(producer.join)
 
         except FileNotFoundError:
             raise
@@ -388,37 +1011,39 @@ class DockerSandbox:
         with tarfile.open(fileobj=tar_stream, mode="w") as tar:
             tarinfo = tarfile.TarInfo(name=name)
             tarinfo.size = len(content)
+            tarinfo.mtime = int(time.time())
             tar.addfile(tarinfo, io.BytesIO(content))
         tar_stream.seek(0)
         return tar_stream
 
-    @staticmethod
-    async def _read_from_tar(tar_stream) -> bytes:
-        """Reads file content from a tar stream.
+    def _read_archive(self, path: str) -> bytes:
+        """Reads a file from the container through the archive API.
+
+        Blocking: the Docker response is consumed in the calling thread.
+        Small archives never touch the disk.
 
         Args:
-            tar_stream: Tar file stream.
+            path: Resolved file path.
 
         Returns:
             File content.
 
         Raises:
-            RuntimeError: If read operation fails.
+            docker.errors.NotFound: If the file does not exist.
+            RuntimeError: If the path is not a regular file.
         """
-        with tempfile.NamedTemporaryFile() as tmp:
-            for chunk in tar_stream:
+        stream, _ = self.container.get_archive(path)
+        with tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX_SIZE) as tmp:
+            for chunk in stream:
                 tmp.write(chunk)
             tmp.seek(0)
-
             with tarfile.open(fileobj=tmp) as tar:
                 member = tar.next()
                 if not member:
                     raise RuntimeError("Empty tar archive")
-
                 file_content = tar.extractfile(member)
                 if not file_content:
-                    raise RuntimeError("Failed to extract file content")
-
+                    raise RuntimeError(f"Not a regular file: {path}")
                 return file_content.read()
 
     async def cleanup(self) -> None:
@@ -435,12 +1060,12 @@ class DockerSandbox:
 
             if self.container:
                 try:
-                    await asyncio.to_thread(self.container.stop, timeout=5)
+                    await run_docker(self.container.stop, timeout=5)
                 except Exception as e:
                     errors.append(f"Container stop error: {e}")
 
                 try:
-                    await asyncio.to_thread(self.container.remove, force=True)
+                    await run_docker(self.container.remove, force=True)
                 except Exception as e:
                     errors.append(f"Container remove error: {e}")
                 finally:
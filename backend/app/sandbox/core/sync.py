@@ -0,0 +1,345 @@
+"""Incremental synchronization of a host directory with a sandbox directory."""
+
+import asyncio
+import hashlib
+import os
+import stat
+import tarfile
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.logger import logger
+from app.sandbox.core.docker_client import run_docker
+from app.sandbox.core.sandbox import (
+    _EXTRACT_OPTIONS,
+    _STREAM_CHUNK_SIZE,
+    DockerSandbox,
+    _ArchivePipe,
+    _ChunkReader,
+)
+from pydantic import BaseModel, Field
+
+
+# Paths passed to one exec at most, well below the argument size limit
+_EXEC_BATCH_SIZE = 500
+
+# Directories never synchronized
+DEFAULT_EXCLUDE = ("__pycache__", ".venv", "node_modules", ".git")
+
+
+class SyncResult(BaseModel):
+    """Changes applied by one synchronization.
+
+    Paths are relative to the synchronized directories.
+    """
+
+    uploaded: List[str] = Field(default_factory=list)
+    downloaded: List[str] = Field(default_factory=list)
+    deleted_on_host: List[str] = Field(default_factory=list)
+    deleted_in_sandbox: List[str] = Field(default_factory=list)
+    conflicts: List[str] = Field(default_factory=list)
+    bytes_transferred: int = 0
+    duration: float = 0.0
+
+    @property
+    def changed(self) -> bool:
+        """Whether any file was transferred or deleted."""
+        return bool(
+            self.uploaded
+            or self.downloaded
+            or self.deleted_on_host
+            or self.deleted_in_sandbox
+        )
+
+
+class WorkspaceSync:
+    """Keeps a host directory and a sandbox directory in sync.
+
+    Each side is described by a manifest of file content hashes. Hashes are
+    cached by size and modification time, so only files touched since the
+    last synchronization are read again, and in the container they are
+    computed by a single ``sha256sum`` exec. Comparing both manifests with
+    the one agreed on by the last synchronization tells which side changed
+    a file: changes are transferred in one archive per direction and
+    deletions are propagated. Files changed on both sides are conflicts,
+    resolved in favour of ``prefer``; a modification always wins over a
+    deletion.
+
+    Attributes:
+        sandbox: Sandbox to synchronize with.
+        host_root: Host directory.
+        container_root: Directory in the container.
+        exclude: Names of files and directories never synchronized.
+        prefer: Side winning conflicts, "sandbox" or "host".
+    """
+
+    def __init__(
+        self,
+        sandbox: DockerSandbox,
+        host_root: str,
+        container_root: Optional[str] = None,
+        exclude: Iterable[str] = DEFAULT_EXCLUDE,
+        prefer: str = "sandbox",
+    ):
+        """Initializes the synchronization.
+
+        Args:
+            sandbox: Sandbox to synchronize with.
+            host_root: Host directory.
+            container_root: Directory in the container; the sandbox working
+                directory if None.
+            exclude: Names of files and directories never synchronized.
+            prefer: Side winning conflicts, "sandbox" or "host".
+
+        Raises:
+            ValueError: If ``prefer`` is not a side.
+        """
+        if prefer not in ("sandbox", "host"):
+            raise ValueError(f"Invalid conflict preference: {prefer}")
+        self.sandbox = sandbox
+        self.host_root = os.path.abspath(host_root)
+        self.container_root = container_root or sandbox.config.work_dir
+        self.exclude = frozenset(exclude)
+        self.prefer = prefer
+        self._base: Dict[str, str] = {}  # Hashes agreed on by the last sync
+        self._host_hashes: Dict[str, Tuple[Tuple[int, int], str]] = {}
+        self._container_hashes: Dict[str, Tuple[Tuple[str, str], str]] = {}
+        self._lock = asyncio.Lock()
+
+    async def sync(self) -> SyncResult:
+        """Transfers the files changed on either side since the last sync.
+
+        Returns:
+            SyncResult: Changes applied.
+
+        Raises:
+            RuntimeError: If a command in the container fails.
+        """
+        async with self._lock:
+            start = time.perf_counter()
+            result = SyncResult()
+            host, container = await asyncio.gather(
+                asyncio.to_thread(self._host_manifest),
+                run_docker(self._container_manifest),
+            )
+
+            upload, download, delete_host, delete_container = [], [], [], []
+            for path in sorted(set(host) | set(container) | set(self._base)):
+                h, c, base = host.get(path), container.get(path), self._base.get(path)
+                if h == c:
+                    pass
+                elif h == base:
+                    (download if c else delete_host).append(path)
+                elif c == base:
+                    (upload if h else delete_container).append(path)
+                else:
+                    result.conflicts.append(path)
+                    if h is None or (c is not None and self.prefer == "sandbox"):
+                        download.append(path)
+                    else:
+                        upload.append(path)
+
+            if upload:
+                result.bytes_transferred += await run_docker(self._upload, upload)
+            if download:
+                result.bytes_transferred += await run_docker(self._download, download)
+            if delete_container:
+                await run_docker(
+                    self._exec_batched, ["rm", "-f", "--"], delete_container
+                )
+            for path in delete_host:
+                try:
+                    os.remove(os.path.join(self.host_root, path))
+                except FileNotFoundError:
+                    pass
+
+            self._base = {
+                path: digest
+                for path, digest in host.items()
+                if container.get(path) == digest
+            }
+            for path in download:
+                self._base[path] = container[path]
+                self._remember_host_hash(path, container[path])
+            for path in upload:
+                self._base[path] = host[path]
+
+            result.uploaded = upload
+            result.downloaded = download
+            result.deleted_on_host = delete_host
+            result.deleted_in_sandbox = delete_container
+            result.duration = time.perf_counter() - start
+            if result.changed:
+                logger.info(
+                    f"Synced workspace: {len(upload)} up, {len(download)} down, "
+                    f"{len(delete_host) + len(delete_container)} deleted, "
+                    f"{len(result.conflicts)} conflicts in {result.duration:.2f}s"
+                )
+            return result
+
+    def _host_manifest(self) -> Dict[str, str]:
+        """Hashes the regular files under the host root.
+
+        Blocking: runs in a worker thread.
+        """
+        os.makedirs(self.host_root, exist_ok=True)
+        manifest: Dict[str, str] = {}
+        seen = set()
+        for dirpath, dirnames, filenames in os.walk(self.host_root):
+            dirnames[:] = [name for name in dirnames if name not in self.exclude]
+            for name in filenames:
+                if name in self.exclude:
+                    continue
+                full_path = os.path.join(dirpath, name)
+                path = os.path.relpath(full_path, self.host_root).replace(os.sep, "/")
+                try:
+                    st = os.lstat(full_path)
+                except FileNotFoundError:
+                    continue
+                if not stat.S_ISREG(st.st_mode):
+                    continue  # Links are not followed out of the workspace
+                seen.add(path)
+                key = (st.st_size, st.st_mtime_ns)
+                cached = self._host_hashes.get(path)
+                if cached and cached[0] == key:
+                    manifest[path] = cached[1]
+                    continue
+                try:
+                    digest = self._hash_file(full_path)
+                except OSError:
+                    continue
+                self._host_hashes[path] = (key, digest)
+                manifest[path] = digest
+        for path in set(self._host_hashes) - seen:
+            del self._host_hashes[path]
+        return manifest
+
+    @staticmethod
+    def _hash_file(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            while chunk := f.read(_STREAM_CHUNK_SIZE):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _remember_host_hash(self, path: str, digest: str) -> None:
+        """Caches the hash of a file just written to the host."""
+        try:
+            st = os.lstat(os.path.join(self.host_root, path))
+        except FileNotFoundError:
+            return
+        self._host_hashes[path] = ((st.st_size, st.st_mtime_ns), digest)
+
+    def _exec(self, cmd: List[str]) -> bytes:
+        """Runs a command in the container root and returns its output.
+
+        Blocking: runs in a worker thread.
+        """
+        result = self.sandbox.container.exec_run(
+            cmd, workdir=self.container_root, demux=True
+        )
+        stdout, stderr = result.output or (None, None)
+        if result.exit_code not in (0, None):
+            error = (stderr or b"").decode("utf-8", "replace").strip()
+            raise RuntimeError(f"{cmd[0]} failed in sandbox: {error}")
+        return stdout or b""
+
+    def _exec_batched(self, cmd: List[str], paths: List[str]) -> bytes:
+        """Runs a command on paths, splitting them over several execs."""
+        return b"".join(
+            self._exec(cmd + paths[i : i + _EXEC_BATCH_SIZE])
+            for i in range(0, len(paths), _EXEC_BATCH_SIZE)
+        )
+
+    def _container_manifest(self) -> Dict[str, str]:
+        """Hashes the regular files under the container root.
+
+        Blocking: runs in a worker thread. One ``find`` lists the files with
+        their size and mtime, and only those not in the cache are hashed.
+        """
+        prune: List[str] = []
+        for name in sorted(self.exclude):
+            prune += ["-o", "-name", name] if prune else ["-name", name]
+        cmd = ["find", ".", "-mindepth", "1"]
+        if prune:
+            cmd += ["(", *prune, ")", "-prune", "-o"]
+        cmd += ["-type", "f", "-printf", "%P\\0%s\\0%T@\\0"]
+        fields = self._exec(cmd).split(b"\0")
+
+        stats: Dict[str, Tuple[str, str]] = {}
+        for i in range(0, len(fields) - 2, 3):
+            try:
+                path = fields[i].decode("utf-8")
+            except UnicodeDecodeError:
+                logger.debug(f"Skipping sandbox file with invalid name: {fields[i]}")
+                continue
+            stats[path] = (fields[i + 1].decode(), fields[i + 2].decode())
+
+        for path in set(self._container_hashes) - set(stats):
+            del self._container_hashes[path]
+        stale = [
+            path
+            for path, key in stats.items()
+            if self._container_hashes.get(path, (None,))[0] != key
+        ]
+        if stale:
+            output = self._exec_batched(["sha256sum", "-z", "--"], stale)
+            for line in output.split(b"\0"):
+                if not line:
+                    continue
+                digest, _, path = line.decode("utf-8").partition("  ")
+                if path in stats:
+                    self._container_hashes[path] = (stats[path], digest)
+
+        return {
+            path: self._container_hashes[path][1]
+            for path in stats
+            if path in self._container_hashes
+        }
+
+    def _upload(self, paths: List[str]) -> int:
+        """Sends host files to the container in one streamed archive.
+
+        Blocking: runs in a worker thread.
+
+        Returns:
+            int: Number of content bytes sent.
+        """
+        entries = [(os.path.join(self.host_root, path), path) for path in paths]
+        pipe = _ArchivePipe()
+        producer = threading.Thread(
+            target=pipe.produce, args=(entries,), name="sandbox-sync", daemon=True
+        )
+        producer.start()
+        try:
+            self.sandbox.container.put_archive(self.container_root, pipe.chunks())
+        finally:
+            pipe.close()
+            producer.join()
+        return sum(os.path.getsize(src) for src, _ in entries if os.path.exists(src))
+
+    def _download(self, paths: List[str]) -> int:
+        """Unpacks container files into the host root while receiving them.
+
+        Blocking: runs in a worker thread.
+
+        Returns:
+            int: Number of content bytes received.
+        """
+        received = 0
+        for i in range(0, len(paths), _EXEC_BATCH_SIZE):
+            result = self.sandbox.container.exec_run(
+                ["tar", "-cf", "-", "--", *paths[i : i + _EXEC_BATCH_SIZE]],
+                workdir=self.container_root,
+                stdout=True,
+                stderr=False,
+                stream=True,
+            )
+            reader = _ChunkReader(result.output)
+            with tarfile.open(fileobj=reader, mode="r|") as tar:
+                for member in tar:
+                    if member.isfile():
+                        received += member.size
+                    tar.extract(member, self.host_root, **_EXTRACT_OPTIONS)
+        return received
@@ -2,32 +2,480 @@
 Asynchronous Docker Terminal
 
 This module provides asynchronous terminal functionality for Docker containers,
-allowing interactive command execution with timeout control.
+allowing interactive command execution with timeout control. The shell
+protocol is independent of Docker, so other sandbox backends reuse it with
+their own connection to the shell.
 """
 
 import asyncio
-import re
 import socket
-from typing import Dict, Optional, Tuple, Union
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple, Union
 
-import docker
-from docker import APIClient
+from app.sandbox.core.docker_client import get_docker_client, run_docker
 from docker.errors import APIError
 from docker.models.containers import Container
+from pydantic import BaseModel
 
 
-class DockerSession:
+# Bytes of stdout, and of stderr, kept per command by default
+DEFAULT_MAX_OUTPUT = 1024 * 1024
+
+# Partial lines are never cut shorter than this, which keeps markers whole
+_MIN_LINE_LIMIT = 256
+
+# Seconds between the two interrupts sent to stop a command
+_INTERRUPT_REPEAT = 0.1
+
+
+class CommandResult(BaseModel):
+    """Outcome of a shell command.
+
+    Attributes:
+        exit_code: Exit status of the command.
+        stdout: Standard output, without the trailing newline.
+        stderr: Standard error, without the trailing newline.
+        stdout_truncated: Whether stdout past the byte cap was dropped.
+        stderr_truncated: Whether stderr past the byte cap was dropped.
+        duration: Seconds from sending the command until its output ended.
+    """
+
+    exit_code: int = -1
+    stdout: str = ""
+    stderr: str = ""
+    stdout_truncated: bool = False
+    stderr_truncated: bool = False
+    duration: float = 0.0
+
+    @property
+    def truncated(self) -> bool:
+        """Whether any output was dropped."""
+        return self.stdout_truncated or self.stderr_truncated
+
+    @property
+    def output(self) -> str:
+        """Stdout followed by stderr, for callers that do not tell them apart."""
+        return "\n".join(part for part in (self.stdout, self.stderr) if part)
+
+
+class CommandStream:
+    """Output of a running command, iterated as it arrives.
+
+    Iterating yields chunks of stdout; stderr is only complete at the end.
+    Closing the stream early, e.g. by leaving ``async with``, interrupts the
+    command.
+
+    Attributes:
+        result: Result of the command, complete once the iteration ended.
+    """
+
+    def __init__(self, chunks: AsyncIterator[str], result: CommandResult) -> None:
+        """Initializes the stream.
+
+        Args:
+            chunks: Stdout chunks; filling ``result`` once exhausted.
+            result: Result filled in by ``chunks``.
+        """
+        self.result = result
+        self._chunks = chunks
+
+    def __aiter__(self) -> AsyncIterator[str]:
+        return self._chunks
+
+    async def aclose(self) -> None:
+        """Stops the iteration, interrupting the command if still running."""
+        await self._chunks.aclose()
+
+    async def __aenter__(self) -> "CommandStream":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.aclose()
+
+
+class _LineFramer:
+    """Splits a byte stream into lines as it arrives.
+
+    Only the trailing partial line is carried over between chunks, so every
+    byte is scanned once however the output is chunked. A partial line is
+    kept up to ``limit`` bytes; the rest of it is dropped and ``overflowed``
+    set, so a huge line without newline is never buffered whole.
+    """
+
+    def __init__(self, limit: Optional[int] = None) -> None:
+        self._partial = bytearray()
+        self.limit = limit
+        self.overflowed = False
+
+    def _carry(self, data: bytes) -> None:
+        if self.limit is not None and len(self._partial) + len(data) > self.limit:
+            data = data[: max(0, self.limit - len(self._partial))]
+            self.overflowed = True
+        self._partial += data
+
+    def feed(self, data: bytes) -> List[bytes]:
+        """Adds received data.
+
+        Args:
+            data: Bytes read from the stream.
+
+        Returns:
+            List[bytes]: Lines completed by the data, without line endings.
+        """
+        if b"\n" not in data:
+            self._carry(data)
+            return []
+        lines = data.split(b"\n")
+        lines[0] = bytes(self._partial) + lines[0]
+        self._partial = bytearray()
+        self._carry(lines.pop())
+        return [line.rstrip(b"\r") for line in lines]
+
+
+class ShellSession(ABC):
+    """Interactive bash session driven over a terminal connection.
+
+    The shell runs without prompt, line editing or terminal echo, so the
+    connection carries nothing but command output. Every command is framed
+    by ``printf`` of per-command markers: one before it, one after its
+    stdout carrying the exit status, and one after its stderr. Stderr is
+    redirected to a file and printed between the last two, cut at the byte
+    cap by ``head``.
+
+    Subclasses start the shell and move bytes over the connection.
+    """
+
+    def __init__(self) -> None:
+        """Initializes a session."""
+        self.last_exit_code: Optional[int] = None
+        self.last_result: Optional[CommandResult] = None
+        self._framer = _LineFramer()
+        self._marker = f"__OPENMANUS_{uuid.uuid4().hex[:12]}_"
+        self._stderr_path = f"/tmp/{self._marker}stderr"
+        self._sequence = 0
+        self._pending: Optional[int] = None  # Sequence of an unfinished stream
+        self._interrupted_at = 0.0
+
+    @property
+    @abstractmethod
+    def connected(self) -> bool:
+        """Whether the shell is started and not closed."""
+
+    @abstractmethod
+    async def create(self, working_dir: str, env_vars: Dict[str, str]) -> None:
+        """Starts the shell.
+
+        Args:
+            working_dir: Working directory of the shell.
+            env_vars: Environment variables to set.
+
+        Raises:
+            RuntimeError: If the shell cannot be started.
+        """
+
+    @abstractmethod
+    async def close(self) -> None:
+        """Stops the shell and closes the connection."""
+
+    @abstractmethod
+    async def _write(self, data: bytes) -> None:
+        """Sends input to the shell."""
+
+    @abstractmethod
+    async def _recv(self) -> bytes:
+        """Receives output as soon as there is any; empty once closed."""
+
+    @abstractmethod
+    def _send_interrupt(self) -> None:
+        """Sends a Ctrl-C to the terminal."""
+
+    async def _prepare(self) -> None:
+        """Makes a started shell ready for framed commands."""
+        # Clear the prompts and turn off job control, so interrupts reach the
+        # shell itself and stop loops; the markers confirm it reads commands
+        await self.run("PS1=''; PS2=''; set +m")
+
+    async def _send(self, command: str, max_output: int) -> None:
+        """Sends a command framed by its markers."""
+        self._sequence += 1
+        marker = f"{self._marker}{self._sequence}"
+        err = self._stderr_path
+        # Leading newlines put the markers on their own lines after any output
+        data = (
+            f"printf '\\n{marker}^\\n'\n"
+            f"{{ {command}\n}} 2>{err}\n"
+            f"printf '\\n{marker}:%s\\n' \"$?\"\n"
+            f"head -c {max_output + 1} {err}; rm -f {err}\n"
+            f"printf '\\n{marker}_\\n'\n"
+        ).encode()
+        await self._write(data)
+
+    def _interrupt(self) -> None:
+        """Interrupts the running command so the session can be used again.
+
+        A second interrupt follows shortly: one arriving while bash starts a
+        process is caught by the new process and ignored, and a loop would
+        carry on. The next command is only sent after the second one.
+        """
+        loop = asyncio.get_running_loop()
+        self._interrupted_at = loop.time()
+        self._send_interrupt()
+        loop.call_later(_INTERRUPT_REPEAT, self._send_interrupt)
+
+    async def _read_output(
+        self, sequence: int, result: CommandResult, max_output: int
+    ) -> AsyncIterator[bytes]:
+        """Yields the stdout of a command as it arrives.
+
+        Output before the command's start marker, e.g. of an interrupted
+        earlier command, is discarded. Stdout past ``max_output`` bytes is
+        read but dropped. The exit status and stderr are stored in
+        ``result`` when their markers arrive.
+
+        Args:
+            sequence: Sequence number of the command.
+            result: Result to fill in.
+            max_output: Bytes of stdout and of stderr kept.
+
+        Yields:
+            bytes: Stdout received by one read of the socket.
+
+        Raises:
+            RuntimeError: If the session ends before the last marker.
+        """
+        prefix = f"{self._marker}{sequence}".encode()
+        start, end_of_stdout, end = prefix + b"^", prefix + b":", prefix + b"_"
+        self._framer.limit = max(max_output, _MIN_LINE_LIMIT) + 1
+        self._framer.overflowed = False
+        state = "waiting"
+        # Newlines of trailing empty lines, held back since the last one is
+        # printed before the marker and not part of the output
+        held = b""
+        first = True
+        stdout: List[bytes] = []
+        stderr: List[bytes] = []
+        kept = 0
+
+        def keep(data: bytes) -> bytes:
+            nonlocal kept
+            if kept + len(data) > max_output:
+                data = data[: max_output - kept]
+                result.stdout_truncated = True
+            kept += len(data)
+            stdout.append(data)
+            return data
+
+        while state != "done":
+            chunk = await self._recv()
+            if not chunk:
+                raise RuntimeError("Session closed by the container")
+            out = []
+            for line in self._framer.feed(chunk):
+                if line == start:
+                    state = "stdout"
+                elif line.startswith(end_of_stdout) and state == "stdout":
+                    if held:
+                        out.append(keep(held[:-1]))
+                    result.exit_code = int(line[len(end_of_stdout) :] or -1)
+                    state = "stderr"
+                elif line == end and state == "stderr":
+                    state = "done"
+                    break
+                elif state == "stdout":
+                    if self._framer.overflowed:
+                        result.stdout_truncated = True
+                    held += line if first else b"\n" + line
+                    first = False
+                    if line:
+                        out.append(keep(held))
+                        held = b""
+                elif state == "stderr":
+                    stderr.append(line)
+            data = b"".join(out)
+            if data:
+                yield data
+
+        if stderr and not stderr[-1]:
+            stderr.pop()  # Newline printed before the marker
+        error = b"\n".join(stderr)
+        if len(error) > max_output:
+            error = error[:max_output]
+            result.stderr_truncated = True
+        result.stdout = b"".join(stdout).decode("utf-8", errors="replace")
+        result.stderr = error.decode("utf-8", errors="replace")
+
+    async def stream(
+        self,
+        command: str,
+        timeout: Optional[int] = None,
+        max_output: int = DEFAULT_MAX_OUTPUT,
+        result: Optional[CommandResult] = None,
+    ) -> AsyncIterator[str]:
+        """Executes a command, yielding its stdout as it arrives.
+
+        The command is interrupted if the iteration is closed early, or
+        when the next command is sent if it is abandoned without closing.
+        Once the iteration ends, the result is also stored in
+        ``last_result``.
+
+        Args:
+            command: Shell command to execute.
+            timeout: Maximum execution time in seconds.
+            max_output: Bytes of stdout and of stderr kept; output beyond
+                them is read and dropped.
+            result: Result to fill in; a new one if None.
+
+        Yields:
+            str: Chunks of stdout.
+
+        Raises:
+            RuntimeError: If session not initialized or execution fails.
+            TimeoutError: If command execution exceeds timeout.
+        """
+        if not self.connected:
+            raise RuntimeError("Session not initialized")
+
+        loop = asyncio.get_running_loop()
+        result = result if result is not None else CommandResult()
+        started = loop.time()
+        finished = False
+        try:
+            # Sanitize command to prevent shell injection
+            sanitized_command = self._sanitize_command(command)
+            if self._pending is not None:
+                self._interrupt()  # A stream was left without closing it
+            settle = self._interrupted_at + 2 * _INTERRUPT_REPEAT - loop.time()
+            if settle > 0:
+                await asyncio.sleep(settle)
+            await self._send(sanitized_command, max_output)
+        except Exception as e:
+            raise RuntimeError(f"Failed to execute command: {e}")
+
+        sequence = self._pending = self._sequence
+        reader = self._read_output(sequence, result, max_output)
+        try:
+            while True:
+                remaining = started + timeout - loop.time() if timeout else None
+                try:
+                    chunk = await asyncio.wait_for(reader.__anext__(), remaining)
+                except StopAsyncIteration:
+                    break
+                yield chunk.decode("utf-8", errors="replace")
+            finished = True
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Command execution timed out after {timeout} seconds")
+        except RuntimeError as e:
+            raise RuntimeError(f"Failed to execute command: {e}")
+        finally:
+            await reader.aclose()
+            if self._pending == sequence:
+                if not finished:
+                    self._interrupt()
+                self._pending = None
+
+        result.duration = loop.time() - started
+        self.last_exit_code = result.exit_code
+        self.last_result = result
+
+    async def run(
+        self,
+        command: str,
+        timeout: Optional[int] = None,
+        max_output: int = DEFAULT_MAX_OUTPUT,
+    ) -> CommandResult:
+        """Executes a command and returns its result.
+
+        Args:
+            command: Shell command to execute.
+            timeout: Maximum execution time in seconds.
+            max_output: Bytes of stdout and of stderr kept.
+
+        Returns:
+            CommandResult: Exit status, output and duration.
+
+        Raises:
+            RuntimeError: If session not initialized or execution fails.
+            TimeoutError: If command execution exceeds timeout.
+        """
+        result = CommandResult()
+        async for _ in self.stream(command, timeout, max_output, result):
+            pass
+        return result
+
+    async def execute(self, command: str, timeout: Optional[int] = None) -> str:
+        """Executes a command and returns cleaned output.
+
+        Args:
+            command: Shell command to execute.
+            timeout: Maximum execution time in seconds.
+
+        Returns:
+            Command output as string, stdout followed by stderr. The exit
+            status is stored in ``last_exit_code``.
+
+        Raises:
+            RuntimeError: If session not initialized or execution fails.
+            TimeoutError: If command execution exceeds timeout.
+        """
+        return (await self.run(command, timeout)).output.strip()
+
+    def _sanitize_command(self, command: str) -> str:
+        """Sanitizes the command string to prevent shell injection.
+
+        Args:
+            command: Raw command string.
+
+        Returns:
+            Sanitized command string.
+
+        Raises:
+            ValueError: If command contains potentially dangerous patterns.
+        """
+
+        # Additional checks for specific risky commands
+        risky_commands = [
+            "rm -rf /",
+            "rm -rf /*",
+            "mkfs",
+            "dd if=/dev/zero",
+            ":(){:|:&};:",
+            "chmod -R 777 /",
+            "chown -R",
+        ]
+
+        for risky in risky_commands:
+            if risky in command.lower():
+                raise ValueError(
+                    f"Command contains potentially dangerous operation: {risky}"
+                )
+
+        return command
+
+
+class DockerSession(ShellSession):
+    """Interactive bash session in a container, driven over the exec socket.
+
+    Reads wait for socket readiness in the event loop.
+    """
+
     def __init__(self, container_id: str) -> None:
         """Initializes a Docker session.
 
         Args:
             container_id: ID of the Docker container.
         """
-        self.api = APIClient()
+        super().__init__()
+        self.api = get_docker_client().api
         self.container_id = container_id
         self.exec_id = None
         self.socket = None
 
+    @property
+    def connected(self) -> bool:
+        return self.socket is not None
+
     async def create(self, working_dir: str, env_vars: Dict[str, str]) -> None:
         """Creates an interactive session with the container.
 
@@ -42,12 +490,12 @@ class DockerSession:
             "bash",
             "-c",
             f"cd {working_dir} && "
-            "PROMPT_COMMAND='' "
-            "PS1='$ ' "
-            "exec bash --norc --noprofile",
+            "stty -echo && "
+            "exec bash --norc --noprofile --noediting",
         ]
 
-        exec_data = self.api.exec_create(
+        exec_data = await run_docker(
+            self.api.exec_create,
             self.container_id,
             startup_command,
             stdin=True,
@@ -56,21 +504,27 @@ class DockerSession:
             stderr=True,
             privileged=True,
             user="root",
-            environment={**env_vars, "TERM": "dumb", "PS1": "$ ", "PROMPT_COMMAND": ""},
+            environment={**env_vars, "TERM": "dumb"},
         )
         self.exec_id = exec_data["Id"]
 
-        socket_data = self.api.exec_start(
-            self.exec_id, socket=True, tty=True, stream=True, demux=True
+        socket_data = await run_docker(
+            self.api.exec_start,
+            self.exec_id,
+            socket=True,
+            tty=True,
+            stream=True,
+            demux=True,
         )
 
         if hasattr(socket_data, "_sock"):
             self.socket = socket_data._sock
-            self.socket.setblocking(False)
+            if isinstance(self.socket, socket.socket):
+                self.socket.setblocking(False)
         else:
             raise RuntimeError("Failed to get socket connection")
 
-        await self._read_until_prompt()
+        await self._prepare()
 
     async def close(self) -> None:
         """Cleans up session resources.
@@ -101,7 +555,7 @@ class DockerSession:
             if self.exec_id:
                 try:
                     # Check exec instance status
-                    exec_inspect = self.api.exec_inspect(self.exec_id)
+                    exec_inspect = await run_docker(self.api.exec_inspect, self.exec_id)
                     if exec_inspect.get("Running", False):
                         # If still running, wait for it to complete
                         await asyncio.sleep(0.5)
@@ -114,147 +568,286 @@ class DockerSession:
             # Log error but don't raise, ensure cleanup continues
             print(f"Warning: Error during session cleanup: {e}")
 
-    async def _read_until_prompt(self) -> str:
-        """Reads output until prompt is found.
+    async def _write(self, data: bytes) -> None:
+        if isinstance(self.socket, socket.socket):
+            await asyncio.get_running_loop().sock_sendall(self.socket, data)
+        else:
+            await asyncio.to_thread(self.socket.sendall, data)
 
-        Returns:
-            String containing output up to the prompt.
+    async def _recv(self) -> bytes:
+        """Receives output as soon as the socket is readable."""
+        if isinstance(self.socket, socket.socket):
+            return await asyncio.get_running_loop().sock_recv(self.socket, 65536)
+        # Named pipes of Docker on Windows are not selectable
+        return await asyncio.to_thread(self.socket.recv, 65536)
+
+    def _send_interrupt(self) -> None:
+        try:
+            self.socket.send(b"\x03")
+        except (AttributeError, OSError):
+            pass
+
+
+class ShellTerminal(ABC):
+    """Command execution in shells of a sandbox, stateful or in parallel.
+
+    ``run_command`` uses one interactive shell, so working directory,
+    variables and background jobs persist between commands, which run one
+    at a time. ``run_parallel`` runs each command in a subshell of one of
+    up to ``max_sessions`` further shells, started on demand and reused,
+    so commands neither wait for the main shell nor change its state.
+    ``exec_once`` runs a command as its own non-interactive exec, for
+    stateless checks that should never queue behind a shell.
+
+    ``execute`` returns the exit status, stdout and stderr of a shell
+    command, and ``stream`` yields its stdout as it arrives; either keeps
+    at most ``max_output`` bytes of each.
+
+    Subclasses start the shells and run ``exec_once`` commands.
+    """
+
+    def __init__(
+        self,
+        working_dir: str = "/workspace",
+        env_vars: Optional[Dict[str, str]] = None,
+        default_timeout: int = 60,
+        max_sessions: int = 4,
+        max_output: int = DEFAULT_MAX_OUTPUT,
+    ) -> None:
+        """Initializes a terminal.
+
+        Args:
+            working_dir: Working directory of the shells.
+            env_vars: Environment variables to set.
+            default_timeout: Default command execution timeout in seconds.
+            max_sessions: Shells running parallel commands at most.
+            max_output: Default bytes of stdout and of stderr kept per
+                command.
+        """
+        self.working_dir = working_dir
+        self.env_vars = env_vars or {}
+        self.default_timeout = default_timeout
+        self.max_output = max_output
+        self.session = None
+        self._lock = asyncio.Lock()
+        self._slots = asyncio.Semaphore(max(1, max_sessions))
+        self._idle: List[ShellSession] = []
+        self._pooled: Set[ShellSession] = set()
+
+    @abstractmethod
+    def _new_session(self) -> ShellSession:
+        """Creates a shell session, not started yet."""
+
+    async def init(self) -> None:
+        """Starts the main shell.
+
+        Raises:
+            RuntimeError: If initialization fails.
+        """
+        self.session = self._new_session()
+        await self.session.create(self.working_dir, self.env_vars)
+
+    @asynccontextmanager
+    async def _shell(self, stateful: bool) -> AsyncIterator[ShellSession]:
+        """Holds the main shell, or a pooled shell for a parallel command.
+
+        A pooled shell is started on demand and returned to the pool
+        afterwards, unless it failed.
 
         Raises:
-            socket.error: If socket communication fails.
+            RuntimeError: If terminal not initialized.
         """
-        buffer = b""
-        while b"$ " not in buffer:
+        if not self.session:
+            raise RuntimeError("Terminal not initialized")
+
+        if stateful:
+            async with self._lock:
+                yield self.session
+            return
+
+        async with self._slots:
+            session = self._idle.pop() if self._idle else None
+            if session is None:
+                session = self._new_session()
+                await session.create(self.working_dir, self.env_vars)
+                self._pooled.add(session)
+            broken = False
             try:
-                chunk = self.socket.recv(4096)
-                if chunk:
-                    buffer += chunk
-            except socket.error as e:
-                if e.errno == socket.EWOULDBLOCK:
-                    await asyncio.sleep(0.1)
-                    continue
+                yield session
+            except RuntimeError:
+                broken = True
                 raise
-        return buffer.decode("utf-8")
-
-    async def execute(self, command: str, timeout: Optional[int] = None) -> str:
-        """Executes a command and returns cleaned output.
+            finally:
+                # Interrupted commands leave the shell usable
+                if not broken and session in self._pooled:
+                    self._idle.append(session)
+                else:
+                    self._pooled.discard(session)
+                    await session.close()
+
+    def stream(
+        self,
+        cmd: str,
+        timeout: Optional[int] = None,
+        stateful: bool = True,
+        max_output: Optional[int] = None,
+    ) -> CommandStream:
+        """Runs a command, streaming its stdout as it arrives.
 
         Args:
-            command: Shell command to execute.
+            cmd: Shell command to execute.
             timeout: Maximum execution time in seconds.
+            stateful: Whether to run in the main shell or in a subshell of a
+                pooled shell, as ``run_parallel`` does.
+            max_output: Bytes of stdout and of stderr kept; the terminal's
+                ``max_output`` if None.
 
         Returns:
-            Command output as string with prompt markers removed.
-
-        Raises:
-            RuntimeError: If session not initialized or execution fails.
-            TimeoutError: If command execution exceeds timeout.
+            CommandStream: Stdout chunks, then the result. Iterating raises
+                RuntimeError if the terminal is not initialized or execution
+                fails, and TimeoutError if the command exceeds the timeout.
         """
-        if not self.socket:
-            raise RuntimeError("Session not initialized")
+        result = CommandResult()
+        chunks = self._stream(cmd, timeout, stateful, max_output, result)
+        return CommandStream(chunks, result)
 
-        try:
-            # Sanitize command to prevent shell injection
-            sanitized_command = self._sanitize_command(command)
-            full_command = f"{sanitized_command}\necho $?\n"
-            self.socket.sendall(full_command.encode())
-
-            async def read_output() -> str:
-                buffer = b""
-                result_lines = []
-                command_sent = False
-
-                while True:
-                    try:
-                        chunk = self.socket.recv(4096)
-                        if not chunk:
-                            break
+    async def _stream(
+        self,
+        cmd: str,
+        timeout: Optional[int],
+        stateful: bool,
+        max_output: Optional[int],
+        result: CommandResult,
+    ) -> AsyncIterator[str]:
+        async with self._shell(stateful) as session:
+            chunks = session.stream(
+                cmd if stateful else f"(\n{cmd}\n)",
+                timeout or self.default_timeout,
+                self.max_output if max_output is None else max_output,
+                result,
+            )
+            try:
+                async for chunk in chunks:
+                    yield chunk
+            finally:
+                await chunks.aclose()
 
-                        buffer += chunk
-                        lines = buffer.split(b"\n")
+    async def execute(
+        self,
+        cmd: str,
+        timeout: Optional[int] = None,
+        stateful: bool = True,
+        max_output: Optional[int] = None,
+    ) -> CommandResult:
+        """Runs a command and returns its exit status and separate output.
 
-                        buffer = lines[-1]
-                        lines = lines[:-1]
+        Args:
+            cmd: Shell command to execute.
+            timeout: Maximum execution time in seconds.
+            stateful: Whether to run in the main shell or in parallel.
+            max_output: Bytes of stdout and of stderr kept; the terminal's
+                ``max_output`` if None.
 
-                        for line in lines:
-                            line = line.rstrip(b"\r")
+        Returns:
+            CommandResult: Exit status, output and duration.
 
-                            if not command_sent:
-                                command_sent = True
-                                continue
+        Raises:
+            RuntimeError: If terminal not initialized or execution fails.
+            TimeoutError: If command execution exceeds timeout.
+        """
+        stream = self.stream(cmd, timeout, stateful, max_output)
+        async for _ in stream:
+            pass
+        return stream.result
 
-                            if line.strip() == b"echo $?" or line.strip().isdigit():
-                                continue
+    async def run_command(self, cmd: str, timeout: Optional[int] = None) -> str:
+        """Runs a command in the container with timeout.
 
-                            if line.strip():
-                                result_lines.append(line)
+        Args:
+            cmd: Shell command to execute.
+            timeout: Maximum execution time in seconds.
 
-                        if buffer.endswith(b"$ "):
-                            break
+        Returns:
+            Command output as string, stdout followed by stderr.
 
-                    except socket.error as e:
-                        if e.errno == socket.EWOULDBLOCK:
-                            await asyncio.sleep(0.1)
-                            continue
-                        raise
+        Raises:
+            RuntimeError: If terminal not initialized.
+        """
+        return (await self.execute(cmd, timeout)).output.strip()
 
-                output = b"\n".join(result_lines).decode("utf-8")
-                output = re.sub(r"\n\$ echo \$\$?.*$", "", output)
+    async def run_parallel(self, cmd: str, timeout: Optional[int] = None) -> str:
+        """Runs a command in a subshell of a pooled shell.
 
-                return output
+        Waits only if ``max_sessions`` parallel commands are running. The
+        command starts in the working directory and its changes to the
+        shell state are discarded.
 
-            if timeout:
-                result = await asyncio.wait_for(read_output(), timeout)
-            else:
-                result = await read_output()
+        Args:
+            cmd: Shell command to execute.
+            timeout: Maximum execution time in seconds.
 
-            return result.strip()
+        Returns:
+            Command output as string, stdout followed by stderr.
 
-        except asyncio.TimeoutError:
-            raise TimeoutError(f"Command execution timed out after {timeout} seconds")
-        except Exception as e:
-            raise RuntimeError(f"Failed to execute command: {e}")
+        Raises:
+            RuntimeError: If terminal not initialized or execution fails.
+            TimeoutError: If command execution exceeds timeout.
+        """
+        return (await self.execute(cmd, timeout, stateful=False)).output.strip()
 
-    def _sanitize_command(self, command: str) -> str:
-        """Sanitizes the command string to prevent shell injection.
+    @abstractmethod
+    async def exec_once(
+        self, cmd: Union[str, List[str]], timeout: Optional[int] = None
+    ) -> Tuple[int, str]:
+        """Runs a command as a separate non-interactive process.
 
         Args:
-            command: Raw command string.
+            cmd: Argument list, or a shell command run by bash.
+            timeout: Maximum execution time in seconds; the command is
+                killed when it is exceeded.
 
         Returns:
-            Sanitized command string.
+            Tuple of (exit_code, output) with stdout and stderr combined.
 
         Raises:
-            ValueError: If command contains potentially dangerous patterns.
+            TimeoutError: If command execution exceeds timeout.
         """
 
-        # Additional checks for specific risky commands
-        risky_commands = [
-            "rm -rf /",
-            "rm -rf /*",
-            "mkfs",
-            "dd if=/dev/zero",
-            ":(){:|:&};:",
-            "chmod -R 777 /",
-            "chown -R",
-        ]
+    async def close(self) -> None:
+        """Closes the terminal session and the pooled shells."""
+        if self.session:
+            await self.session.close()
+        sessions = list(self._pooled)
+        self._pooled.clear()
+        self._idle.clear()
+        for session in sessions:
+            await session.close()
 
-        for risky in risky_commands:
-            if risky in command.lower():
-                raise ValueError(
-                    f"Command contains potentially dangerous operation: {risky}"
-                )
+    async def __aenter__(self) -> "ShellTerminal":
+        """Async context manager entry."""
+        await self.init()
+        return self
 
-        return command
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        """Async context manager exit."""
+        await self.close()
+
+
+class AsyncDockerizedTerminal(ShellTerminal):
+    """Command execution in a container, stateful or in parallel.
 
+    Shells are interactive Docker execs, and ``exec_once`` commands are
+    non-interactive ones.
+    """
 
-class AsyncDockerizedTerminal:
     def __init__(
         self,
         container: Union[str, Container],
         working_dir: str = "/workspace",
         env_vars: Optional[Dict[str, str]] = None,
         default_timeout: int = 60,
+        max_sessions: int = 4,
+        max_output: int = DEFAULT_MAX_OUTPUT,
     ) -> None:
         """Initializes an asynchronous terminal for Docker containers.
 
@@ -263,17 +856,22 @@ class AsyncDockerizedTerminal:
             working_dir: Working directory inside the container.
             env_vars: Environment variables to set.
             default_timeout: Default command execution timeout in seconds.
+            max_sessions: Shells running parallel commands at most.
+            max_output: Default bytes of stdout and of stderr kept per
+                command.
         """
-        self.client = docker.from_env()
+        super().__init__(
+            working_dir, env_vars, default_timeout, max_sessions, max_output
+        )
+        self.client = get_docker_client()
         self.container = (
             container
             if isinstance(container, Container)
             else self.client.containers.get(container)
         )
-        self.working_dir = working_dir
-        self.env_vars = env_vars or {}
-        self.default_timeout = default_timeout
-        self.session = None
+
+    def _new_session(self) -> DockerSession:
+        return DockerSession(self.container.id)
 
     async def init(self) -> None:
         """Initializes the terminal environment.
@@ -284,9 +882,7 @@ class AsyncDockerizedTerminal:
             RuntimeError: If initialization fails.
         """
         await self._ensure_workdir()
-
-        self.session = DockerSession(self.container.id)
-        await self.session.create(self.working_dir, self.env_vars)
+        await super().init()
 
     async def _ensure_workdir(self) -> None:
         """Ensures working directory exists in container.
@@ -308,39 +904,35 @@ class AsyncDockerizedTerminal:
         Returns:
             Tuple of (exit_code, output).
         """
-        result = await asyncio.to_thread(
+        result = await run_docker(
             self.container.exec_run, cmd, environment=self.env_vars
         )
         return result.exit_code, result.output.decode("utf-8")
 
-    async def run_command(self, cmd: str, timeout: Optional[int] = None) -> str:
-        """Runs a command in the container with timeout.
+    async def exec_once(
+        self, cmd: Union[str, List[str]], timeout: Optional[int] = None
+    ) -> Tuple[int, str]:
+        """Runs a command as a separate non-interactive exec.
 
         Args:
-            cmd: Shell command to execute.
-            timeout: Maximum execution time in seconds.
+            cmd: Argument list, or a shell command run by bash.
+            timeout: Maximum execution time in seconds; the command is
+                killed in the container when it is exceeded.
 
         Returns:
-            Command output as string.
+            Tuple of (exit_code, output) with stdout and stderr combined.
 
         Raises:
-            RuntimeError: If terminal not initialized.
+            TimeoutError: If command execution exceeds timeout.
         """
-        if not self.session:
-            raise RuntimeError("Terminal not initialized")
-
-        return await self.session.execute(cmd, timeout=timeout or self.default_timeout)
-
-    async def close(self) -> None:
-        """Closes the terminal session."""
-        if self.session:
-            await self.session.close()
-
-    async def __aenter__(self) -> "AsyncDockerizedTerminal":
-        """Async context manager entry."""
-        await self.init()
-        return self
-
-    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
-        """Async context manager exit."""
-        await self.close()
+        timeout = timeout or self.default_timeout
+        argv = ["bash", "-c", cmd] if isinstance(cmd, str) else list(cmd)
+        result = await run_docker(
+            self.container.exec_run,
+            ["timeout", "-k", "1", str(int(timeout)), *argv],
+            workdir=self.working_dir,
+            environment=self.env_vars,
+        )
+        if result.exit_code == 124:
+            raise TimeoutError(f"Command execution timed out after {timeout} seconds")
+        return result.exit_code, result.output.decode("utf-8", errors="replace")
@@ -0,0 +1,138 @@
+"""Resource usage samples of sandbox containers."""
+
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+
+class UsageSample(NamedTuple):
+    """Resource usage of a container between two readings.
+
+    Attributes:
+        cpu: CPU cores used on average.
+        memory: Memory in use, excluding reclaimable page cache, in bytes.
+        io: Block device and network traffic in bytes per second.
+    """
+
+    cpu: float
+    memory: int
+    io: float
+
+
+class UsageReading(NamedTuple):
+    """Cumulative counters of a container at one point in time."""
+
+    time: float
+    cpu_total: int
+    system_total: int
+    io_total: int
+
+
+def _percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of sorted values."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+class UsageWindow:
+    """Ring buffer of the most recent usage samples of a container or profile.
+
+    Attributes:
+        samples: Samples, oldest first.
+    """
+
+    def __init__(self, size: int):
+        """Initializes the window.
+
+        Args:
+            size: Number of samples kept.
+        """
+        self.samples: Deque[UsageSample] = deque(maxlen=size)
+
+    def add(self, sample: UsageSample) -> None:
+        self.samples.append(sample)
+
+    def percentile(self, field: str, q: float) -> float:
+        """Gets a percentile of one resource.
+
+        Args:
+            field: "cpu", "memory" or "io".
+            q: Percentile as a fraction, e.g. 0.95.
+
+        Returns:
+            float: The percentile, or 0 without samples.
+        """
+        return _percentile(sorted(getattr(s, field) for s in self.samples), q)
+
+    def summary(self) -> Dict[str, float]:
+        """Gets the p50 and p95 of every resource."""
+        return summarize([self])
+
+
+def summarize(windows: Iterable[UsageWindow]) -> Dict[str, float]:
+    """Gets the p50 and p95 of every resource over the samples of windows.
+
+    Args:
+        windows: Windows whose samples are pooled.
+
+    Returns:
+        Dict[str, float]: Sample count and percentiles, keyed like
+            ``cpu_p50`` or ``memory_p95``.
+    """
+    samples = [sample for window in windows for sample in window.samples]
+    summary: Dict[str, float] = {"samples": len(samples)}
+    for field in UsageSample._fields:
+        values = sorted(getattr(sample, field) for sample in samples)
+        summary[f"{field}_p50"] = _percentile(values, 0.5)
+        summary[f"{field}_p95"] = _percentile(values, 0.95)
+    return summary
+
+
+def parse_stats(
+    stats: Dict, previous: Optional[UsageReading]
+) -> Tuple[Optional[UsageSample], UsageReading]:
+    """Turns a one-shot Docker stats response into a usage sample.
+
+    One-shot responses carry no previous CPU counters, so rates are
+    computed against the previous reading of the same container.
+
+    Args:
+        stats: Response of the container stats API.
+        previous: Previous reading of the container, if any.
+
+    Returns:
+        Tuple of the sample, or None for the first reading, and the reading
+        to pass with the next response.
+    """
+    cpu_stats = stats.get("cpu_stats") or {}
+    blkio = (stats.get("blkio_stats") or {}).get("io_service_bytes_recursive") or []
+    networks = (stats.get("networks") or {}).values()
+    reading = UsageReading(
+        time=time.monotonic(),
+        cpu_total=(cpu_stats.get("cpu_usage") or {}).get("total_usage", 0),
+        system_total=cpu_stats.get("system_cpu_usage", 0),
+        io_total=sum(entry.get("value", 0) for entry in blkio)
+        + sum(net.get("rx_bytes", 0) + net.get("tx_bytes", 0) for net in networks),
+    )
+
+    memory_stats = stats.get("memory_stats") or {}
+    details = memory_stats.get("stats") or {}
+    # Page cache is reclaimable: inactive_file on cgroup v2, cache on v1
+    cache = details.get("inactive_file", details.get("cache", 0))
+    memory = max(0, memory_stats.get("usage", 0) - cache)
+
+    if previous is None:
+        return None, reading
+    system_delta = reading.system_total - previous.system_total
+    cpu_delta = reading.cpu_total - previous.cpu_total
+    cpus = cpu_stats.get("online_cpus") or 1
+    elapsed = reading.time - previous.time
+    io_delta = reading.io_total - previous.io_total
+    # Counters restart with the container, e.g. when a snapshot is restored
+    sample = UsageSample(
+        cpu=max(0.0, cpu_delta / system_delta * cpus) if system_delta > 0 else 0.0,
+        memory=memory,
+        io=max(0.0, io_delta / elapsed) if elapsed > 0 else 0.0,
+    )
+    return sample, reading
@@ -0,0 +1,30 @@
+"""
+API Server Module
+
+Provides run scheduling and session management for the FastAPI server.
+"""
+from app.server.batches import Batch, BatchJob, BatchManager
+from app.server.channel import OutputChannel, capture_output, install_output_capture
+from app.server.events import EventLog
+from app.server.files import WorkspaceIndex
+from app.server.runs import Run, RunManager, RunStatus
+from app.server.scheduler import RunScheduler
+from app.server.store import RunStore, SQLiteRunStore
+
+
+__all__ = [
+    "Batch",
+    "BatchJob",
+    "BatchManager",
+    "EventLog",
+    "OutputChannel",
+    "Run",
+    "RunManager",
+    "RunScheduler",
+    "RunStatus",
+    "RunStore",
+    "SQLiteRunStore",
+    "WorkspaceIndex",
+    "capture_output",
+    "install_output_capture",
+]
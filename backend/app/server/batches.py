@@ -0,0 +1,366 @@
+"""Batches of prompts executed as background runs."""
+
+import asyncio
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from app.flow.flow_factory import FlowType
+from app.logger import logger
+from app.server.runs import Run, RunManager, RunStatus
+from pydantic import BaseModel, Field
+
+
+# Status of jobs that have not been started as runs yet
+PENDING = "pending"
+
+
+class BatchJob(BaseModel):
+    """A prompt submitted as part of a batch."""
+
+    prompt: str = Field(..., min_length=1, description="Prompt to execute")
+    flow: Optional[FlowType] = Field(
+        None, description="Flow to execute the prompt with; the agent alone if None"
+    )
+
+
+class Batch:
+    """A set of jobs executed in the background.
+
+    Each job becomes a run once it is started, with the job ID as run ID,
+    so its events, result and artifacts are available through the run API.
+    The final status of every job is also kept with the batch, which
+    outlives the runs it started.
+
+    Attributes:
+        batch_id: Unique batch identifier.
+        client_id: Identifier the jobs are scheduled under.
+        jobs: Submitted jobs by job ID, in submission order.
+        created_at: Submission time.
+        finished_at: Time the last job finished, or None while running.
+        cancelled: Whether the batch was cancelled.
+    """
+
+    def __init__(self, batch_id: str, client_id: str, jobs: List[BatchJob]):
+        self.batch_id = batch_id
+        self.client_id = client_id
+        self.jobs: Dict[str, BatchJob] = {uuid.uuid4().hex: job for job in jobs}
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.cancelled = False
+        self.task: Optional[asyncio.Task] = None
+        self._runs: Dict[str, Run] = {}
+        self._results: Dict[str, Dict] = {}  # Final state of finished jobs
+        self._changed = asyncio.Event()
+
+    def job_status(self, job_id: str) -> str:
+        """Gets the status of a job: pending or the status of its run."""
+        if job_id in self._results:
+            return self._results[job_id]["status"]
+        run = self._runs.get(job_id)
+        return run.status.value if run else PENDING
+
+    def job_info(self, job_id: str) -> Dict:
+        """Describes a job, including its result and artifacts once finished.
+
+        Args:
+            job_id: Job ID.
+
+        Returns:
+            Dict: Job status, or the run summary once it has started.
+        """
+        if job_id in self._results:
+            return self._results[job_id]
+        run = self._runs.get(job_id)
+        if run:
+            return {**run.to_dict(), "artifacts": run.artifacts}
+        job = self.jobs[job_id]
+        return {
+            "run_id": job_id,
+            "status": PENDING,
+            "flow": job.flow.value if job.flow else None,
+        }
+
+    @property
+    def active_runs(self) -> List[Run]:
+        """Runs of the jobs started and not finished yet."""
+        return list(self._runs.values())
+
+    def record_started(self, job_id: str, run: Run) -> None:
+        """Tracks the run a job was started as."""
+        self._runs[job_id] = run
+        self._notify()
+
+    def record_finished(self, job_id: str, info: Dict) -> None:
+        """Keeps the final state of a job and wakes up waiting clients."""
+        self._runs.pop(job_id, None)
+        self._results[job_id] = info
+        self._notify()
+
+    def finish(self) -> None:
+        """Marks the batch finished and wakes up waiting clients."""
+        self.finished_at = time.time()
+        self._notify()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait(self, timeout: float) -> None:
+        """Waits until a job changes status or the batch finishes.
+
+        Args:
+            timeout: Maximum number of seconds to wait.
+        """
+        if self.finished_at is not None or timeout <= 0:
+            return
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def to_dict(self, include_jobs: bool = True) -> Dict:
+        """Summarizes the batch with its throughput and token totals.
+
+        Args:
+            include_jobs: Whether to list the status of every job.
+
+        Returns:
+            Dict: Batch status.
+        """
+        statuses: Dict[str, int] = {PENDING: 0}
+        statuses.update({status.value: 0 for status in RunStatus})
+        tokens = {"input": 0, "completion": 0, "by_model": {}}
+        for job_id in self.jobs:
+            info = self._results.get(job_id)
+            run = self._runs.get(job_id)
+            statuses[self.job_status(job_id)] += 1
+            usage = info["tokens"] if info else run.token_usage if run else {}
+            for model, counts in usage.items():
+                totals = tokens["by_model"].setdefault(
+                    model, {"input": 0, "completion": 0}
+                )
+                for kind in ("input", "completion"):
+                    totals[kind] += counts[kind]
+                    tokens[kind] += counts[kind]
+        tokens["total"] = tokens["input"] + tokens["completion"]
+
+        finished = len(self._results)
+        elapsed = (self.finished_at or time.time()) - self.created_at
+        if self.finished_at is None:
+            status = "cancelling" if self.cancelled else "running"
+        else:
+            status = "cancelled" if self.cancelled else "completed"
+
+        summary = {
+            "batch_id": self.batch_id,
+            "client_id": self.client_id,
+            "status": status,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "total_jobs": len(self.jobs),
+            "finished_jobs": finished,
+            "jobs_by_status": statuses,
+            "elapsed_seconds": round(elapsed, 3),
+            "jobs_per_minute": round(finished * 60 / elapsed, 3) if elapsed else 0.0,
+            "tokens_per_second": (
+                round(tokens["total"] / elapsed, 3) if elapsed else 0.0
+            ),
+            "tokens": tokens,
+        }
+        if include_jobs:
+            summary["jobs"] = [
+                {"job_id": job_id, "status": self.job_status(job_id)}
+                for job_id in self.jobs
+            ]
+        return summary
+
+
+class BatchManager:
+    """Executes batches of jobs through the run manager.
+
+    Jobs are started as non-interactive runs, so they wait for execution
+    slots in the same scheduler as interactive runs. Every batch is
+    scheduled as a client of its own, so it takes its fair share of slots
+    without crowding out interactive users, and keeps at most
+    ``parallelism`` jobs running or queued.
+
+    Attributes:
+        runs: Run manager the jobs are executed by.
+        parallelism: Jobs of one batch running or queued at the same time.
+        max_jobs: Maximum number of jobs per batch.
+        retention: Seconds finished batches are kept.
+    """
+
+    def __init__(
+        self,
+        runs: RunManager,
+        parallelism: int = 4,
+        max_jobs: int = 1000,
+        retention: Optional[int] = None,
+    ):
+        """Initializes the batch manager.
+
+        Args:
+            runs: Run manager the jobs are executed by.
+            parallelism: Jobs of one batch running or queued at the same
+                time; capped at the scheduler's per-client queue limit so
+                jobs are never rejected for it.
+            max_jobs: Maximum number of jobs per batch.
+            retention: Seconds finished batches are kept; the run
+                retention if None.
+        """
+        self.runs = runs
+        self.parallelism = max(
+            1, min(parallelism, runs.scheduler.max_queued_per_client)
+        )
+        self.max_jobs = max_jobs
+        self.retention = runs.retention if retention is None else retention
+        self._batches: Dict[str, Batch] = {}
+
+    def get(self, batch_id: str) -> Optional[Batch]:
+        """Gets a batch by ID.
+
+        Args:
+            batch_id: Batch ID.
+
+        Returns:
+            Optional[Batch]: The batch, or None if unknown or expired.
+        """
+        return self._batches.get(batch_id)
+
+    def submit(self, jobs: List[BatchJob]) -> Batch:
+        """Starts executing a batch of jobs in the background.
+
+        Args:
+            jobs: Jobs to execute, in order.
+
+        Returns:
+            Batch: The submitted batch.
+
+        Raises:
+            ValueError: If there are no jobs or more than ``max_jobs``.
+        """
+        if not jobs:
+            raise ValueError("A batch needs at least one job")
+        if len(jobs) > self.max_jobs:
+            raise ValueError(f"A batch can have at most {self.max_jobs} jobs")
+
+        batch_id = uuid.uuid4().hex
+        batch = Batch(batch_id, f"batch:{batch_id}", jobs)
+        self._batches[batch_id] = batch
+        batch.task = asyncio.create_task(self._execute(batch))
+        logger.info(f"📦 Batch {batch_id} submitted with {len(jobs)} jobs")
+        return batch
+
+    def cancel(self, batch_id: str) -> bool:
+        """Cancels the unfinished jobs of a batch.
+
+        Args:
+            batch_id: Batch ID.
+
+        Returns:
+            bool: False if the batch is unknown, finished or already cancelled.
+        """
+        batch = self._batches.get(batch_id)
+        if not batch or batch.finished_at is not None or batch.cancelled:
+            return False
+        batch.cancelled = True
+        for run in batch.active_runs:
+            self.runs.cancel(run.run_id, "Batch cancelled")
+        return True
+
+    async def _execute(self, batch: Batch) -> None:
+        """Starts the jobs of a batch as slots free up, until all finished."""
+        slots = asyncio.Semaphore(self.parallelism)
+        tasks = []
+        try:
+            for job_id, job in batch.jobs.items():
+                await slots.acquire()
+                await self._wait_for_queue_space(batch)
+                # The batch may be cancelled while waiting
+                if batch.cancelled:
+                    slots.release()
+                    break
+                tasks.append(
+                    asyncio.create_task(self._run_job(batch, job_id, job, slots))
+                )
+            await asyncio.gather(*tasks)
+        finally:
+            for job_id in batch.jobs:
+                if batch.job_status(job_id) == PENDING:
+                    batch.record_finished(job_id, self._never_started(batch, job_id))
+            batch.finish()
+            logger.info(
+                f"📦 Batch {batch.batch_id} finished: "
+                f"{batch.to_dict(include_jobs=False)['jobs_by_status']}"
+            )
+            asyncio.get_running_loop().call_later(
+                self.retention, self._batches.pop, batch.batch_id, None
+            )
+
+    async def _wait_for_queue_space(self, batch: Batch) -> None:
+        """Holds back jobs while the scheduler queue is full.
+
+        The batch would otherwise have its jobs rejected whenever
+        interactive runs fill the queue. Stops waiting if the batch is
+        cancelled.
+        """
+        scheduler = self.runs.scheduler
+        while scheduler.queued_runs >= scheduler.max_queue_size:
+            if batch.cancelled:
+                return
+            await asyncio.sleep(0.5)
+
+    async def _run_job(
+        self, batch: Batch, job_id: str, job: BatchJob, slots: asyncio.Semaphore
+    ) -> None:
+        """Runs a job and records its final state."""
+        try:
+            # Not started if the batch was cancelled since the task was created
+            if batch.cancelled:
+                return
+            run = self.runs.start(
+                job.prompt,
+                batch.client_id,
+                flow=job.flow,
+                interactive=False,
+                run_id=job_id,
+            )
+            batch.record_started(job_id, run)
+            await asyncio.wait({run.task})
+            batch.record_finished(job_id, {**run.to_dict(), "artifacts": run.artifacts})
+        finally:
+            slots.release()
+
+    @staticmethod
+    def _never_started(batch: Batch, job_id: str) -> Dict:
+        info = batch.job_info(job_id)
+        info["status"] = RunStatus.CANCELLED.value
+        info["tokens"] = {}
+        info["artifacts"] = []
+        return info
+
+    async def shutdown(self) -> None:
+        """Stops starting new jobs; running ones are stopped by the run manager."""
+        tasks = [batch.task for batch in self._batches.values() if batch.task]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def get_stats(self) -> Dict:
+        """Gets batch statistics.
+
+        Returns:
+            Dict: Statistics information.
+        """
+        active = [b for b in self._batches.values() if b.finished_at is None]
+        pending = sum(
+            b.job_status(job_id) == PENDING for b in active for job_id in b.jobs
+        )
+        return {
+            "total_batches": len(self._batches),
+            "active_batches": len(active),
+            "pending_jobs": pending,
+        }
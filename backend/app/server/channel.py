@@ -0,0 +1,244 @@
+"""Batched, backpressured output forwarding to websocket clients."""
+
+import asyncio
+import json
+import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Protocol
+
+from app.logger import logger
+from app.server.events import EventLog
+from fastapi import WebSocket
+
+
+class OutputSink(Protocol):
+    """Receiver of captured log and print output."""
+
+    def put(self, text: str, low_priority: bool = False) -> None:
+        """Buffers a line of output without blocking."""
+        ...
+
+
+# Output sink of the run whose code is currently executing
+_current_sink: ContextVar[Optional[OutputSink]] = ContextVar(
+    "output_sink", default=None
+)
+
+# Loguru levels below INFO (TRACE, DEBUG) may be dropped when the client lags
+_LOW_PRIORITY_LEVEL = 20
+
+
+class OutputChannel:
+    """Forwards a run's event log to a websocket in coalesced frames.
+
+    Consecutive log lines are sent as one newline-joined frame every
+    ``flush_interval`` seconds, or as soon as ``max_frame_bytes`` are pending.
+    When the client falls more than ``max_lag`` events behind the log,
+    low-priority lines are skipped and a summary is sent instead. Other
+    events (input requests, completion) are always sent as separate frames.
+
+    In structured mode every frame is a JSON object carrying the ``offset`` of
+    the last event it contains, so clients can resume after a disconnect.
+    Consecutive ``token`` events are merged the same way as log lines, and
+    skipped while the client lags since the full text is logged afterwards.
+    Otherwise the plain-text protocol is used: log lines as text, ``DONE`` on
+    completion and JSON objects for other events; streamed tokens are not sent.
+
+    Attributes:
+        ws: Websocket the events are sent to.
+        log: Event log being forwarded.
+        cursor: Offset of the next event to send.
+        structured: Whether to send offset-tagged JSON frames.
+    """
+
+    def __init__(
+        self,
+        ws: WebSocket,
+        log: EventLog,
+        offset: int = 0,
+        structured: bool = False,
+        max_lag: int = 1000,
+        flush_interval: float = 0.02,
+        max_frame_bytes: int = 16384,
+    ):
+        """Initializes the output channel.
+
+        Args:
+            ws: Websocket the events are sent to.
+            log: Event log to forward.
+            offset: Offset of the first event to send.
+            structured: Whether to send offset-tagged JSON frames.
+            max_lag: Backlog size above which low-priority lines are skipped.
+            flush_interval: Seconds to wait for more lines before sending a frame.
+            max_frame_bytes: Frame size that triggers an immediate send.
+        """
+        self.ws = ws
+        self.log = log
+        self.cursor = max(0, offset)
+        self.structured = structured
+        self.max_lag = max(1, max_lag)
+        self.flush_interval = flush_interval
+        self.max_frame_bytes = max_frame_bytes
+
+    async def run(self) -> None:
+        """Forwards events until the log is closed and fully sent."""
+        while await self.log.wait(self.cursor):
+            # Give the run a moment to add more lines unless it is already behind
+            if self.log.next_offset - self.cursor < self.max_lag:
+                await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Sends all events currently in the log beyond the cursor."""
+        while self.cursor < self.log.next_offset:
+            skip_low = self.log.next_offset - self.cursor > self.max_lag
+            events = self.log.read(self.cursor, limit=self.max_lag)
+            if not events:
+                break
+            await self._send_events(events, skip_low)
+
+    async def _send_events(self, events: List[Dict], skip_low: bool) -> None:
+        """Sends a batch of events, coalescing consecutive log lines and tokens."""
+        lines: List[str] = []
+        size = 0
+        skipped = 0
+        tokens: List[str] = []
+
+        for event in events:
+            offset = self.cursor
+            self.cursor += 1
+
+            if event.get("type") in ("token", "token_end"):
+                if not self.structured or (skip_low and event["type"] == "token"):
+                    continue
+                if lines:
+                    await self._send_lines(lines, offset - 1)
+                    lines, size = [], 0
+                if event["type"] == "token":
+                    tokens.append(event["content"])
+                    continue
+
+            if tokens:
+                await self._send_tokens(tokens, offset - 1)
+                tokens = []
+
+            if event.get("type") == "log":
+                if skip_low and event.get("low"):
+                    skipped += 1
+                    continue
+                if skipped:
+                    lines.append(f"… {skipped} debug lines skipped (client is lagging)")
+                    skipped = 0
+                lines.append(event["content"])
+                size += len(event["content"]) + 1
+                if size >= self.max_frame_bytes:
+                    await self._send_lines(lines, offset)
+                    lines, size = [], 0
+                continue
+
+            if lines:
+                await self._send_lines(lines, offset - 1)
+                lines, size = [], 0
+            await self.ws.send_text(self._render(event, offset))
+
+        if tokens:
+            await self._send_tokens(tokens, self.cursor - 1)
+        if skipped:
+            lines.append(f"… {skipped} debug lines skipped (client is lagging)")
+        if lines:
+            await self._send_lines(lines, self.cursor - 1)
+
+    async def _send_tokens(self, tokens: List[str], offset: int) -> None:
+        """Sends streamed tokens as one frame."""
+        await self.ws.send_text(
+            json.dumps({"type": "token", "offset": offset, "content": "".join(tokens)})
+        )
+
+    async def _send_lines(self, lines: List[str], offset: int) -> None:
+        """Sends log lines as one frame."""
+        content = "\n".join(lines)
+        if self.structured:
+            content = json.dumps({"type": "log", "offset": offset, "content": content})
+        await self.ws.send_text(content)
+
+    def _render(self, event: Dict, offset: int) -> str:
+        """Renders a non-log event as a frame."""
+        if self.structured:
+            return json.dumps({**event, "offset": offset})
+        if event["type"] == "done":
+            return "DONE"
+        if event["type"] == "error":
+            return f"❌ Error: {event.get('content', '')}"
+        if event["type"] == "cancelled":
+            seconds = event["release_seconds"]
+            return f"🛑 Cancelled, resources released in {seconds}s"
+        return json.dumps(event)
+
+
+class StdoutInterceptor:
+    """Routes ``print`` output to the current run's output sink."""
+
+    def __init__(self, stream):
+        self._orig_stdout = stream
+
+    def write(self, data):
+        sink = _current_sink.get()
+        if sink is not None:
+            text = data.strip()
+            if text:
+                sink.put(text)
+        return self._orig_stdout.write(data)
+
+    def flush(self):
+        try:
+            self._orig_stdout.flush()
+        except:
+            pass
+
+    def __getattr__(self, name):
+        return getattr(self._orig_stdout, name)
+
+
+def _loguru_sink(message) -> None:
+    """Routes log records to the current run's output sink."""
+    sink = _current_sink.get()
+    if sink is None:
+        return
+    text = message.strip()
+    if text:
+        sink.put(text, low_priority=message.record["level"].no < _LOW_PRIORITY_LEVEL)
+
+
+_installed = False
+
+
+def install_output_capture() -> None:
+    """Installs the process-wide loguru sink and stdout interceptor.
+
+    Output produced while a sink is active (see ``capture_output``) is
+    forwarded to that sink only, so concurrent runs do not receive each
+    other's output.
+    """
+    global _installed
+    if _installed:
+        return
+    logger.add(_loguru_sink, format="{level} - {message}", level="DEBUG")
+    sys.stdout = StdoutInterceptor(sys.stdout)
+    _installed = True
+
+
+@contextmanager
+def capture_output(sink: OutputSink):
+    """Forwards logs and prints of the current task to ``sink``.
+
+    Tasks and threads started inside the context inherit the sink.
+
+    Args:
+        sink: Output sink of the run.
+    """
+    token = _current_sink.set(sink)
+    try:
+        yield sink
+    finally:
+        _current_sink.reset(token)
@@ -0,0 +1,160 @@
+"""Append-only, offset-addressed event log for agent runs."""
+
+import asyncio
+import json
+import os
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, List, Optional
+
+
+class EventLog:
+    """Append-only log of run events addressed by offset.
+
+    The most recent events are kept in memory. Once more than
+    ``max_memory_events`` are held, the oldest half is spilled to a JSON-lines
+    file so that long runs have bounded memory while remaining fully
+    replayable. Readers can wait for events beyond an offset.
+
+    Attributes:
+        spill_path: File the spilled events are appended to.
+        max_memory_events: Maximum number of events kept in memory.
+    """
+
+    def __init__(
+        self, spill_path: Optional[Path] = None, max_memory_events: int = 2000
+    ):
+        """Initializes an event log.
+
+        Args:
+            spill_path: File to spill old events to. Events stay in memory if None.
+            max_memory_events: Maximum number of events kept in memory.
+        """
+        self.spill_path = spill_path
+        self.max_memory_events = max(2, max_memory_events)
+
+        self._memory: Deque[Dict] = deque()
+        self._memory_start = 0  # Offset of the first in-memory event
+        self._spill_index: List[int] = []  # Byte position of each spilled event
+        self._closed = False
+
+        # Appends may come from worker threads (e.g. logs from asyncio.to_thread)
+        self._lock = threading.Lock()
+        self._loop = asyncio.get_running_loop()
+        self._appended = asyncio.Event()
+
+    @property
+    def next_offset(self) -> int:
+        """Offset the next appended event will get."""
+        return self._memory_start + len(self._memory)
+
+    @property
+    def closed(self) -> bool:
+        """Whether the log accepts no more events."""
+        return self._closed
+
+    def append(self, event: Dict) -> int:
+        """Appends an event.
+
+        Args:
+            event: JSON-serializable event.
+
+        Returns:
+            int: Offset of the appended event.
+        """
+        with self._lock:
+            if self._closed:
+                return -1
+            offset = self.next_offset
+            self._memory.append(event)
+            if self.spill_path and len(self._memory) > self.max_memory_events:
+                self._spill(len(self._memory) // 2)
+        self._notify()
+        return offset
+
+    def read(self, offset: int, limit: Optional[int] = None) -> List[Dict]:
+        """Reads events starting at an offset.
+
+        Args:
+            offset: Offset of the first event to read.
+            limit: Maximum number of events to read.
+
+        Returns:
+            List[Dict]: Events from ``offset`` onwards, in order.
+        """
+        with self._lock:
+            end = self.next_offset
+            if limit is not None:
+                end = min(end, offset + limit)
+            offset = max(0, offset)
+            if offset >= end:
+                return []
+
+            events: List[Dict] = []
+            if offset < self._memory_start:
+                events.extend(self._read_spilled(offset, min(end, self._memory_start)))
+                offset = self._memory_start
+            for index in range(offset - self._memory_start, end - self._memory_start):
+                events.append(self._memory[index])
+            return events
+
+    async def wait(self, offset: int) -> bool:
+        """Waits until an event exists at ``offset`` or the log is closed.
+
+        Args:
+            offset: Offset to wait for.
+
+        Returns:
+            bool: True if an event is available at ``offset``.
+        """
+        while self.next_offset <= offset and not self._closed:
+            self._appended.clear()
+            if self.next_offset > offset or self._closed:
+                break
+            await self._appended.wait()
+        return self.next_offset > offset
+
+    def close(self) -> None:
+        """Marks the log complete and wakes up waiting readers."""
+        with self._lock:
+            self._closed = True
+        self._notify()
+
+    def delete(self) -> None:
+        """Closes the log and removes its spill file."""
+        self.close()
+        if self.spill_path and os.path.exists(self.spill_path):
+            os.remove(self.spill_path)
+
+    def _notify(self) -> None:
+        """Wakes up waiting readers from any thread."""
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._appended.set()
+        elif not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._appended.set)
+
+    def _spill(self, count: int) -> None:
+        """Moves the oldest ``count`` in-memory events to the spill file."""
+        os.makedirs(os.path.dirname(self.spill_path), exist_ok=True)
+        with open(self.spill_path, "ab") as f:
+            position = f.tell()
+            for _ in range(count):
+                line = json.dumps(self._memory.popleft()).encode("utf-8") + b"\n"
+                self._spill_index.append(position)
+                f.write(line)
+                position += len(line)
+        self._memory_start += count
+
+    def _read_spilled(self, start: int, end: int) -> List[Dict]:
+        """Reads spilled events in ``[start, end)``."""
+        events = []
+        with open(self.spill_path, "rb") as f:
+            f.seek(self._spill_index[start])
+            for _ in range(end - start):
+                events.append(json.loads(f.readline()))
+        return events
@@ -0,0 +1,206 @@
+"""Cached workspace file index and HTTP caching helpers for the files API."""
+
+import fnmatch
+import os
+import threading
+import zipfile
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+
+class WorkspaceIndex:
+    """Sorted listing of the files in the workspace directory.
+
+    The listing is rebuilt only when the directory's mtime changes, which
+    happens whenever a file is created, removed or renamed in it. Size and
+    mtime metadata are read when entries are returned, so they are always
+    current even for files modified in place.
+
+    Attributes:
+        root: Directory being indexed.
+    """
+
+    def __init__(self, root: Path):
+        """Initializes the index.
+
+        Args:
+            root: Directory to index.
+        """
+        self.root = Path(root)
+        self._names: List[str] = []
+        self._name_set: frozenset = frozenset()
+        self._version: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        """Forces the listing to be rebuilt on next use."""
+        with self._lock:
+            self._version = None
+
+    def names(self) -> List[str]:
+        """Gets the sorted names of the visible files in the workspace.
+
+        Returns:
+            List[str]: File names, excluding hidden files and directories.
+        """
+        try:
+            st = os.stat(self.root)
+        except FileNotFoundError:
+            return []
+
+        version = (st.st_ino, st.st_mtime_ns)
+        with self._lock:
+            if version != self._version:
+                with os.scandir(self.root) as it:
+                    names = sorted(
+                        entry.name
+                        for entry in it
+                        if not entry.name.startswith(".") and entry.is_file()
+                    )
+                self._names = names
+                self._name_set = frozenset(names)
+                self._version = version
+            return self._names
+
+    def stat(self, name: str) -> Optional[os.stat_result]:
+        """Gets the status of an indexed file.
+
+        Only names in the listing are accepted, so paths outside the
+        workspace can never be resolved.
+
+        Args:
+            name: File name.
+
+        Returns:
+            Optional[os.stat_result]: File status, or None if not indexed.
+        """
+        self.names()
+        if name not in self._name_set:
+            return None
+        try:
+            return os.stat(self.root / name)
+        except FileNotFoundError:
+            return None
+
+    def list(
+        self, offset: int = 0, limit: int = 100, pattern: Optional[str] = None
+    ) -> Tuple[int, List[Dict]]:
+        """Lists a page of files with their metadata.
+
+        Args:
+            offset: Number of matching files to skip.
+            limit: Maximum number of files to return.
+            pattern: Optional case-insensitive glob the names must match.
+
+        Returns:
+            Tuple[int, List[Dict]]: Number of matching files, and the page of
+                entries with ``name``, ``size`` and ``mtime``.
+        """
+        names = self.names()
+        if pattern:
+            pattern = pattern.lower()
+            names = [name for name in names if fnmatch.fnmatch(name.lower(), pattern)]
+
+        entries = []
+        for name in names[offset : offset + limit]:
+            try:
+                st = os.stat(self.root / name)
+            except FileNotFoundError:
+                continue  # Removed since the listing was built
+            entries.append({"name": name, "size": st.st_size, "mtime": st.st_mtime})
+        return len(names), entries
+
+    def iter_zip(
+        self, names: Iterable[str], chunk_size: int = 1 << 20
+    ) -> Iterator[bytes]:
+        """Streams a zip archive of indexed files.
+
+        The archive is produced chunk by chunk without being held in memory
+        or written to disk. Unknown names are skipped.
+
+        Args:
+            names: Names of the files to include.
+            chunk_size: Size of the chunks files are read in.
+
+        Yields:
+            bytes: Consecutive parts of the archive.
+        """
+        buffer = _ZipBuffer()
+        with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for name in names:
+                st = self.stat(name)
+                if st is None:
+                    continue
+                info = zipfile.ZipInfo.from_file(self.root / name, name)
+                info.compress_type = zipfile.ZIP_DEFLATED
+                large = st.st_size > zipfile.ZIP64_LIMIT // 2  # May grow meanwhile
+                with open(self.root / name, "rb") as src, zf.open(
+                    info, "w", force_zip64=large
+                ) as dst:
+                    while chunk := src.read(chunk_size):
+                        dst.write(chunk)
+                        yield buffer.take()
+                yield buffer.take()
+        yield buffer.take()
+
+
+class _ZipBuffer:
+    """Write-only, unseekable stream that hands out what was written."""
+
+    def __init__(self):
+        self._data = bytearray()
+        self._position = 0
+
+    def write(self, data: bytes) -> int:
+        self._data += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def take(self) -> bytes:
+        data = bytes(self._data)
+        self._data.clear()
+        return data
+
+
+def file_etag(st: os.stat_result) -> str:
+    """Builds a strong ETag from a file's mtime and size."""
+    return f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+
+def http_date(timestamp: float) -> str:
+    """Formats a timestamp as an HTTP date."""
+    return formatdate(timestamp, usegmt=True)
+
+
+def not_modified(headers: Mapping[str, str], etag: str, mtime: float) -> bool:
+    """Checks a request's conditional headers against a file's validators.
+
+    Args:
+        headers: Request headers.
+        etag: Current ETag of the file.
+        mtime: Current modification time of the file.
+
+    Returns:
+        bool: True if the client's copy is current and 304 can be sent.
+    """
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        # HTTP dates have a resolution of one second
+        return int(mtime) <= since
+    return False
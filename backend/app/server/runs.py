@@ -0,0 +1,704 @@
+"""Agent runs decoupled from the websocket connections observing them."""
+
+import asyncio
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from enum import Enum
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.agent.manus import Manus
+from app.cancellation import CancellationToken, cancellation_scope
+from app.exceptions import RunCancelled, RunRejected
+from app.flow.flow_factory import FlowFactory, FlowType
+from app.llm import stream_tokens, track_usage
+from app.logger import logger
+from app.metrics import REGISTRY
+from app.sandbox.client import sandbox_session
+from app.server.channel import capture_output
+from app.server.events import EventLog
+from app.server.files import WorkspaceIndex
+from app.server.scheduler import RunScheduler
+from app.server.store import RunStore
+
+
+# Identifies this server process among the workers sharing a run store
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Default location of event log spill files and the run store
+DEFAULT_RUN_DIR = Path(tempfile.gettempdir()) / "openmanus_runs"
+
+CANCEL_RELEASE = REGISTRY.histogram(
+    "openmanus_run_cancel_release_seconds",
+    "Time from a cancel request until the run released its resources",
+    labels=("forced",),
+)
+
+
+def _worker_alive(worker_id: Optional[str]) -> bool:
+    """Tells whether a worker may still be running.
+
+    Only workers on this host can be checked, by their process ID; others
+    are assumed alive.
+    """
+    host, _, pid = (worker_id or "").rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class RunStatus(str, Enum):
+    """Run lifecycle states"""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    REJECTED = "rejected"
+    CANCELLED = "cancelled"
+
+
+class Run:
+    """A single agent run and its event log.
+
+    The run executes independently of any websocket. Its output is appended
+    to ``events``, from which any number of connections can replay and
+    follow it, and user input is read from ``input_queue``.
+
+    Text streamed by the LLM is batched into ``token`` events: pending
+    tokens are appended at most ``token_flush_interval`` seconds after the
+    first one arrives, and before any other event so that order is kept.
+
+    If a store is given, metadata, events and token usage are also written
+    to it so that other workers can answer queries about the run.
+
+    Non-interactive runs, such as batch jobs, have nobody to answer the
+    agent's questions, so the agent is told to proceed on its own.
+
+    Attributes:
+        run_id: Unique run identifier.
+        prompt: User prompt the agent runs on.
+        client_id: Identifier of the client used for fair scheduling.
+        session_id: Session whose sandbox the run uses, as supplied by the
+            client, or None for a sandbox of its own.
+        flow: Flow the prompt is executed with, or None to run the agent alone.
+        interactive: Whether a user can answer the agent's questions.
+        status: Current run status.
+        events: Replayable event log of the run.
+        input_queue: Answers to the agent's questions to the user.
+        cancellation: Token cancelling the run.
+        token_usage: Tokens used per model.
+        artifacts: Workspace files the run created or modified.
+        result: Final output of the agent or flow, once completed.
+    """
+
+    # Answer given to agent questions when no user is available
+    NO_USER_ANSWER = (
+        "No user is available to answer. Proceed with your best judgement "
+        "and state any assumptions in your result."
+    )
+
+    def __init__(
+        self,
+        run_id: str,
+        prompt: str,
+        client_id: str,
+        events: EventLog,
+        token_flush_interval: float = 0.05,
+        store: Optional[RunStore] = None,
+        flow: Optional[FlowType] = None,
+        interactive: bool = True,
+        session_id: Optional[str] = None,
+    ):
+        self.run_id = run_id
+        self.prompt = prompt
+        self.client_id = client_id
+        self.session_id = session_id
+        self.flow = flow
+        self.interactive = interactive
+        self.status = RunStatus.QUEUED
+        self.events = events
+        self.input_queue: asyncio.Queue[str] = asyncio.Queue()
+        self.pending_input: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self.token_usage: Dict[str, Dict[str, int]] = {}
+        self.artifacts: List[Dict] = []
+        self.result: Optional[str] = None
+        self.store = store
+        self.cancellation = CancellationToken()
+        self.release_seconds: Optional[float] = None
+
+        self.token_flush_interval = token_flush_interval
+        self._tokens: List[str] = []
+        self._streaming = False  # Whether tokens were streamed since the last end
+        self._tokens_lock = threading.Lock()  # Logs may come from worker threads
+        self._token_flush: Optional[asyncio.TimerHandle] = None
+
+    def emit(self, event: Dict) -> int:
+        """Appends an event to the run's log.
+
+        Args:
+            event: JSON-serializable event with a ``type`` field.
+
+        Returns:
+            int: Offset of the event.
+        """
+        self._flush_tokens()
+        return self._append(event)
+
+    def _append(self, event: Dict) -> int:
+        """Appends an event to the log and the store."""
+        offset = self.events.append(event)
+        if self.store and offset >= 0:
+            self.store.append_event(self.run_id, offset, event)
+        return offset
+
+    def save(self) -> None:
+        """Writes the run's metadata to the store."""
+        if self.store:
+            self.store.save_run({**self.to_dict(), "prompt": self.prompt})
+
+    def put(self, text: str, low_priority: bool = False) -> None:
+        """Appends a captured output line to the run's log."""
+        event = {"type": "log", "content": text}
+        if low_priority:
+            event["low"] = True
+        self.emit(event)
+
+    def on_token(self, text: str) -> None:
+        """Buffers text streamed by the LLM."""
+        with self._tokens_lock:
+            self._streaming = True
+            self._tokens.append(text)
+            if self._token_flush is None:
+                self._token_flush = asyncio.get_running_loop().call_later(
+                    self.token_flush_interval, self._flush_tokens
+                )
+
+    def on_stream_end(self, discarded: bool = False) -> None:
+        """Appends the remaining tokens and marks the end of the response.
+
+        A discarded response is marked so clients drop its partial text
+        instead of showing it next to the retried response.
+        """
+        if self._streaming:
+            self._streaming = False
+            event = {"type": "token_end"}
+            if discarded:
+                event["discarded"] = True
+            self.emit(event)
+
+    def _flush_tokens(self) -> None:
+        """Appends buffered tokens as one ``token`` event."""
+        with self._tokens_lock:
+            if self._token_flush is not None:
+                self._token_flush.cancel()
+                self._token_flush = None
+            if not self._tokens:
+                return
+            content = "".join(self._tokens)
+            self._tokens.clear()
+            self._append({"type": "token", "content": content})
+
+    def on_usage(self, model: str, input_tokens: int, completion_tokens: int) -> None:
+        """Adds the token usage of an LLM request made by the run."""
+        usage = self.token_usage.setdefault(model, {"input": 0, "completion": 0})
+        usage["input"] += input_tokens
+        usage["completion"] += completion_tokens
+        if self.store:
+            self.store.add_tokens(self.run_id, model, input_tokens, completion_tokens)
+
+    async def ask_user(self, question: str) -> str:
+        """Asks the user a question and waits for the answer.
+
+        Args:
+            question: Question to ask.
+
+        Returns:
+            str: The user's answer.
+        """
+        if not self.interactive:
+            logger.info(f"📨 No user to ask, continuing: {question}")
+            return self.NO_USER_ANSWER
+
+        # We send a JSON event to distinguish it from normal logs
+        logger.info(f"📨 Asking user: {question}")
+        self.pending_input = question
+        self.save()
+        self.emit({"type": "input_request", "content": question})
+
+        response = await self.input_queue.get()
+        self.pending_input = None
+        self.save()
+        logger.info(f"📬 Received user response: {response}")
+
+        # Try to parse as JSON if the frontend sends structured data
+        try:
+            data = json.loads(response)
+            if isinstance(data, dict) and data.get("type") == "user_input":
+                logger.debug(f"📝 Parsed structured response")
+                return data.get("content", "")
+        except:
+            pass
+
+        return response
+
+    def to_dict(self) -> Dict:
+        """Summarizes the run for status queries."""
+        return {
+            "run_id": self.run_id,
+            "worker_id": WORKER_ID,
+            "status": self.status.value,
+            "client_id": self.client_id,
+            "session_id": self.session_id,
+            "flow": self.flow.value if self.flow else None,
+            "interactive": self.interactive,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "next_offset": self.events.next_offset,
+            "pending_input": self.pending_input,
+            "tokens": self.token_usage,
+            "release_seconds": self.release_seconds,
+            "result": self.result,
+        }
+
+
+class RunManager:
+    """Starts agent runs and keeps them available for reconnecting clients.
+
+    Runs acquire an execution slot from the scheduler, then execute in their
+    own task. Finished runs are kept for ``retention`` seconds so clients
+    can still replay their events, then discarded along with their spill files.
+
+    A run is pinned to the worker executing it: only that worker holds its
+    agent and input queue. With a shared store, the other workers can still
+    answer status, replay and artifact queries about it.
+
+    Cancelling a run signals its cancellation token, which the agent checks
+    between steps and which interrupts in-flight LLM requests and tool
+    executions. A run that has not stopped ``cancel_grace`` seconds later
+    has its task cancelled outright.
+
+    Attributes:
+        scheduler: Admission controller runs are executed under.
+        spill_dir: Directory for event log spill files.
+        max_memory_events: Events kept in memory per run before spilling.
+        retention: Seconds finished runs are kept.
+        token_flush_interval: Seconds streamed tokens are batched for.
+        store: Run store shared with other workers, if any.
+        workspace: Index of the workspace the runs' artifacts are found in.
+        cancel_grace: Seconds a cancelled run may take to stop by itself.
+    """
+
+    def __init__(
+        self,
+        scheduler: RunScheduler,
+        spill_dir: Optional[str] = None,
+        max_memory_events: int = 2000,
+        retention: int = 3600,
+        token_flush_interval: float = 0.05,
+        store: Optional[RunStore] = None,
+        workspace: Optional[WorkspaceIndex] = None,
+        cancel_grace: float = 10.0,
+    ):
+        """Initializes the run manager.
+
+        Args:
+            scheduler: Admission controller runs are executed under.
+            spill_dir: Directory for event log spill files; a temp dir if None.
+            max_memory_events: Events kept in memory per run before spilling.
+            retention: Seconds finished runs are kept.
+            token_flush_interval: Seconds streamed tokens are batched for.
+            store: Run store shared with other workers.
+            workspace: Workspace index used to find the files runs produce.
+            cancel_grace: Seconds a cancelled run may take to stop by itself.
+        """
+        self.scheduler = scheduler
+        self.spill_dir = Path(spill_dir or DEFAULT_RUN_DIR)
+        self.max_memory_events = max_memory_events
+        self.retention = retention
+        self.token_flush_interval = token_flush_interval
+        self.store = store
+        self.workspace = workspace
+        self.cancel_grace = cancel_grace
+        self._runs: Dict[str, Run] = {}
+        self._active_sessions: Set[str] = set()
+
+    def get(self, run_id: str) -> Optional[Run]:
+        """Gets a run executing on this worker by ID.
+
+        Args:
+            run_id: Run ID.
+
+        Returns:
+            Optional[Run]: The run, or None if unknown, expired or elsewhere.
+        """
+        return self._runs.get(run_id)
+
+    async def describe(self, run_id: str) -> Optional[Dict]:
+        """Gets the status of a run executing on any worker.
+
+        Args:
+            run_id: Run ID.
+
+        Returns:
+            Optional[Dict]: Run status, or None if unknown or expired.
+        """
+        run = self._runs.get(run_id)
+        if run:
+            return run.to_dict()
+        if self.store:
+            return await asyncio.to_thread(self.store.get_run, run_id)
+        return None
+
+    async def replay(
+        self, run_id: str, offset: int, limit: int
+    ) -> Optional[Tuple[List[Dict], bool]]:
+        """Reads the events of a run executing on any worker.
+
+        Args:
+            run_id: Run ID.
+            offset: Offset of the first event to read.
+            limit: Maximum number of events to read.
+
+        Returns:
+            Optional[Tuple[List[Dict], bool]]: The events, and whether the
+                run has finished; None if the run is unknown or expired.
+        """
+        run = self._runs.get(run_id)
+        if run:
+            return run.events.read(offset, limit=limit), run.events.closed
+        if not self.store:
+            return None
+
+        info = await asyncio.to_thread(self.store.get_run, run_id)
+        if info is None:
+            return None
+        events = await asyncio.to_thread(self.store.read_events, run_id, offset, limit)
+        return events, info.get("finished_at") is not None
+
+    async def list_artifacts(self, run_id: str) -> Optional[List[Dict]]:
+        """Lists the workspace files a run created or modified.
+
+        Args:
+            run_id: Run ID.
+
+        Returns:
+            Optional[List[Dict]]: Entries with ``name``, ``size`` and
+                ``mtime``, or None if the run is unknown or expired.
+        """
+        run = self._runs.get(run_id)
+        if run:
+            return run.artifacts
+        if self.store and await asyncio.to_thread(self.store.get_run, run_id):
+            return await asyncio.to_thread(self.store.list_artifacts, run_id)
+        return None
+
+    async def wait(self, run_id: str, timeout: float) -> None:
+        """Waits until a run executing on this worker finishes.
+
+        Args:
+            run_id: Run ID.
+            timeout: Maximum number of seconds to wait.
+        """
+        run = self._runs.get(run_id)
+        if run and run.task and timeout > 0:
+            await asyncio.wait({run.task}, timeout=timeout)
+
+    def start(
+        self,
+        prompt: str,
+        client_id: str,
+        flow: Optional[FlowType] = None,
+        interactive: bool = True,
+        run_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+    ) -> Run:
+        """Starts a run in the background.
+
+        Args:
+            prompt: User prompt.
+            client_id: Identifier of the client used for fair scheduling.
+            flow: Flow to execute the prompt with; the agent alone if None.
+            interactive: Whether a user can answer the agent's questions.
+            run_id: ID to give the run; a random one if None.
+            session_id: Session supplied by the client whose sandbox the
+                run continues in; the run gets its own sandbox if None.
+
+        Returns:
+            Run: The started run.
+        """
+        run_id = run_id or uuid.uuid4().hex
+        events = EventLog(
+            self.spill_dir / f"{run_id}.jsonl", max_memory_events=self.max_memory_events
+        )
+        run = Run(
+            run_id,
+            prompt,
+            client_id,
+            events,
+            token_flush_interval=self.token_flush_interval,
+            store=self.store,
+            flow=flow,
+            interactive=interactive,
+            session_id=session_id,
+        )
+        # Leave interrupted calls time to unwind before the run is force-cancelled
+        run.cancellation.release_timeout = self.cancel_grace / 2
+        self._runs[run_id] = run
+        run.save()
+        run.task = asyncio.create_task(self._execute(run))
+        return run
+
+    def cancel(self, run_id: str, reason: str = "Cancelled by user") -> bool:
+        """Requests cancellation of a run executing on this worker.
+
+        Args:
+            run_id: Run ID.
+            reason: Why the run is cancelled.
+
+        Returns:
+            bool: False if the run is unknown, finished or already cancelled.
+        """
+        run = self._runs.get(run_id)
+        if not run or run.finished_at is not None:
+            return False
+        if not run.cancellation.cancel(reason):
+            return False
+
+        logger.info(f"🛑 Cancelling run {run_id}: {reason}")
+        run.emit({"type": "cancelling", "content": reason})
+        if run.status == RunStatus.QUEUED:
+            run.task.cancel()  # Nothing to release yet
+        else:
+            asyncio.get_running_loop().call_later(
+                self.cancel_grace, self._force_cancel, run
+            )
+        return True
+
+    def _force_cancel(self, run: Run) -> None:
+        """Cancels the task of a run that did not stop in time."""
+        if run.task and not run.task.done():
+            logger.warning(
+                f"Run {run.run_id} did not stop within {self.cancel_grace}s, "
+                "cancelling its task"
+            )
+            run.task.cancel()
+
+    def _record_cancelled(self, run: Run, forced: bool) -> None:
+        """Marks a run cancelled and reports how long releasing it took."""
+        release = time.monotonic() - run.cancellation.cancelled_at
+        run.status = RunStatus.CANCELLED
+        run.release_seconds = round(release, 3)
+        CANCEL_RELEASE.observe(release, forced=str(forced).lower())
+        logger.info(f"🛑 Run {run.run_id} cancelled, released in {release:.2f}s")
+        run.emit(
+            {
+                "type": "cancelled",
+                "content": run.cancellation.reason,
+                "release_seconds": run.release_seconds,
+            }
+        )
+
+    async def _execute(self, run: Run) -> None:
+        """Waits for an execution slot, runs the agent and records the outcome."""
+
+        async def on_position(position: int):
+            run.emit({"type": "queue", "position": position})
+
+        try:
+            async with self.scheduler.slot(run.client_id, on_position=on_position):
+                run.status = RunStatus.RUNNING
+                run.started_at = time.time()
+                run.save()
+                # Runs of a session share its sandbox, one run at a time so
+                # they do not overwrite each other's files; other runs get a
+                # sandbox of their own, removed when they end
+                session_id = run.session_id
+                if session_id in self._active_sessions:
+                    logger.warning(
+                        f"Session {session_id} is busy, run {run.run_id} "
+                        "uses a sandbox of its own"
+                    )
+                    session_id = None
+                if session_id:
+                    self._active_sessions.add(session_id)
+                try:
+                    with cancellation_scope(run.cancellation):
+                        with sandbox_session(session_id or run.run_id) as sandbox:
+                            try:
+                                await self._run_agent(run)
+                            finally:
+                                if not session_id:
+                                    await sandbox.end_session()
+                finally:
+                    self._active_sessions.discard(session_id)
+        except RunRejected as e:
+            logger.warning(f"Run {run.run_id} rejected: {e}")
+            run.status = RunStatus.REJECTED
+            run.emit({"type": "rejected", "content": str(e)})
+        except asyncio.CancelledError:
+            if not run.cancellation.cancelled:
+                run.status = RunStatus.FAILED
+                run.emit(
+                    {"type": "error", "content": "Run interrupted by server shutdown"}
+                )
+                raise
+            self._record_cancelled(run, forced=run.status != RunStatus.QUEUED)
+        finally:
+            run.finished_at = time.time()
+            run.save()
+            run.events.close()
+            asyncio.get_running_loop().call_later(
+                self.retention, self._discard, run.run_id
+            )
+
+    async def _run_agent(self, run: Run) -> None:
+        """Runs a Manus agent or flow on the run's prompt, capturing its output."""
+        agent = Manus()
+        agent.set_input_callback(run.ask_user)
+        before = await self._snapshot_workspace()
+
+        # All prints, logs, streamed LLM tokens and token usage captured!
+        cancelled = False
+        with capture_output(run), stream_tokens(run), track_usage(run):
+            try:
+                if run.flow:
+                    logger.info(f"🚀 Starting {run.flow.value} flow...")
+                    flow = FlowFactory.create_flow(run.flow, agents={"manus": agent})
+                    run.result = await flow.execute(run.prompt)
+                else:
+                    logger.info("🚀 Starting Manus agent...")
+                    run.result = await agent.run(run.prompt)
+                logger.info("🎉 Request finished!")
+                run.status = RunStatus.COMPLETED
+                run.emit({"type": "done"})
+
+            except RunCancelled:
+                logger.info("🛑 Run cancelled, releasing resources...")
+                cancelled = True
+
+            except Exception as e:
+                logger.exception("❌ Manus error occurred.")
+                run.status = RunStatus.FAILED
+                run.emit({"type": "error", "content": str(e)})
+
+            finally:
+                try:
+                    await agent.cleanup()
+                except:
+                    pass
+                await self._record_artifacts(run, before)
+
+        if cancelled:
+            self._record_cancelled(run, forced=False)
+
+    async def _snapshot_workspace(self) -> Dict[str, Tuple[int, float]]:
+        """Gets the size and mtime of every workspace file."""
+        if not self.workspace:
+            return {}
+        _, entries = await asyncio.to_thread(self.workspace.list, 0, 1 << 31)
+        return {entry["name"]: (entry["size"], entry["mtime"]) for entry in entries}
+
+    async def _record_artifacts(
+        self, run: Run, before: Dict[str, Tuple[int, float]]
+    ) -> None:
+        """Records the workspace files that changed while the run executed.
+
+        Runs share the workspace, so files written by concurrent runs are
+        attributed to all of them.
+        """
+        after = await self._snapshot_workspace()
+        run.artifacts = [
+            {"name": name, "size": size, "mtime": mtime}
+            for name, (size, mtime) in sorted(after.items())
+            if before.get(name) != (size, mtime)
+        ]
+        if self.store and run.artifacts:
+            self.store.save_artifacts(run.run_id, run.artifacts)
+
+    def _discard(self, run_id: str) -> None:
+        """Forgets an expired run and removes its spill file and records."""
+        self._forget(run_id)
+        if self.store:
+            self.store.delete_run(run_id)
+
+    def _forget(self, run_id: str) -> None:
+        """Removes a run from this worker's memory and its spill file."""
+        run = self._runs.pop(run_id, None)
+        if run:
+            try:
+                run.events.delete()
+            except OSError as e:
+                logger.warning(f"Failed to remove event log of run {run_id}: {e}")
+
+    async def fail_orphaned(self) -> int:
+        """Marks runs failed in the store whose worker stopped running them.
+
+        A worker that crashed or was killed leaves its runs unfinished, so
+        they would stay running and never expire. Called on startup.
+
+        Returns:
+            int: Number of runs marked failed.
+        """
+        if not self.store:
+            return 0
+        unfinished = await asyncio.to_thread(self.store.list_unfinished)
+        orphaned = [r for r in unfinished if not _worker_alive(r.get("worker_id"))]
+        for info in orphaned:
+            self.store.append_event(
+                info["run_id"],
+                info["next_offset"],
+                {"type": "error", "content": "Run interrupted by worker exit"},
+            )
+            info.update(
+                status=RunStatus.FAILED.value,
+                finished_at=time.time(),
+                pending_input=None,
+            )
+            self.store.save_run(info)
+        if orphaned:
+            logger.warning(f"Marked {len(orphaned)} runs of stopped workers failed")
+        return len(orphaned)
+
+    async def shutdown(self) -> None:
+        """Cancels unfinished runs and removes local event logs.
+
+        Records in the store are kept until they expire, so runs stay
+        queryable from other workers and after a restart.
+        """
+        tasks = [run.task for run in self._runs.values() if run.task]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        for run_id in list(self._runs):
+            self._forget(run_id)
+        if self.store:
+            await asyncio.to_thread(self.store.flush)
+
+    def get_stats(self) -> Dict:
+        """Gets run statistics.
+
+        Returns:
+            Dict: Statistics information.
+        """
+        statuses: Dict[str, int] = {status.value: 0 for status in RunStatus}
+        for run in self._runs.values():
+            statuses[run.status.value] += 1
+        return {"total_runs": len(self._runs), "runs_by_status": statuses}
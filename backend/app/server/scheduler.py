@@ -0,0 +1,236 @@
+"""Admission control and fair scheduling for agent runs."""
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Deque, Dict, Optional
+
+from app.exceptions import RunRejected
+from app.logger import logger
+
+
+PositionCallback = Callable[[int], Awaitable[None]]
+
+
+class _Waiter:
+    """A run waiting for an execution slot."""
+
+    def __init__(self, client_id: str):
+        self.client_id = client_id
+        self.enqueued_at = time.monotonic()
+        self.position: Optional[int] = None
+        self.granted = False
+        # Receives queue positions while waiting, then None once admitted
+        self.updates: asyncio.Queue[Optional[int]] = asyncio.Queue()
+
+
+class RunScheduler:
+    """Admission controller for concurrent agent runs.
+
+    At most ``max_concurrent_runs`` runs execute at once. Further runs wait in
+    per-client FIFO queues that are served round-robin, so a client submitting
+    many runs cannot starve the others. When the queue is full, new runs are
+    rejected immediately instead of waiting.
+
+    Attributes:
+        max_concurrent_runs: Maximum number of runs executing at once.
+        max_queue_size: Maximum number of runs waiting across all clients.
+        max_queued_per_client: Maximum number of runs waiting per client.
+    """
+
+    def __init__(
+        self,
+        max_concurrent_runs: int = 4,
+        max_queue_size: int = 32,
+        max_queued_per_client: int = 4,
+    ):
+        """Initializes the scheduler.
+
+        Args:
+            max_concurrent_runs: Maximum number of runs executing at once.
+            max_queue_size: Maximum number of runs waiting across all clients.
+            max_queued_per_client: Maximum number of runs waiting per client.
+        """
+        self.max_concurrent_runs = max(1, max_concurrent_runs)
+        self.max_queue_size = max(0, max_queue_size)
+        self.max_queued_per_client = max(1, max_queued_per_client)
+
+        self._active = 0
+        self._queued = 0
+        # Insertion order is the round-robin order of the next clients to serve
+        self._queues: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()
+
+        # Statistics
+        self._admitted = 0
+        self._rejected = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    @property
+    def active_runs(self) -> int:
+        """Number of runs currently holding a slot."""
+        return self._active
+
+    @property
+    def queued_runs(self) -> int:
+        """Number of runs waiting for a slot."""
+        return self._queued
+
+    async def acquire(
+        self, client_id: str, on_position: Optional[PositionCallback] = None
+    ) -> float:
+        """Waits for an execution slot.
+
+        Args:
+            client_id: Identifier used for per-client fairness.
+            on_position: Optional coroutine called with the 1-based queue
+                position whenever it changes while waiting.
+
+        Returns:
+            float: Seconds spent waiting in the queue.
+
+        Raises:
+            RunRejected: If the queue is full.
+        """
+        if self._active < self.max_concurrent_runs and not self._queued:
+            self._active += 1
+            self._record_admission(0.0)
+            return 0.0
+
+        client_queue = self._queues.get(client_id)
+        if self._queued >= self.max_queue_size:
+            self._rejected += 1
+            raise RunRejected(
+                f"Server is busy: {self._active} runs active and {self._queued} queued"
+            )
+        if client_queue and len(client_queue) >= self.max_queued_per_client:
+            self._rejected += 1
+            raise RunRejected(
+                f"Too many queued runs for this client ({len(client_queue)})"
+            )
+
+        waiter = _Waiter(client_id)
+        self._queues.setdefault(client_id, deque()).append(waiter)
+        self._queued += 1
+        self._publish_positions()
+
+        try:
+            while True:
+                position = await waiter.updates.get()
+                if position is None:
+                    break
+                if on_position:
+                    await on_position(position)
+        except BaseException:
+            if waiter.granted:
+                self.release()
+            else:
+                self._remove(waiter)
+            raise
+
+        wait = time.monotonic() - waiter.enqueued_at
+        self._record_admission(wait)
+        return wait
+
+    def release(self) -> None:
+        """Releases a slot and admits the next waiting run, if any."""
+        if self._active > 0:
+            self._active -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(
+        self, client_id: str, on_position: Optional[PositionCallback] = None
+    ):
+        """Context manager holding an execution slot for its duration.
+
+        Args:
+            client_id: Identifier used for per-client fairness.
+            on_position: Optional coroutine called with queue position updates.
+
+        Yields:
+            float: Seconds spent waiting in the queue.
+
+        Raises:
+            RunRejected: If the queue is full.
+        """
+        wait = await self.acquire(client_id, on_position)
+        try:
+            yield wait
+        finally:
+            self.release()
+
+    def _dispatch(self) -> None:
+        """Admits waiting runs round-robin while slots are free."""
+        admitted = False
+        while self._active < self.max_concurrent_runs and self._queues:
+            client_id, client_queue = next(iter(self._queues.items()))
+            waiter = client_queue.popleft()
+            if client_queue:
+                self._queues.move_to_end(client_id)
+            else:
+                del self._queues[client_id]
+
+            self._queued -= 1
+            self._active += 1
+            waiter.granted = True
+            waiter.updates.put_nowait(None)
+            admitted = True
+
+        if admitted:
+            self._publish_positions()
+
+    def _remove(self, waiter: _Waiter) -> None:
+        """Removes a waiter that gave up before being admitted."""
+        client_queue = self._queues.get(waiter.client_id)
+        if client_queue is None or waiter not in client_queue:
+            return
+        client_queue.remove(waiter)
+        if not client_queue:
+            del self._queues[waiter.client_id]
+        self._queued -= 1
+        self._publish_positions()
+
+    def _publish_positions(self) -> None:
+        """Notifies waiters whose round-robin queue position changed."""
+        queues = list(self._queues.values())
+        position = 0
+        depth = max((len(q) for q in queues), default=0)
+        for index in range(depth):
+            for client_queue in queues:
+                if index >= len(client_queue):
+                    continue
+                position += 1
+                waiter = client_queue[index]
+                if waiter.position != position:
+                    waiter.position = position
+                    waiter.updates.put_nowait(position)
+
+    def _record_admission(self, wait: float) -> None:
+        """Records queue wait statistics for an admitted run."""
+        self._admitted += 1
+        self._total_wait += wait
+        self._max_wait = max(self._max_wait, wait)
+        if wait:
+            logger.info(f"Run admitted after waiting {wait:.2f}s in queue")
+
+    def get_stats(self) -> Dict:
+        """Gets scheduler statistics.
+
+        Returns:
+            Dict: Statistics information.
+        """
+        return {
+            "active_runs": self._active,
+            "queued_runs": self._queued,
+            "max_concurrent_runs": self.max_concurrent_runs,
+            "max_queue_size": self.max_queue_size,
+            "admitted_runs": self._admitted,
+            "rejected_runs": self._rejected,
+            "queue_wait_seconds_total": self._total_wait,
+            "queue_wait_seconds_max": self._max_wait,
+            "queue_wait_seconds_avg": (
+                self._total_wait / self._admitted if self._admitted else 0.0
+            ),
+        }
@@ -0,0 +1,335 @@
+"""Run state shared by the server workers."""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class RunStore(ABC):
+    """Persistent record of runs, readable by every server worker.
+
+    The worker executing a run writes its metadata, events, token usage and
+    artifacts; any worker can read them back to answer status and replay
+    queries. Writes must not block the event loop for long, so
+    implementations may apply them asynchronously; ``flush`` waits for them.
+    """
+
+    @abstractmethod
+    def save_run(self, run: Dict) -> None:
+        """Creates or updates a run's metadata.
+
+        Args:
+            run: Run metadata including ``run_id``, as from ``Run.to_dict``.
+        """
+
+    @abstractmethod
+    def get_run(self, run_id: str) -> Optional[Dict]:
+        """Gets a run's metadata, token usage and next event offset.
+
+        Args:
+            run_id: Run ID.
+
+        Returns:
+            Optional[Dict]: Run metadata, or None if unknown.
+        """
+
+    @abstractmethod
+    def list_unfinished(self) -> List[Dict]:
+        """Lists runs of every worker that have not finished.
+
+        Returns:
+            List[Dict]: Run metadata, as from ``get_run``.
+        """
+
+    @abstractmethod
+    def append_event(self, run_id: str, offset: int, event: Dict) -> None:
+        """Records an event of a run.
+
+        Args:
+            run_id: Run ID.
+            offset: Offset of the event in the run's log.
+            event: JSON-serializable event.
+        """
+
+    @abstractmethod
+    def read_events(
+        self, run_id: str, offset: int, limit: Optional[int] = None
+    ) -> List[Dict]:
+        """Reads a run's events starting at an offset.
+
+        Args:
+            run_id: Run ID.
+            offset: Offset of the first event to read.
+            limit: Maximum number of events to read.
+
+        Returns:
+            List[Dict]: Events in offset order.
+        """
+
+    @abstractmethod
+    def add_tokens(
+        self, run_id: str, model: str, input_tokens: int, completion_tokens: int
+    ) -> None:
+        """Adds token usage of a run.
+
+        Args:
+            run_id: Run ID.
+            model: Model the tokens were used with.
+            input_tokens: Prompt tokens used.
+            completion_tokens: Completion tokens used.
+        """
+
+    @abstractmethod
+    def save_artifacts(self, run_id: str, artifacts: List[Dict]) -> None:
+        """Records files a run produced.
+
+        Args:
+            run_id: Run ID.
+            artifacts: Entries with ``name``, ``size`` and ``mtime``.
+        """
+
+    @abstractmethod
+    def list_artifacts(self, run_id: str) -> List[Dict]:
+        """Lists files a run produced.
+
+        Args:
+            run_id: Run ID.
+
+        Returns:
+            List[Dict]: Entries with ``name``, ``size`` and ``mtime``.
+        """
+
+    @abstractmethod
+    def delete_run(self, run_id: str) -> None:
+        """Removes everything recorded about a run."""
+
+    @abstractmethod
+    def delete_expired(self, finished_before: float) -> None:
+        """Removes runs that finished before a time.
+
+        Args:
+            finished_before: Unix timestamp.
+        """
+
+    def flush(self) -> None:
+        """Waits until all writes are applied."""
+
+    def close(self) -> None:
+        """Applies pending writes and releases resources."""
+
+
+class SQLiteRunStore(RunStore):
+    """Run store in a local SQLite database.
+
+    Workers on the same host share the database file. Writes are queued and
+    applied by a background thread in batched transactions, so recording an
+    event costs the caller only a queue put. Reads use one connection per
+    thread and see the writes committed so far, from every worker.
+
+    Attributes:
+        path: Database file.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS runs (
+            run_id TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            finished_at REAL
+        );
+        CREATE TABLE IF NOT EXISTS events (
+            run_id TEXT NOT NULL,
+            offset INTEGER NOT NULL,
+            event TEXT NOT NULL,
+            PRIMARY KEY (run_id, offset)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS tokens (
+            run_id TEXT NOT NULL,
+            model TEXT NOT NULL,
+            input_tokens INTEGER NOT NULL,
+            completion_tokens INTEGER NOT NULL,
+            PRIMARY KEY (run_id, model)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS artifacts (
+            run_id TEXT NOT NULL,
+            name TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime REAL NOT NULL,
+            PRIMARY KEY (run_id, name)
+        ) WITHOUT ROWID;
+    """
+
+    # Writes applied per transaction at most
+    _BATCH_SIZE = 500
+
+    def __init__(self, path: str):
+        """Opens or creates the database.
+
+        Args:
+            path: Database file.
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(self._SCHEMA)
+
+        self._local = threading.local()
+        self._writes: "queue.Queue[Optional[Tuple[str, Tuple[Any, ...]]]]" = (
+            queue.Queue()
+        )
+        self._writer = threading.Thread(
+            target=self._write_loop, name="run-store-writer", daemon=True
+        )
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        """Gets the calling thread's read connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def _write(self, sql: str, params: Tuple[Any, ...] = ()) -> None:
+        self._writes.put((sql, params))
+
+    def _write_loop(self) -> None:
+        """Applies queued writes in batches until closed."""
+        conn = self._connect()
+        running = True
+        while running:
+            batch = [self._writes.get()]
+            while len(batch) < self._BATCH_SIZE:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with conn:
+                    for item in batch:
+                        if item is None:
+                            running = False
+                            continue
+                        conn.execute(*item)
+            except sqlite3.Error:
+                # Apply one by one so a single bad write does not drop the batch
+                for item in batch:
+                    if item is None:
+                        continue
+                    try:
+                        with conn:
+                            conn.execute(*item)
+                    except sqlite3.Error:
+                        pass
+            finally:
+                for _ in batch:
+                    self._writes.task_done()
+        conn.close()
+
+    def save_run(self, run: Dict) -> None:
+        self._write(
+            "INSERT OR REPLACE INTO runs (run_id, data, finished_at) VALUES (?, ?, ?)",
+            (run["run_id"], json.dumps(run), run.get("finished_at")),
+        )
+
+    def get_run(self, run_id: str) -> Optional[Dict]:
+        conn = self._reader()
+        row = conn.execute(
+            "SELECT data FROM runs WHERE run_id = ?", (run_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        run = json.loads(row[0])
+        (next_offset,) = conn.execute(
+            "SELECT COALESCE(MAX(offset) + 1, 0) FROM events WHERE run_id = ?",
+            (run_id,),
+        ).fetchone()
+        run["next_offset"] = next_offset
+        run["tokens"] = {
+            model: {"input": input_tokens, "completion": completion_tokens}
+            for model, input_tokens, completion_tokens in conn.execute(
+                "SELECT model, input_tokens, completion_tokens FROM tokens "
+                "WHERE run_id = ?",
+                (run_id,),
+            )
+        }
+        return run
+
+    def list_unfinished(self) -> List[Dict]:
+        rows = self._reader().execute(
+            "SELECT run_id FROM runs WHERE finished_at IS NULL"
+        )
+        runs = [self.get_run(run_id) for (run_id,) in rows.fetchall()]
+        return [run for run in runs if run is not None]
+
+    def append_event(self, run_id: str, offset: int, event: Dict) -> None:
+        self._write(
+            "INSERT OR REPLACE INTO events (run_id, offset, event) VALUES (?, ?, ?)",
+            (run_id, offset, json.dumps(event)),
+        )
+
+    def read_events(
+        self, run_id: str, offset: int, limit: Optional[int] = None
+    ) -> List[Dict]:
+        rows = self._reader().execute(
+            "SELECT event FROM events WHERE run_id = ? AND offset >= ? "
+            "ORDER BY offset LIMIT ?",
+            (run_id, max(0, offset), -1 if limit is None else limit),
+        )
+        return [json.loads(event) for (event,) in rows]
+
+    def add_tokens(
+        self, run_id: str, model: str, input_tokens: int, completion_tokens: int
+    ) -> None:
+        self._write(
+            "INSERT INTO tokens (run_id, model, input_tokens, completion_tokens) "
+            "VALUES (?, ?, ?, ?) ON CONFLICT (run_id, model) DO UPDATE SET "
+            "input_tokens = input_tokens + excluded.input_tokens, "
+            "completion_tokens = completion_tokens + excluded.completion_tokens",
+            (run_id, model, input_tokens, completion_tokens),
+        )
+
+    def save_artifacts(self, run_id: str, artifacts: List[Dict]) -> None:
+        for artifact in artifacts:
+            self._write(
+                "INSERT OR REPLACE INTO artifacts (run_id, name, size, mtime) "
+                "VALUES (?, ?, ?, ?)",
+                (run_id, artifact["name"], artifact["size"], artifact["mtime"]),
+            )
+
+    def list_artifacts(self, run_id: str) -> List[Dict]:
+        rows = self._reader().execute(
+            "SELECT name, size, mtime FROM artifacts WHERE run_id = ? ORDER BY name",
+            (run_id,),
+        )
+        return [
+            {"name": name, "size": size, "mtime": mtime} for name, size, mtime in rows
+        ]
+
+    def delete_run(self, run_id: str) -> None:
+        for table in ("runs", "events", "tokens", "artifacts"):
+            self._write(f"DELETE FROM {table} WHERE run_id = ?", (run_id,))
+
+    def delete_expired(self, finished_before: float) -> None:
+        expired = "SELECT run_id FROM runs WHERE finished_at < ?"
+        for table in ("events", "tokens", "artifacts"):
+            self._write(
+                f"DELETE FROM {table} WHERE run_id IN ({expired})", (finished_before,)
+            )
+        self._write("DELETE FROM runs WHERE finished_at < ?", (finished_before,))
+
+    def flush(self) -> None:
+        self._writes.join()
+
+    def close(self) -> None:
+        if self._writer.is_alive():
+            self._writes.put(None)
+            self._writer.join()
@@ -2,16 +2,42 @@
 
 import asyncio
 import html
+import os
+import stat
 from pathlib import Path
-from typing import Optional, Protocol, Tuple, Union, runtime_checkable
+from typing import Dict, List, Optional, Protocol, Tuple, Union, runtime_checkable
 
-from app.config import SandboxSettings
+from app.config import SandboxSettings, config
 from app.exceptions import ToolError
 from app.sandbox.client import SANDBOX_CLIENT
+from app.sandbox.core.exceptions import SandboxTimeoutError
+from app.sandbox.core.sandbox import FileResult
+from pydantic import BaseModel
 
 
 PathLike = Union[str, Path]
 
+# Prints name, hex mode, size and mtime of every existing path, NUL separated
+_STAT_SCRIPT = 'stat -L --printf "%n\\0%f\\0%s\\0%Y\\0" -- "$@" 2>/dev/null; true'
+
+
+class FileStat(BaseModel):
+    """Status of a path, following symbolic links.
+
+    Attributes:
+        path: Path as requested.
+        exists: Whether the path exists.
+        is_dir: Whether the path is a directory.
+        size: Size in bytes.
+        mtime: Modification time in seconds since the epoch.
+    """
+
+    path: str
+    exists: bool = False
+    is_dir: bool = False
+    size: int = 0
+    mtime: float = 0.0
+
 
 @runtime_checkable
 class FileOperator(Protocol):
@@ -25,6 +51,14 @@ class FileOperator(Protocol):
         """Write content to a file."""
         ...
 
+    async def read_files(self, paths: List[PathLike]) -> List[FileResult]:
+        """Read several files at once, reporting each file's content or error."""
+        ...
+
+    async def write_files(self, files: Dict[PathLike, str]) -> List[FileResult]:
+        """Write several files at once, creating parent directories."""
+        ...
+
     async def is_directory(self, path: PathLike) -> bool:
         """Check if path points to a directory."""
         ...
@@ -33,6 +67,10 @@ class FileOperator(Protocol):
         """Check if path exists."""
         ...
 
+    async def stat_files(self, paths: List[PathLike]) -> List[FileStat]:
+        """Get the status of several paths at once, in the given order."""
+        ...
+
     async def run_command(
         self, cmd: str, timeout: Optional[float] = 120.0
     ) -> Tuple[int, str, str]:
@@ -61,6 +99,33 @@ class LocalFileOperator(FileOperator):
         except Exception as e:
             raise ToolError(f"Failed to write to {path}: {str(e)}") from None
 
+    async def read_files(self, paths: List[PathLike]) -> List[FileResult]:
+        """Read several local files in a worker thread."""
+
+        def read(path: PathLike) -> FileResult:
+            try:
+                content = Path(path).read_text(encoding=self.encoding)
+                return FileResult(path=str(path), content=content)
+            except Exception as e:
+                return FileResult(path=str(path), error=str(e))
+
+        return await asyncio.to_thread(lambda: [read(path) for path in paths])
+
+    async def write_files(self, files: Dict[PathLike, str]) -> List[FileResult]:
+        """Write several local files in a worker thread."""
+
+        def write(path: PathLike, content: str) -> FileResult:
+            try:
+                Path(path).parent.mkdir(parents=True, exist_ok=True)
+                Path(path).write_text(content, encoding=self.encoding)
+                return FileResult(path=str(path))
+            except Exception as e:
+                return FileResult(path=str(path), error=str(e))
+
+        return await asyncio.to_thread(
+            lambda: [write(path, content) for path, content in files.items()]
+        )
+
     async def is_directory(self, path: PathLike) -> bool:
         """Check if path points to a directory."""
         return Path(path).is_dir()
@@ -69,6 +134,26 @@ class LocalFileOperator(FileOperator):
         """Check if path exists."""
         return Path(path).exists()
 
+    async def stat_files(self, paths: List[PathLike]) -> List[FileStat]:
+        """Get the status of several local paths."""
+        results = []
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except (OSError, ValueError):
+                results.append(FileStat(path=str(path)))
+                continue
+            results.append(
+                FileStat(
+                    path=str(path),
+                    exists=True,
+                    is_dir=stat.S_ISDIR(st.st_mode),
+                    size=st.st_size,
+                    mtime=st.st_mtime,
+                )
+            )
+        return results
+
     async def run_command(
         self, cmd: str, timeout: Optional[float] = 120.0
     ) -> Tuple[int, str, str]:
@@ -105,7 +190,7 @@ class SandboxFileOperator(FileOperator):
     async def _ensure_sandbox_initialized(self):
         """Ensure sandbox is initialized."""
         if not self.sandbox_client.sandbox:
-            await self.sandbox_client.create(config=SandboxSettings())
+            await self.sandbox_client.create(config=config.sandbox or SandboxSettings())
 
     async def read_file(self, path: PathLike) -> str:
         """Read content from a file in sandbox."""
@@ -125,21 +210,67 @@ class SandboxFileOperator(FileOperator):
         except Exception as e:
             raise ToolError(f"Failed to write to {path} in sandbox: {str(e)}") from None
 
+    async def read_files(self, paths: List[PathLike]) -> List[FileResult]:
+        """Read several files from sandbox in one archive."""
+        await self._ensure_sandbox_initialized()
+        try:
+            return await self.sandbox_client.read_files([str(p) for p in paths])
+        except Exception as e:
+            raise ToolError(f"Failed to read files in sandbox: {str(e)}") from None
+
+    async def write_files(self, files: Dict[PathLike, str]) -> List[FileResult]:
+        """Write several files to sandbox in one archive.
+
+        Unlike ``write_file``, content is written as is, without unescaping.
+        """
+        await self._ensure_sandbox_initialized()
+        try:
+            return await self.sandbox_client.write_files(
+                {str(path): content for path, content in files.items()}
+            )
+        except Exception as e:
+            raise ToolError(f"Failed to write files in sandbox: {str(e)}") from None
+
     async def is_directory(self, path: PathLike) -> bool:
         """Check if path points to a directory in sandbox."""
         await self._ensure_sandbox_initialized()
-        result = await self.sandbox_client.run_command(
-            f"test -d {path} && echo 'true' || echo 'false'"
-        )
-        return result.strip() == "true"
+        exit_code, _ = await self.sandbox_client.exec_once(["test", "-d", str(path)])
+        return exit_code == 0
 
     async def exists(self, path: PathLike) -> bool:
         """Check if path exists in sandbox."""
         await self._ensure_sandbox_initialized()
-        result = await self.sandbox_client.run_command(
-            f"test -e {path} && echo 'true' || echo 'false'"
+        exit_code, _ = await self.sandbox_client.exec_once(["test", "-e", str(path)])
+        return exit_code == 0
+
+    async def stat_files(self, paths: List[PathLike]) -> List[FileStat]:
+        """Get the status of several paths in sandbox with one exec.
+
+        Missing paths are left out of the ``stat`` output, so its exit code
+        is ignored.
+        """
+        names = [str(path) for path in paths]
+        if not names:
+            return []
+        await self._ensure_sandbox_initialized()
+        _, output = await self.sandbox_client.exec_once(
+            ["bash", "-c", _STAT_SCRIPT, "stat", *names]
         )
-        return result.strip() == "true"
+        fields = output.split("\0")
+        found: Dict[str, FileStat] = {}
+        for i in range(0, len(fields) - 3, 4):
+            name, mode, size, mtime = fields[i : i + 4]
+            try:
+                found[name] = FileStat(
+                    path=name,
+                    exists=True,
+                    is_dir=stat.S_ISDIR(int(mode, 16)),
+                    size=int(size),
+                    mtime=float(mtime),
+                )
+            except ValueError:
+                continue
+        return [found.get(name, FileStat(path=name)) for name in names]
 
     async def run_command(
         self, cmd: str, timeout: Optional[float] = 120.0
@@ -147,15 +278,11 @@ class SandboxFileOperator(FileOperator):
         """Run a command in sandbox environment."""
         await self._ensure_sandbox_initialized()
         try:
-            stdout = await self.sandbox_client.run_command(
+            result = await self.sandbox_client.execute(
                 cmd, timeout=int(timeout) if timeout else None
             )
-            return (
-                0,  # Always return 0 since we don't have explicit return code from sandbox
-                stdout,
-                "",  # No stderr capture in the current sandbox implementation
-            )
-        except TimeoutError as exc:
+            return result.exit_code, result.stdout, result.stderr
+        except (TimeoutError, SandboxTimeoutError) as exc:
             raise TimeoutError(
                 f"Command '{cmd}' timed out after {timeout} seconds in sandbox"
             ) from exc
@@ -1,9 +1,28 @@
-import multiprocessing
-import sys
-from io import StringIO
-from typing import Dict
+from typing import Dict, Optional
 
+from app.config import PythonExecuteSettings, config
 from app.tool.base import BaseTool
+from app.tool.python_workers import PythonWorkerPool
+
+
+_pool: Optional[PythonWorkerPool] = None
+
+
+def get_worker_pool() -> PythonWorkerPool:
+    """Gets the worker pool shared by all PythonExecute tools.
+
+    Returns:
+        PythonWorkerPool: The pool, created on first use.
+    """
+    global _pool
+    if _pool is None:
+        settings = config.python_execute_config or PythonExecuteSettings()
+        _pool = PythonWorkerPool(
+            size=settings.worker_pool_size,
+            max_runs=settings.worker_max_runs,
+            preload_modules=settings.preload_modules,
+        )
+    return _pool
 
 
 class PythonExecute(BaseTool):
@@ -22,27 +41,13 @@ class PythonExecute(BaseTool):
         "required": ["code"],
     }
 
-    def _run_code(self, code: str, result_dict: dict, safe_globals: dict) -> None:
-        original_stdout = sys.stdout
-        try:
-            output_buffer = StringIO()
-            sys.stdout = output_buffer
-            exec(code, safe_globals, safe_globals)
-            result_dict["observation"] = output_buffer.getvalue()
-            result_dict["success"] = True
-        except Exception as e:
-            result_dict["observation"] = str(e)
-            result_dict["success"] = False
-        finally:
-            sys.stdout = original_stdout
-
     async def execute(
         self,
         code: str,
         timeout: int = 15,
     ) -> Dict:
         """
-        Executes the provided Python code with a timeout.
+        Executes the provided Python code with a timeout in a warm worker process.
 
         Args:
             code (str): The Python code to execute.
@@ -52,24 +57,4 @@ class PythonExecute(BaseTool):
             Dict: Contains 'output' with execution output or error message and 'success' status.
         """
 
-        with multiprocessing.Manager() as manager:
-            result = manager.dict({"observation": "", "success": False})
-            if isinstance(__builtins__, dict):
-                safe_globals = {"__builtins__": __builtins__}
-            else:
-                safe_globals = {"__builtins__": __builtins__.__dict__.copy()}
-            proc = multiprocessing.Process(
-                target=self._run_code, args=(code, result, safe_globals)
-            )
-            proc.start()
-            proc.join(timeout)
-
-            # timeout process
-            if proc.is_alive():
-                proc.terminate()
-                proc.join(1)
-                return {
-                    "observation": f"Execution timeout after {timeout} seconds",
-                    "success": False,
-                }
-            return dict(result)
+        return await get_worker_pool().run(code, timeout)
@@ -0,0 +1,291 @@
+"""Pool of warm worker processes executing Python code.
+
+Starting a process for every snippet costs far more than running it, so
+code is sent over a pipe to long-lived workers instead. Workers are forked
+from a ``forkserver`` that has already imported this module and the
+configured preload modules, or spawned where forkserver is unavailable.
+
+Each snippet runs with fresh globals, but module state persists in a
+worker, so workers are replaced after a number of runs, and killed when a
+snippet exceeds its timeout. Only the standard library is imported here,
+which keeps forking cheap.
+"""
+
+import asyncio
+import builtins
+import multiprocessing
+import sys
+import threading
+from io import StringIO
+from multiprocessing.connection import Connection
+from typing import Dict, List, Optional, Sequence
+
+
+# Seconds a retired worker may take to exit before it is killed
+_EXIT_TIMEOUT = 1
+
+
+def _worker_main(conn: Connection, preload_modules: Sequence[str]) -> None:
+    """Runs code received over the pipe until it is closed.
+
+    Args:
+        conn: Pipe end receiving code and sending results.
+        preload_modules: Modules imported before the first run; missing
+            ones are skipped.
+    """
+    for module in preload_modules:
+        try:
+            __import__(module)
+        except Exception:
+            pass
+
+    while True:
+        try:
+            code = conn.recv()
+        except (EOFError, OSError):
+            return
+        if code is None:
+            return
+        conn.send(_run_code(code))
+
+
+def _run_code(code: str) -> Dict:
+    """Executes code with fresh globals and captures what it prints."""
+    safe_globals = {"__builtins__": builtins.__dict__.copy()}
+    original_stdout = sys.stdout
+    output_buffer = StringIO()
+    try:
+        sys.stdout = output_buffer
+        exec(code, safe_globals, safe_globals)
+        return {"observation": output_buffer.getvalue(), "success": True}
+    except Exception as e:
+        return {"observation": str(e), "success": False}
+    finally:
+        sys.stdout = original_stdout
+
+
+def _get_context(
+    preload_modules: Sequence[str],
+) -> multiprocessing.context.BaseContext:
+    """Gets a forkserver context preloading the modules, or a spawn one."""
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    context = multiprocessing.get_context("forkserver")
+    # Only takes effect before the forkserver is first started. The main
+    # module is imported there once, as by default, so workers skip it
+    context.set_forkserver_preload(["__main__", __name__, *preload_modules])
+    return context
+
+
+class _Worker:
+    """A worker process and the parent's end of its pipe."""
+
+    def __init__(
+        self,
+        context: multiprocessing.context.BaseContext,
+        preload_modules: Sequence[str],
+    ) -> None:
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_conn, list(preload_modules)),
+            name="python-execute-worker",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.runs = 0
+
+    def stop(self, kill: bool = False) -> None:
+        """Ends the worker. Blocking: waits for the process to exit."""
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+        self.process.join(_EXIT_TIMEOUT)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+    async def wait_result(self, timeout: float) -> bool:
+        """Waits until the worker sent its result or exited.
+
+        Returns:
+            bool: False if the timeout expired first.
+        """
+        loop = asyncio.get_running_loop()
+        fd = self.conn.fileno()
+        ready = loop.create_future()
+        try:
+            loop.add_reader(fd, lambda: ready.done() or ready.set_result(None))
+        except NotImplementedError:  # Event loops without fd readiness
+            return await asyncio.to_thread(self.conn.poll, timeout)
+        try:
+            await asyncio.wait_for(ready, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            loop.remove_reader(fd)
+
+
+class PythonWorkerPool:
+    """Warm worker processes shared by all Python executions.
+
+    ``size`` workers are kept. A run takes an idle worker, or starts an
+    extra one if all are busy, and hands it back afterwards. Workers are
+    retired after ``max_runs`` runs and killed on timeout; replacements are
+    started in the background so the next run finds a warm worker.
+
+    Attributes:
+        size: Workers kept ready.
+        max_runs: Runs after which a worker is replaced.
+        preload_modules: Modules imported by workers before their first run.
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        max_runs: int = 100,
+        preload_modules: Optional[Sequence[str]] = None,
+    ) -> None:
+        """Initializes the pool; workers are started on first use.
+
+        Args:
+            size: Workers kept ready.
+            max_runs: Runs after which a worker is replaced.
+            preload_modules: Modules imported by workers before their
+                first run, such as numpy or pandas.
+        """
+        self.size = size
+        self.max_runs = max(1, max_runs)
+        self.preload_modules = list(preload_modules or [])
+        self._context = _get_context(self.preload_modules)
+        self._idle: List[_Worker] = []
+        self._starting = 0
+        self._busy = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _start_worker(self) -> _Worker:
+        """Starts a worker. Blocking: forking or spawning takes a while."""
+        return _Worker(self._context, self.preload_modules)
+
+    def _add_idle(self) -> None:
+        """Starts a worker and keeps it ready; runs in a worker thread."""
+        try:
+            worker = self._start_worker()
+        except Exception:
+            with self._lock:
+                self._starting -= 1
+            return
+        with self._lock:
+            self._starting -= 1
+            if not self._closed and len(self._idle) + self._busy < self.size:
+                self._idle.append(worker)
+                return
+        worker.stop()
+
+    def _replenish(self) -> None:
+        """Starts workers in the background until there are ``size``."""
+        with self._lock:
+            missing = self.size - len(self._idle) - self._starting - self._busy
+            if self._closed or missing <= 0:
+                return
+            self._starting += missing
+        loop = asyncio.get_running_loop()
+        for _ in range(missing):
+            loop.run_in_executor(None, self._add_idle)
+
+    async def _checkout(self) -> _Worker:
+        """Takes a live idle worker, or starts one if none is ready."""
+        while True:
+            with self._lock:
+                worker = self._idle.pop() if self._idle else None
+                self._busy += 1
+            if worker is None:
+                break
+            if worker.process.is_alive():
+                return worker
+            with self._lock:
+                self._busy -= 1
+            await asyncio.to_thread(worker.stop, kill=True)
+        try:
+            return await asyncio.to_thread(self._start_worker)
+        except BaseException:
+            with self._lock:
+                self._busy -= 1
+            raise
+        finally:
+            self._replenish()
+
+    async def _release(self, worker: _Worker, kill: bool = False) -> None:
+        """Returns a worker to the pool, or retires it."""
+        with self._lock:
+            self._busy -= 1
+            if (
+                not kill
+                and not self._closed
+                and worker.runs < self.max_runs
+                and worker.process.is_alive()
+                and len(self._idle) + self._busy < self.size
+            ):
+                self._idle.append(worker)
+                return
+        await asyncio.to_thread(worker.stop, kill=kill)
+        self._replenish()
+
+    async def warm(self) -> None:
+        """Starts the idle workers ahead of the first run."""
+        self._replenish()
+
+    async def run(self, code: str, timeout: float) -> Dict:
+        """Executes code in a worker.
+
+        The event loop is not blocked while the code runs.
+
+        Args:
+            code: Python code to execute.
+            timeout: Seconds after which the worker is killed.
+
+        Returns:
+            Dict: 'observation' with the printed output or error message,
+                and 'success' status.
+        """
+        worker = await self._checkout()
+        kill = True
+        try:
+            try:
+                worker.conn.send(code)
+                worker.runs += 1
+                if not await worker.wait_result(timeout):
+                    return {
+                        "observation": f"Execution timeout after {timeout} seconds",
+                        "success": False,
+                    }
+                result = worker.conn.recv()
+            except (EOFError, OSError):
+                # The code ended the process, e.g. with sys.exit()
+                await asyncio.to_thread(worker.process.join, _EXIT_TIMEOUT)
+                return {
+                    "observation": "Execution process exited with code "
+                    f"{worker.process.exitcode}",
+                    "success": False,
+                }
+            kill = False
+            return result
+        finally:
+            # Shielded so a cancelled run still kills its worker
+            await asyncio.shield(self._release(worker, kill))
+
+    def close(self) -> None:
+        """Stops the idle workers; busy ones stop when released."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.stop()
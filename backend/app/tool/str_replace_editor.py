@@ -2,7 +2,7 @@
 
 from collections import defaultdict
 from pathlib import Path
-from typing import Any, DefaultDict, List, Literal, Optional, get_args
+from typing import Any, DefaultDict, Dict, List, Literal, Optional, get_args
 
 from app.config import config
 from app.exceptions import ToolError
@@ -10,6 +10,7 @@ from app.tool import BaseTool
 from app.tool.base import CLIResult, ToolResult
 from app.tool.file_operators import (
     FileOperator,
+    FileStat,
     LocalFileOperator,
     PathLike,
     SandboxFileOperator,
@@ -101,6 +102,8 @@ class StrReplaceEditor(BaseTool):
     _file_history: DefaultDict[PathLike, List[str]] = defaultdict(list)
     _local_operator: LocalFileOperator = LocalFileOperator()
     _sandbox_operator: SandboxFileOperator = SandboxFileOperator()
+    # Path status seen during the current command, dropped when it writes
+    _stat_cache: Dict[str, FileStat] = {}
 
     # def _get_operator(self, use_sandbox: bool) -> FileOperator:
     def _get_operator(self) -> FileOperator:
@@ -111,6 +114,20 @@ class StrReplaceEditor(BaseTool):
             else self._local_operator
         )
 
+    async def _stat(self, path: PathLike, operator: FileOperator) -> FileStat:
+        """Get the status of a path, at most once per command."""
+        key = str(Path(path))
+        if key not in self._stat_cache:
+            (self._stat_cache[key],) = await operator.stat_files([key])
+        return self._stat_cache[key]
+
+    async def _write(
+        self, path: PathLike, content: str, operator: FileOperator
+    ) -> None:
+        """Write a file and forget its cached status."""
+        self._stat_cache.pop(str(Path(path)), None)
+        await operator.write_file(path, content)
+
     async def execute(
         self,
         *,
@@ -126,6 +143,8 @@ class StrReplaceEditor(BaseTool):
         """Execute a file operation command."""
         # Get the appropriate file operator
         operator = self._get_operator()
+        # Other tools may change files between commands
+        self._stat_cache.clear()
 
         # Validate path and command combination
         await self.validate_path(command, Path(path), operator)
@@ -136,7 +155,7 @@ class StrReplaceEditor(BaseTool):
         elif command == "create":
             if file_text is None:
                 raise ToolError("Parameter `file_text` is required for command: create")
-            await operator.write_file(path, file_text)
+            await self._write(path, file_text, operator)
             self._file_history[path].append(file_text)
             result = ToolResult(output=f"File created successfully at: {path}")
         elif command == "str_replace":
@@ -171,24 +190,25 @@ class StrReplaceEditor(BaseTool):
         if not path.is_absolute():
             raise ToolError(f"The path {path} is not an absolute path")
 
+        # A single stat answers both existence and type
+        stat = await self._stat(path, operator)
+
         # Only check if path exists for non-create commands
         if command != "create":
-            if not await operator.exists(path):
+            if not stat.exists:
                 raise ToolError(
                     f"The path {path} does not exist. Please provide a valid path."
                 )
 
             # Check if path is a directory
-            is_dir = await operator.is_directory(path)
-            if is_dir and command != "view":
+            if stat.is_dir and command != "view":
                 raise ToolError(
                     f"The path {path} is a directory and only the `view` command can be used on directories"
                 )
 
         # Check if file exists for create command
         elif command == "create":
-            exists = await operator.exists(path)
-            if exists:
+            if stat.exists:
                 raise ToolError(
                     f"File already exists at: {path}. Cannot overwrite files using command `create`."
                 )
@@ -201,7 +221,7 @@ class StrReplaceEditor(BaseTool):
     ) -> CLIResult:
         """Display file or directory content."""
         # Determine if path is a directory
-        is_dir = await operator.is_directory(path)
+        is_dir = (await self._stat(path, operator)).is_dir
 
         if is_dir:
             # Directory handling
@@ -317,7 +337,7 @@ class StrReplaceEditor(BaseTool):
         new_file_content = file_content.replace(old_str, new_str)
 
         # Write the new content to the file
-        await operator.write_file(path, new_file_content)
+        await self._write(path, new_file_content, operator)
 
         # Save the original content to history
         self._file_history[path].append(file_content)
@@ -377,7 +397,7 @@ class StrReplaceEditor(BaseTool):
         new_file_text = "\n".join(new_file_text_lines)
         snippet = "\n".join(snippet_lines)
 
-        await operator.write_file(path, new_file_text)
+        await self._write(path, new_file_text, operator)
         self._file_history[path].append(file_text)
 
         # Prepare success message
@@ -399,7 +419,7 @@ class StrReplaceEditor(BaseTool):
             raise ToolError(f"No edit history found for {path}.")
 
         old_text = self._file_history[path].pop()
-        await operator.write_file(path, old_text)
+        await self._write(path, old_text, operator)
 
         return CLIResult(
             output=f"Last edit to {path} undone successfully. {self._make_output(old_text, str(path))}"
@@ -1,10 +1,19 @@
 """Collection classes for managing multiple tools."""
 from typing import Any, Dict, List
 
-from app.exceptions import ToolError
+from app.cancellation import guard
+from app.exceptions import RunCancelled, ToolError
+from app.metrics import REGISTRY, track_duration
 from app.tool.base import BaseTool, ToolFailure, ToolResult
 
 
+TOOL_DURATION = REGISTRY.histogram(
+    "openmanus_tool_duration_seconds",
+    "Duration of tool executions",
+    labels=("tool", "status"),
+)
+
+
 class ToolCollection:
     """A collection of defined tools."""
 
@@ -27,11 +36,18 @@ class ToolCollection:
         tool = self.tool_map.get(name)
         if not tool:
             return ToolFailure(error=f"Tool {name} is invalid")
-        try:
-            result = await tool(**tool_input)
+        with track_duration(TOOL_DURATION, tool=name, status="error") as labels:
+            try:
+                # Interrupted if the run is cancelled while the tool executes
+                result = await guard(tool(**tool_input))
+            except ToolError as e:
+                return ToolFailure(error=e.message)
+            except RunCancelled:
+                labels["status"] = "cancelled"
+                raise
+            if not getattr(result, "error", None):
+                labels["status"] = "ok"
             return result
-        except ToolError as e:
-            return ToolFailure(error=e.message)
 
     async def execute_all(self) -> List[ToolResult]:
         """Execute all tools in the collection sequentially."""
@@ -0,0 +1,51 @@
+"""Benchmark of PythonExecute latency with warm worker processes.
+
+Measures how long ``PythonExecute.execute`` takes for a trivial snippet once
+the worker pool is warm, and for the first run, which starts the workers.
+
+Usage:
+    python -m examples.benchmarks.python_execute --rounds 200
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+from app.tool.python_execute import PythonExecute, get_worker_pool
+
+
+def _report(name: str, samples: List[float]) -> None:
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(
+        f"{name:<16} n={len(samples):<3} "
+        f"mean={statistics.mean(samples) * 1000:8.2f}ms "
+        f"p50={statistics.median(samples) * 1000:8.2f}ms "
+        f"p95={p95 * 1000:8.2f}ms"
+    )
+
+
+async def _execute(tool: PythonExecute, code: str) -> float:
+    start = time.perf_counter()
+    result = await tool.execute(code)
+    elapsed = time.perf_counter() - start
+    assert result["success"], result["observation"]
+    return elapsed
+
+
+async def main(rounds: int, code: str) -> None:
+    tool = PythonExecute()
+    _report("first run", [await _execute(tool, code)])
+    await asyncio.sleep(1)  # Let the pool start its remaining workers
+    _report("warm", [await _execute(tool, code) for _ in range(rounds)])
+    get_worker_pool().close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--code", default="print(1+1)")
+    args = parser.parse_args()
+    asyncio.run(main(args.rounds, args.code))
@@ -0,0 +1,110 @@
+"""Benchmark of the Docker and namespace sandbox backends.
+
+Measures, for each backend, how long creating a sandbox takes until it can
+run a command, the latency of commands in the main shell and as separate
+processes, and of single and batched file operations. Backends that cannot
+run on this host, e.g. Docker without a daemon, are skipped.
+
+Usage:
+    python -m examples.benchmarks.sandbox_backends --rounds 20
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Awaitable, Callable, List
+
+from app.config import SandboxSettings
+from app.sandbox.core.namespace import NamespaceSandbox
+from app.sandbox.core.sandbox import DockerSandbox
+
+
+_BACKENDS = {"docker": DockerSandbox, "namespace": NamespaceSandbox}
+
+
+async def _time(rounds: int, operation: Callable[[], Awaitable]) -> List[float]:
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        await operation()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _report(name: str, samples: List[float]) -> None:
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(
+        f"{name:<26} n={len(samples):<3} "
+        f"mean={statistics.mean(samples) * 1000:8.1f}ms "
+        f"p50={statistics.median(samples) * 1000:8.1f}ms "
+        f"p95={p95 * 1000:8.1f}ms"
+    )
+
+
+async def _create(config: SandboxSettings) -> float:
+    """Creates a sandbox, runs a command in it and cleans it up."""
+    start = time.perf_counter()
+    sandbox = _BACKENDS[config.backend](config)
+    await sandbox.create()
+    await sandbox.run_command("true")
+    elapsed = time.perf_counter() - start
+    await sandbox.cleanup()
+    return elapsed
+
+
+async def _benchmark(config: SandboxSettings, rounds: int, files: int) -> None:
+    try:
+        await _create(config)  # Warm up caches, e.g. the Docker daemon's
+    except Exception as e:
+        print(f"{config.backend}: skipped ({e})")
+        return
+
+    name = config.backend
+    _report(f"{name} create", [await _create(config) for _ in range(rounds)])
+
+    async with _BACKENDS[name](config) as sandbox:
+        _report(
+            f"{name} execute",
+            await _time(rounds, lambda: sandbox.execute("true")),
+        )
+        _report(
+            f"{name} exec_once",
+            await _time(rounds, lambda: sandbox.exec_once(["true"])),
+        )
+        _report(
+            f"{name} write_file",
+            await _time(rounds, lambda: sandbox.write_file("bench.txt", "x" * 4096)),
+        )
+        _report(
+            f"{name} read_file",
+            await _time(rounds, lambda: sandbox.read_file("bench.txt")),
+        )
+        contents = {f"bench/{i}.txt": "x" * 4096 for i in range(files)}
+        _report(
+            f"{name} write_files x{files}",
+            await _time(rounds, lambda: sandbox.write_files(contents)),
+        )
+        _report(
+            f"{name} read_files x{files}",
+            await _time(rounds, lambda: sandbox.read_files(list(contents))),
+        )
+
+
+async def main(rounds: int, files: int, image: str, backends: List[str]) -> None:
+    for backend in backends:
+        await _benchmark(SandboxSettings(image=image, backend=backend), rounds, files)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--image", default=SandboxSettings().image)
+    parser.add_argument(
+        "--backend", action="append", choices=list(_BACKENDS), dest="backends"
+    )
+    args = parser.parse_args()
+    backends = args.backends or list(_BACKENDS)
+    asyncio.run(main(args.rounds, args.files, args.image, backends))
@@ -0,0 +1,72 @@
+"""Benchmark of streamed sandbox copies of a large directory tree.
+
+Copies a generated tree (1 GB by default) into a sandbox with ``copy_to``
+and back out with ``copy_from``, and reports the throughput of both
+directions and the peak memory of the process. Requires a running Docker
+daemon and twice the tree size of free disk space on the host.
+
+Usage:
+    python -m examples.benchmarks.sandbox_copy --size-mb 1024 --files 64
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from app.config import SandboxSettings
+from app.sandbox.core.sandbox import DockerSandbox
+
+
+def _make_tree(root: str, size_mb: int, files: int) -> None:
+    """Writes incompressible files adding up to ``size_mb`` megabytes."""
+    per_file = size_mb // files
+    for index in range(files):
+        directory = os.path.join(root, f"part_{index % 8}")
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"file_{index}.bin"), "wb") as f:
+            for _ in range(per_file):
+                f.write(os.urandom(1024 * 1024))
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+async def main(size_mb: int, files: int) -> None:
+    with tempfile.TemporaryDirectory() as host_dir:
+        src = os.path.join(host_dir, "tree")
+        _make_tree(src, size_mb, files)
+        print(f"generated {size_mb} MB in {files} files, rss={_peak_rss_mb():.0f} MB")
+
+        async with DockerSandbox(SandboxSettings(memory_limit="2g")) as sandbox:
+            start = time.perf_counter()
+            await sandbox.copy_to(src, "/data/tree")
+            elapsed = time.perf_counter() - start
+            print(
+                f"copy_to    {elapsed:6.1f}s {size_mb / elapsed:7.1f} MB/s "
+                f"peak rss={_peak_rss_mb():.0f} MB"
+            )
+
+            dst = os.path.join(host_dir, "copy")
+            os.makedirs(dst)
+            start = time.perf_counter()
+            await sandbox.copy_from("/data/tree", dst)
+            elapsed = time.perf_counter() - start
+            print(
+                f"copy_from  {elapsed:6.1f}s {size_mb / elapsed:7.1f} MB/s "
+                f"peak rss={_peak_rss_mb():.0f} MB"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=1024)
+    parser.add_argument("--files", type=int, default=64)
+    args = parser.parse_args()
+    asyncio.run(main(args.size_mb, args.files))
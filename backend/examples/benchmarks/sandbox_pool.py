@@ -0,0 +1,74 @@
+"""Benchmark of sandbox checkout from a warm pool against cold creation.
+
+Measures how long ``SandboxManager.create_sandbox`` takes until the sandbox
+can run a command, with and without a pool, and the time a recycled
+sandbox needs to be reset. Requires a running Docker daemon.
+
+Usage:
+    python -m examples.benchmarks.sandbox_pool --rounds 10
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+from app.config import SandboxSettings
+from app.sandbox.core.manager import SandboxManager
+
+
+async def _checkout(manager: SandboxManager, config: SandboxSettings) -> float:
+    """Creates a sandbox, runs a command in it and releases it."""
+    start = time.perf_counter()
+    sandbox_id = await manager.create_sandbox(config)
+    sandbox = await manager.get_sandbox(sandbox_id)
+    await sandbox.run_command("true")
+    elapsed = time.perf_counter() - start
+    await manager.release_sandbox(sandbox_id)
+    return elapsed
+
+
+def _report(name: str, samples: List[float]) -> None:
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(
+        f"{name:<16} n={len(samples):<3} "
+        f"mean={statistics.mean(samples) * 1000:8.1f}ms "
+        f"p50={statistics.median(samples) * 1000:8.1f}ms "
+        f"p95={p95 * 1000:8.1f}ms"
+    )
+
+
+async def main(rounds: int, image: str) -> None:
+    cold = SandboxSettings(image=image)
+    warm = SandboxSettings(image=image, pool_size=2)
+    recycled = SandboxSettings(image=image, pool_size=2, pool_recycle=True)
+
+    async with SandboxManager(max_sandboxes=8) as manager:
+        await manager.ensure_image(image)
+        await _checkout(manager, cold)  # Warm up the Docker daemon
+
+        _report("cold", [await _checkout(manager, cold) for _ in range(rounds)])
+
+        samples = []
+        for _ in range(rounds):
+            await manager.warm_pool(warm, wait=True)
+            samples.append(await _checkout(manager, warm))
+        _report("pooled", samples)
+
+        await manager.warm_pool(recycled, wait=True)
+        samples = []
+        for _ in range(rounds):
+            samples.append(await _checkout(manager, recycled))
+            await manager.warm_pool(recycled, wait=True)
+        _report("pooled+recycle", samples)
+        print(f"stats: {manager.get_stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--image", default=SandboxSettings().image)
+    args = parser.parse_args()
+    asyncio.run(main(args.rounds, args.image))
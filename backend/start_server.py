@@ -14,6 +14,7 @@ if sys.platform == "win32":
     asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
 
 import uvicorn
+from app.config import config
 
 
 if __name__ == "__main__":
@@ -24,4 +25,6 @@ if __name__ == "__main__":
         port=8000,
         reload=True,  # Enable auto-reload during development
         log_level="info",
+        # Compress websocket frames; coalesced log frames compress well
+        ws_per_message_deflate=config.server_config.ws_compression,
     )
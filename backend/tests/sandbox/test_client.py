@@ -6,6 +6,7 @@ import pytest
 import pytest_asyncio
 from app.config import SandboxSettings
 from app.sandbox.client import LocalSandboxClient, create_sandbox_client
+from app.sandbox.core.sync import WorkspaceSync
 
 
 @pytest_asyncio.fixture(scope="function")
@@ -105,5 +106,42 @@ async def test_local_error_handling(local_client: LocalSandboxClient):
     assert "not found" in str(exc.value).lower()
 
 
+@pytest.mark.asyncio
+async def test_batched_file_transfer(local_client: LocalSandboxClient):
+    """Tests batched reads and writes with per-file results."""
+    await local_client.create()
+    files = {f"project/src/module_{i}.py": f"VALUE = {i}\n" for i in range(20)}
+
+    results = await local_client.write_files(files)
+    assert all(result.ok for result in results)
+
+    paths = list(files) + ["project/missing.py", "../escape.txt"]
+    results = await local_client.read_files(paths)
+    assert [r.content for r in results[:20]] == list(files.values())
+    assert "not found" in results[20].error.lower()
+    assert results[21].error is not None
+
+
+@pytest.mark.asyncio
+async def test_workspace_sync(local_client: LocalSandboxClient, temp_dir: Path):
+    """Tests that only changed files are synced, in both directions."""
+    await local_client.create()
+    sync = WorkspaceSync(local_client.sandbox, str(temp_dir))
+    (temp_dir / "input.txt").write_text("data")
+    await local_client.run_command("mkdir -p out && echo result > out/result.txt")
+
+    result = await sync.sync()
+    assert result.uploaded == ["input.txt"]
+    assert result.downloaded == ["out/result.txt"]
+    assert (temp_dir / "out" / "result.txt").read_text() == "result\n"
+    assert (await local_client.read_file("/workspace/input.txt")) == "data"
+
+    assert not (await sync.sync()).changed
+    await local_client.run_command("rm input.txt")
+    result = await sync.sync()
+    assert result.deleted_on_host == ["input.txt"]
+    assert not (temp_dir / "input.txt").exists()
+
+
 if __name__ == "__main__":
     pytest.main(["-v", __file__])
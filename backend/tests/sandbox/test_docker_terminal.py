@@ -1,9 +1,11 @@
 """Tests for the AsyncDockerizedTerminal implementation."""
 
+import asyncio
+
 import docker
 import pytest
 import pytest_asyncio
-from app.sandbox.core.terminal import AsyncDockerizedTerminal
+from app.sandbox.core.terminal import AsyncDockerizedTerminal, _LineFramer
 
 
 @pytest.fixture(scope="module")
@@ -80,6 +82,62 @@ class TestAsyncDockerizedTerminal:
         assert "First" in cmd1
         assert "Second" in cmd2
 
+    @pytest.mark.asyncio
+    async def test_exit_code_and_numeric_output(self, terminal):
+        """Test that numeric output is kept and the exit status recorded."""
+        assert await terminal.run_command("echo 42; false") == "42"
+        assert terminal.session.last_exit_code == 1
+
+    @pytest.mark.asyncio
+    async def test_session_usable_after_timeout(self, terminal):
+        """Test that a timed-out command is interrupted and output stays framed."""
+        with pytest.raises(TimeoutError):
+            await terminal.run_command("sleep 5", timeout=1)
+        assert await terminal.run_command("echo after") == "after"
+
+    @pytest.mark.asyncio
+    async def test_parallel_commands_do_not_wait_for_shell(self, terminal):
+        """Test that parallel and one-shot commands run beside a busy shell."""
+        await terminal.run_command("cd /tmp && export STATE=kept")
+        busy = asyncio.create_task(terminal.run_command("sleep 3; echo done"))
+        await asyncio.sleep(0.2)
+
+        outputs = await asyncio.wait_for(
+            asyncio.gather(
+                *(terminal.run_parallel(f"cd / && echo {i}") for i in range(3))
+            ),
+            timeout=2,
+        )
+        assert outputs == ["0", "1", "2"]
+        assert await terminal.exec_once(["test", "-d", "/workspace"]) == (0, "")
+        assert (await terminal.exec_once("exit 3"))[0] == 3
+
+        assert await busy == "done"
+        assert await terminal.run_command("pwd; echo $STATE") == "/tmp\nkept"
+
+    @pytest.mark.asyncio
+    async def test_structured_result_and_streaming(self, terminal):
+        """Test exit code, separate stderr, output cap and streamed output."""
+        result = await terminal.execute("echo out; echo err >&2; false")
+        assert (result.exit_code, result.stdout, result.stderr) == (1, "out", "err")
+        assert await terminal.run_command("echo out; echo err >&2") == "out\nerr"
+
+        result = await terminal.execute("yes | head -c 10000000", max_output=1000)
+        assert len(result.stdout) == 1000 and result.stdout_truncated
+
+        chunks = []
+        async with terminal.stream("echo 1; sleep 0.5; echo 2") as stream:
+            async for chunk in stream:
+                chunks.append(chunk)
+        assert "".join(chunks) == "1\n2" and len(chunks) == 2
+        assert stream.result.exit_code == 0
+
+        # Leaving a stream early interrupts the command
+        async with terminal.stream("while true; do echo y; sleep 0.1; done") as stream:
+            async for _ in stream:
+                break
+        assert await terminal.run_command("echo after") == "after"
+
     @pytest.mark.asyncio
     async def test_session_cleanup(self, docker_container):
         """Test proper cleanup of resources."""
@@ -92,6 +150,22 @@ class TestAsyncDockerizedTerminal:
         assert terminal.session is not None
 
 
+def test_line_framer_splits_across_chunks():
+    """Test that lines split over several chunks are reassembled."""
+    framer = _LineFramer()
+    assert framer.feed(b"par") == []
+    assert framer.feed(b"tial\r\nwhole\n\nnext") == [b"partial", b"whole", b""]
+    assert framer.feed(b" line\n") == [b"next line"]
+
+
+def test_line_framer_caps_partial_line():
+    """Test that a line without newline is not buffered past the limit."""
+    framer = _LineFramer(limit=4)
+    assert framer.feed(b"abcdefgh") == []
+    assert framer.overflowed
+    assert framer.feed(b"\nnext\n") == [b"abcd", b"next"]
+
+
 # Configure pytest-asyncio
 def pytest_configure(config):
     """Configure pytest-asyncio."""
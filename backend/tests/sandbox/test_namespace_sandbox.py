@@ -0,0 +1,115 @@
+import pytest
+import pytest_asyncio
+from app.sandbox.core.exceptions import SandboxTimeoutError
+from app.sandbox.core.namespace import NamespaceSandbox, namespace_tool
+from app.sandbox.core.sandbox import SandboxSettings
+
+
+pytestmark = pytest.mark.skipif(
+    namespace_tool() is None, reason="Namespace sandboxes are not supported"
+)
+
+
+@pytest.fixture(scope="module")
+def sandbox_config():
+    """Creates sandbox configuration for testing."""
+    return SandboxSettings(backend="namespace", work_dir="/workspace", timeout=10)
+
+
+@pytest_asyncio.fixture(scope="module")
+async def sandbox(sandbox_config):
+    """Creates and manages a test sandbox instance."""
+    sandbox = NamespaceSandbox(sandbox_config)
+    try:
+        await sandbox.create()
+    except RuntimeError as e:
+        pytest.skip(f"Namespaces unavailable: {e}")
+    try:
+        yield sandbox
+    finally:
+        await sandbox.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_namespace_sandbox_commands(sandbox):
+    """Tests stateful and separate commands in the sandbox."""
+    assert await sandbox.run_command("pwd") == "/workspace"
+    await sandbox.run_command("export GREETING=hello")
+    assert await sandbox.run_command("echo $GREETING") == "hello"
+
+    result = await sandbox.execute("echo out; echo err >&2; (exit 3)")
+    assert (result.exit_code, result.stdout, result.stderr) == (3, "out", "err")
+
+    exit_code, output = await sandbox.exec_once(["hostname"])
+    assert (exit_code, output.strip()) == (0, "sandbox")
+
+
+@pytest.mark.asyncio
+async def test_namespace_sandbox_file_operations(sandbox, tmp_path):
+    """Tests file reads, writes and copies in the sandbox."""
+    await sandbox.write_file("nested/dir/file.txt", "content")
+    assert await sandbox.read_file("/workspace/nested/dir/file.txt") == "content"
+    assert await sandbox.run_command("cat nested/dir/file.txt") == "content"
+
+    results = await sandbox.read_files(["nested/dir/file.txt", "missing.txt"])
+    assert results[0].content == "content"
+    assert "not found" in results[1].error
+    with pytest.raises(FileNotFoundError):
+        await sandbox.read_file("missing.txt")
+
+    await sandbox.copy_from("nested/dir/file.txt", str(tmp_path / "copy.txt"))
+    assert (tmp_path / "copy.txt").read_text() == "content"
+    await sandbox.copy_to(str(tmp_path / "copy.txt"), "copied/file.txt")
+    assert await sandbox.read_file("copied/file.txt") == "content"
+
+
+@pytest.mark.asyncio
+async def test_namespace_sandbox_isolation(sandbox):
+    """Tests that system directories are read-only and processes private."""
+    result = await sandbox.execute("touch /usr/sandbox-test")
+    assert result.exit_code != 0
+    assert "Read-only" in result.stderr
+
+    # Only selected host files are shared in /etc, and accounts are generated
+    assert (await sandbox.execute("touch /etc/sandbox-test")).exit_code != 0
+    users = await sandbox.run_command("cut -d: -f1 /etc/passwd")
+    assert users.split() == ["root", "nobody"]
+
+    # The shells and the init process are the only processes visible
+    processes = await sandbox.run_command("ls /proc | grep -c '^[0-9]'")
+    assert int(processes) < 20
+
+
+@pytest.mark.asyncio
+async def test_namespace_sandbox_timeout(sandbox):
+    """Tests that timed out commands are interrupted."""
+    with pytest.raises(SandboxTimeoutError):
+        await sandbox.execute("sleep 10", timeout=1)
+    assert await sandbox.run_command("echo alive") == "alive"
+
+
+@pytest.mark.asyncio
+async def test_namespace_sandbox_rejects_snapshots(sandbox):
+    """Tests that snapshots fail as documented for the sandbox manager."""
+    with pytest.raises(RuntimeError):
+        await sandbox.snapshot()
+    with pytest.raises(RuntimeError):
+        await sandbox.restore(None)
+
+
+@pytest.mark.asyncio
+async def test_namespace_sandbox_cleanup(sandbox_config):
+    """Tests that cleanup ends the sandbox and removes its files."""
+    import os
+
+    sandbox = await NamespaceSandbox(sandbox_config).create()
+    root = sandbox._root
+    init = sandbox._init
+    await sandbox.cleanup()
+
+    assert init.returncode is not None
+    assert not os.path.exists(root)
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
@@ -1,6 +1,6 @@
 import pytest
 import pytest_asyncio
-from app.sandbox.core.sandbox import DockerSandbox, SandboxSettings
+from app.sandbox.core.sandbox import DockerSandbox, SandboxSettings, SandboxSnapshot
 
 
 @pytest.fixture(scope="module")
@@ -85,6 +85,15 @@ async def test_sandbox_file_persistence(sandbox):
         assert content.strip() == expected_content
 
 
+@pytest.mark.asyncio
+async def test_sandbox_write_creates_parent_directories(sandbox):
+    """Tests that writing a relative path creates its missing directories."""
+    await sandbox.write_file("deep/new/dirs/file.txt", "nested")
+    assert await sandbox.read_file("deep/new/dirs/file.txt") == "nested"
+    result = await sandbox.run_command("cat /workspace/deep/new/dirs/file.txt")
+    assert result.strip() == "nested"
+
+
 @pytest.mark.asyncio
 async def test_sandbox_python_environment(sandbox):
     """Tests Python environment configuration."""
@@ -136,6 +145,32 @@ async def test_sandbox_cleanup(sandbox_config):
     assert not any(c.id == container_id for c in containers)
 
 
+@pytest.mark.asyncio
+async def test_sandbox_offline_install_from_wheelhouse(tmp_path):
+    """Tests that packages install without network from the shared wheelhouse."""
+    requirements = tmp_path / "requirements.txt"
+    requirements.write_text("six==1.16.0\n")
+    config = SandboxSettings(
+        package_cache_dir=str(tmp_path / "wheelhouse"),
+        package_requirements=str(requirements),
+    )
+
+    async with DockerSandbox(config) as sandbox:
+        result = await sandbox.execute("pip install six && python -c 'import six'")
+        assert result.exit_code == 0, result.stderr
+        # The wheelhouse is shared read-only
+        result = await sandbox.execute("touch /opt/wheelhouse/x")
+        assert result.exit_code != 0
+
+    wheels = list((tmp_path / "wheelhouse").glob("six-*.whl"))
+    assert wheels
+    # An unchanged manifest reuses the wheelhouse
+    built_at = wheels[0].stat().st_mtime
+    async with DockerSandbox(config):
+        pass
+    assert wheels[0].stat().st_mtime == built_at
+
+
 @pytest.mark.asyncio
 async def test_sandbox_error_handling():
     """Tests error handling with invalid configuration."""
@@ -147,5 +182,51 @@ async def test_sandbox_error_handling():
         await sandbox.create()
 
 
+class FakeContainer:
+    """Container stand-in recording whether it was removed."""
+
+    def __init__(self, id):
+        self.id = id
+        self.removed = False
+
+    def remove(self, force=False):
+        self.removed = True
+
+
+@pytest.mark.asyncio
+async def test_failed_restore_keeps_old_container(monkeypatch, sandbox_config):
+    """Tests that a restore failing to start its container reverts to the old one."""
+    monkeypatch.setattr("app.sandbox.core.sandbox.get_docker_client", lambda: None)
+    sandbox = DockerSandbox(sandbox_config)
+    old, new = FakeContainer("old"), FakeContainer("new")
+    sandbox.container = old
+    terminals = []
+
+    async def open_terminal():
+        terminals.append(sandbox.container.id)
+        sandbox.terminal = object()
+
+    async def start_container(image):
+        sandbox.container = new
+        raise RuntimeError("start failed")
+
+    monkeypatch.setattr(sandbox, "_open_terminal", open_terminal)
+    monkeypatch.setattr(sandbox, "_start_container", start_container)
+    snapshot = SandboxSnapshot(
+        snapshot_id="s",
+        config=sandbox_config,
+        image="snapshot:latest",
+        workspace_archive="/nonexistent.tar",
+        created_at=0.0,
+    )
+
+    with pytest.raises(RuntimeError, match="start failed"):
+        await sandbox.restore(snapshot)
+
+    assert sandbox.container is old and not old.removed
+    assert new.removed
+    assert terminals == ["old"] and sandbox.terminal is not None
+
+
 if __name__ == "__main__":
     pytest.main(["-v", __file__])
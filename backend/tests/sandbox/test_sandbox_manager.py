@@ -5,6 +5,7 @@ from typing import AsyncGenerator
 
 import pytest
 import pytest_asyncio
+from app.config import SandboxSettings
 from app.sandbox.core.manager import SandboxManager
 
 
@@ -62,7 +63,18 @@ async def test_max_sandboxes_limit(manager):
         # Verify created sandbox count
         assert len(manager._sandboxes) == manager.max_sandboxes
 
-        # Attempting to create additional sandbox should fail
+        # An additional sandbox evicts the least recently used idle one
+        await manager.get_sandbox(created_sandboxes[0])
+        sandbox_id = await manager.create_sandbox()
+        created_sandboxes.append(sandbox_id)
+        assert len(manager._sandboxes) == manager.max_sandboxes
+        assert created_sandboxes[1] not in manager._sandboxes
+        assert created_sandboxes[0] in manager._sandboxes
+        assert manager.get_stats()["evicted_sandboxes"] == 1
+
+        # Sandboxes leased to sessions are never evicted
+        for sandbox_id in list(manager._sandboxes):
+            manager._leases[sandbox_id] = 1
         with pytest.raises(RuntimeError) as exc_info:
             await manager.create_sandbox()
 
@@ -71,6 +83,7 @@ async def test_max_sandboxes_limit(manager):
             f"Maximum number of sandboxes ({manager.max_sandboxes}) reached"
         )
         assert str(exc_info.value) == expected_message
+        manager._leases.clear()
 
     finally:
         # Clean up all created sandboxes
@@ -116,6 +129,55 @@ async def test_idle_sandbox_cleanup(manager):
     assert sandbox_id not in manager._sandboxes
 
 
+@pytest.mark.asyncio
+async def test_leased_sandbox_survives_until_released(manager):
+    """Tests that a sandbox leased by its creator is neither expired nor evicted."""
+    config = SandboxSettings(pool_size=1)
+    sandbox_id = await manager.create_sandbox(config, lease=True)
+
+    manager.idle_timeout = 0.1
+    await asyncio.sleep(0.2)
+    await manager._cleanup_idle_sandboxes()
+    assert sandbox_id in manager._sandboxes
+    # Under pressure the unleased sandbox is evicted instead
+    other_id = await manager.create_sandbox()
+    await manager.create_sandbox()
+    assert sandbox_id in manager._sandboxes
+    assert other_id not in manager._sandboxes
+
+    await manager.release_sandbox(sandbox_id)
+    assert sandbox_id not in manager._sandboxes
+
+
+@pytest.mark.asyncio
+async def test_session_affinity(manager):
+    """Tests that a session keeps its sandbox across runs."""
+    sandbox_id = await manager.acquire_session("client-1")
+    sandbox = await manager.get_sandbox(sandbox_id)
+    await sandbox.run_command("echo 'kept' > /tmp/state")
+    manager.release_session("client-1")
+
+    # The next run of the session finds the sandbox as it was left
+    assert await manager.acquire_session("client-1") == sandbox_id
+    assert (await sandbox.run_command("cat /tmp/state")).strip() == "kept"
+    assert await manager.acquire_session("client-2") != sandbox_id
+
+    # Leased sandboxes survive idle cleanup
+    manager.idle_timeout = 0.1
+    await asyncio.sleep(0.2)
+    await manager._cleanup_idle_sandboxes()
+    assert sandbox_id in manager._sandboxes
+
+    manager.release_session("client-1")
+    await asyncio.sleep(0.2)
+    await manager._cleanup_idle_sandboxes()
+    assert sandbox_id not in manager._sandboxes
+    assert "client-1" not in manager._sessions
+
+    await manager.end_session("client-2")
+    assert not manager._sessions
+
+
 @pytest.mark.asyncio
 async def test_manager_cleanup(manager):
     """Tests manager cleanup functionality."""
@@ -133,5 +195,70 @@ async def test_manager_cleanup(manager):
     assert not manager._last_used
 
 
+@pytest.mark.asyncio
+async def test_pool_checkout_and_recycle(manager):
+    """Tests that pooled sandboxes are checked out warm and reset on release."""
+    config = SandboxSettings(pool_size=2, pool_recycle=True)
+    await manager.warm_pool(config, wait=True)
+    assert manager.get_stats()["pooled_sandboxes"] == 2
+
+    sandbox_id = await manager.create_sandbox(config)
+    assert manager.get_stats()["pool_hits"] == 1
+    sandbox = await manager.get_sandbox(sandbox_id)
+    await sandbox.write_file("leftover.txt", "data")
+
+    await manager.release_sandbox(sandbox_id)
+    assert sandbox_id not in manager._sandboxes
+    stats = manager.get_stats()
+    assert stats["pooled_sandboxes"] == 2
+    assert stats["recycled_sandboxes"] == 1
+
+    # Both pooled sandboxes, including the recycled one, start out clean
+    for _ in range(2):
+        sandbox = await manager.get_sandbox(await manager.create_sandbox(config))
+        assert (await sandbox.run_command("ls -A")).strip() == ""
+
+
+@pytest.mark.asyncio
+async def test_snapshot_restore_and_fork(manager):
+    """Tests rolling back a broken sandbox and forking from a snapshot."""
+    sandbox_id = await manager.create_sandbox()
+    sandbox = await manager.get_sandbox(sandbox_id)
+    await sandbox.write_file("state.txt", "good")
+    await sandbox.run_command("touch /opt/installed")
+
+    snapshot = await manager.snapshot_sandbox(sandbox_id)
+    assert snapshot.image and snapshot.size > 0
+
+    await sandbox.run_command("rm state.txt /opt/installed")
+    assert await manager.restore_sandbox(sandbox_id, snapshot.snapshot_id) > 0
+    assert await sandbox.read_file("state.txt") == "good"
+    assert "installed" in await sandbox.run_command("ls /opt")
+
+    (fork_id,) = await manager.fork_sandbox(snapshot.snapshot_id, 1)
+    fork = await manager.get_sandbox(fork_id)
+    assert await fork.read_file("state.txt") == "good"
+    with pytest.raises(RuntimeError):
+        await manager.fork_sandbox(snapshot.snapshot_id, 1)
+    assert manager.get_stats()["restores"] == 2
+
+
+@pytest.mark.asyncio
+async def test_usage_sampling(manager):
+    """Tests that sandbox resource usage is sampled into percentiles."""
+    sandbox_id = await manager.create_sandbox()
+    sandbox = await manager.get_sandbox(sandbox_id)
+    await manager._sample_usage()
+    await sandbox.run_command("python3 -c 'x = bytearray(50 * 2**20)'")
+    await manager._sample_usage()
+
+    usage = manager.get_usage(sandbox_id)
+    assert usage["samples"] == 1
+    assert usage["memory_p95"] > 0
+    stats = manager.get_stats()
+    assert stats["usage_samples"] == 1
+    assert sandbox_id in stats["usage_by_sandbox"]
+
+
 if __name__ == "__main__":
     pytest.main(["-v", __file__])
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+from app.flow.flow_factory import FlowType
+from app.llm import _usage_handler
+from app.server.batches import BatchJob, BatchManager
+from app.server.runs import RunManager
+from app.server.scheduler import RunScheduler
+
+
+class EchoAgent:
+    """Agent stand-in that asks a question and reports token usage."""
+
+    running = 0
+    max_running = 0
+
+    def set_input_callback(self, callback):
+        self.ask = callback
+
+    async def run(self, prompt):
+        EchoAgent.running += 1
+        EchoAgent.max_running = max(EchoAgent.max_running, EchoAgent.running)
+        try:
+            answer = await self.ask("Which format?")
+            await asyncio.sleep(0.01)
+            _usage_handler.get().on_usage("gpt", len(prompt), 2)
+            return f"{prompt}: {answer[:2]}"
+        finally:
+            EchoAgent.running -= 1
+
+    async def cleanup(self):
+        pass
+
+
+class EchoFlow:
+    """Flow stand-in wrapping the agent's result."""
+
+    def __init__(self, agent):
+        self.agent = agent
+
+    async def execute(self, prompt):
+        return "planned " + await self.agent.run(prompt)
+
+
+@pytest.mark.asyncio
+async def test_batch_runs_jobs_with_bounded_parallelism(monkeypatch, tmp_path):
+    """Tests that batch jobs run unattended, at most `parallelism` at a time."""
+    monkeypatch.setattr("app.server.runs.Manus", EchoAgent)
+    monkeypatch.setattr(
+        "app.server.runs.FlowFactory.create_flow",
+        lambda flow_type, agents: EchoFlow(agents["manus"]),
+    )
+    manager = RunManager(RunScheduler(4, 8, 4), spill_dir=str(tmp_path))
+    batches = BatchManager(manager, parallelism=2)
+
+    jobs = [BatchJob(prompt=f"job {i}") for i in range(5)]
+    jobs.append(BatchJob(prompt="plan", flow=FlowType.PLANNING))
+    batch = batches.submit(jobs)
+    while batch.finished_at is None:
+        await batch.wait(1)
+
+    summary = batch.to_dict()
+    assert summary["status"] == "completed"
+    assert summary["jobs_by_status"]["completed"] == 6
+    assert summary["jobs_per_minute"] > 0
+    assert EchoAgent.max_running <= 2
+
+    results = [batch.job_info(job["job_id"])["result"] for job in summary["jobs"]]
+    assert results[0] == "job 0: No"
+    assert results[-1] == "planned plan: No"
+    with pytest.raises(ValueError):
+        batches.submit([])
+    await manager.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_token_totals_sum_jobs(monkeypatch, tmp_path):
+    """Tests that batch token totals add up the usage of every job."""
+    monkeypatch.setattr("app.server.runs.Manus", EchoAgent)
+    manager = RunManager(RunScheduler(1, 1, 1), spill_dir=str(tmp_path))
+    batch = BatchManager(manager).submit([BatchJob(prompt="a"), BatchJob(prompt="bb")])
+    while batch.finished_at is None:
+        await batch.wait(1)
+
+    summary = batch.to_dict(include_jobs=False)
+    assert summary["tokens"]["by_model"] == {"gpt": {"input": 3, "completion": 4}}
+    assert summary["tokens"]["total"] == 7
+    assert summary["tokens_per_second"] > 0
+    await manager.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_cancel_while_waiting_for_queue_space(monkeypatch, tmp_path):
+    """Tests that a batch cancelled while the queue is full starts no runs."""
+    monkeypatch.setattr("app.server.runs.Manus", EchoAgent)
+    # Without queue space, jobs wait until the batch is cancelled
+    manager = RunManager(RunScheduler(1, 0, 1), spill_dir=str(tmp_path))
+    batches = BatchManager(manager)
+    batch = batches.submit([BatchJob(prompt="a"), BatchJob(prompt="b")])
+    await asyncio.sleep(0.05)
+
+    assert batches.cancel(batch.batch_id)
+    await asyncio.wait_for(batch.task, timeout=5)
+
+    summary = batch.to_dict(include_jobs=False)
+    assert summary["status"] == "cancelled"
+    assert summary["jobs_by_status"]["cancelled"] == 2
+    assert manager.get_stats()["total_runs"] == 0
+    await manager.shutdown()
@@ -0,0 +1,118 @@
+import asyncio
+import json
+
+import pytest
+from app.server.channel import OutputChannel
+from app.server.events import EventLog
+
+
+class FakeWebSocket:
+    """Collects frames sent through the channel."""
+
+    def __init__(self):
+        self.frames = []
+
+    async def send_text(self, text: str) -> None:
+        self.frames.append(text)
+
+
+def log(content: str, low: bool = False) -> dict:
+    event = {"type": "log", "content": content}
+    if low:
+        event["low"] = True
+    return event
+
+
+@pytest.mark.asyncio
+async def test_lines_are_coalesced():
+    """Tests that lines appended together are sent as one frame."""
+    ws = FakeWebSocket()
+    events = EventLog()
+    channel = OutputChannel(ws, events, flush_interval=0.01)
+    task = asyncio.create_task(channel.run())
+
+    for i in range(5):
+        events.append(log(f"line {i}"))
+    events.append({"type": "done"})
+    events.close()
+    await asyncio.wait_for(task, timeout=1)
+
+    assert ws.frames == ["\n".join(f"line {i}" for i in range(5)), "DONE"]
+
+
+@pytest.mark.asyncio
+async def test_control_events_keep_order():
+    """Tests that control events are sent in order, uncoalesced."""
+    ws = FakeWebSocket()
+    events = EventLog()
+    channel = OutputChannel(ws, events)
+
+    events.append(log("before"))
+    events.append({"type": "input_request", "content": "name?"})
+    events.append(log("after"))
+    await channel.flush()
+
+    assert ws.frames == [
+        "before",
+        json.dumps({"type": "input_request", "content": "name?"}),
+        "after",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_lagging_client_skips_low_priority():
+    """Tests that debug lines are skipped when the client is behind."""
+    ws = FakeWebSocket()
+    events = EventLog()
+    channel = OutputChannel(ws, events, max_lag=3)
+
+    events.append(log("debug 1", low=True))
+    events.append(log("info 1"))
+    events.append(log("debug 2", low=True))
+    events.append(log("info 2"))
+    await channel.flush()
+
+    skipped = "… 1 debug lines skipped (client is lagging)"
+    # The first batch is read while 4 events are pending; the second has caught up
+    assert ws.frames == [f"{skipped}\ninfo 1\n{skipped}", "info 2"]
+    assert channel.cursor == 4
+
+
+@pytest.mark.asyncio
+async def test_structured_frames_carry_offsets():
+    """Tests offset-tagged frames and resuming from an offset."""
+    ws = FakeWebSocket()
+    events = EventLog()
+    for i in range(3):
+        events.append(log(f"line {i}"))
+    events.append({"type": "done"})
+
+    channel = OutputChannel(ws, events, offset=1, structured=True)
+    await channel.flush()
+
+    assert [json.loads(frame) for frame in ws.frames] == [
+        {"type": "log", "offset": 2, "content": "line 1\nline 2"},
+        {"type": "done", "offset": 3},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_tokens_are_merged_in_structured_mode_only():
+    """Tests that streamed tokens are merged per frame and hidden from text clients."""
+    events = EventLog()
+    events.append({"type": "token", "content": "Hel"})
+    events.append({"type": "token", "content": "lo"})
+    events.append({"type": "token_end"})
+    events.append(log("thoughts: Hello"))
+
+    ws = FakeWebSocket()
+    await OutputChannel(ws, events, structured=True).flush()
+    assert [json.loads(frame) for frame in ws.frames] == [
+        {"type": "token", "offset": 1, "content": "Hello"},
+        {"type": "token_end", "offset": 2},
+        {"type": "log", "offset": 3, "content": "thoughts: Hello"},
+    ]
+
+    ws = FakeWebSocket()
+    await OutputChannel(ws, events).flush()
+    assert ws.frames == ["thoughts: Hello"]
@@ -0,0 +1,52 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from app.server.events import EventLog
+
+
+@pytest.mark.asyncio
+async def test_append_and_read():
+    """Tests offset addressing of appended events."""
+    log = EventLog()
+    assert log.append({"n": 0}) == 0
+    assert log.append({"n": 1}) == 1
+
+    assert log.read(0) == [{"n": 0}, {"n": 1}]
+    assert log.read(1) == [{"n": 1}]
+    assert log.read(2) == []
+    assert log.next_offset == 2
+
+
+@pytest.mark.asyncio
+async def test_spilled_events_are_replayable(tmp_path: Path):
+    """Tests that events spilled to disk are read back transparently."""
+    spill_path = tmp_path / "run.jsonl"
+    log = EventLog(spill_path, max_memory_events=4)
+    for n in range(10):
+        log.append({"n": n})
+
+    assert spill_path.exists()
+    assert len(log._memory) <= 4
+    assert [e["n"] for e in log.read(0)] == list(range(10))
+    assert [e["n"] for e in log.read(3, limit=4)] == [3, 4, 5, 6]
+
+    log.delete()
+    assert not spill_path.exists()
+
+
+@pytest.mark.asyncio
+async def test_wait_for_new_events():
+    """Tests that readers wake up on append and on close."""
+    log = EventLog()
+    waiter = asyncio.create_task(log.wait(0))
+    await asyncio.sleep(0)
+    assert not waiter.done()
+
+    log.append({"n": 0})
+    assert await asyncio.wait_for(waiter, timeout=1)
+
+    waiter = asyncio.create_task(log.wait(1))
+    await asyncio.sleep(0)
+    log.close()
+    assert not await asyncio.wait_for(waiter, timeout=1)
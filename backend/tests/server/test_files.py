@@ -0,0 +1,64 @@
+import io
+import os
+import zipfile
+from pathlib import Path
+
+from app.server.files import WorkspaceIndex, file_etag, http_date, not_modified
+
+
+def test_index_tracks_directory_changes(tmp_path: Path):
+    """Tests that the listing is rebuilt when files are added or removed."""
+    (tmp_path / "b.txt").write_text("b")
+    (tmp_path / ".hidden").write_text("h")
+    (tmp_path / "sub").mkdir()
+    index = WorkspaceIndex(tmp_path)
+    assert index.names() == ["b.txt"]
+
+    (tmp_path / "a.pptx").write_text("a")
+    os.utime(tmp_path, ns=(0, os.stat(tmp_path).st_mtime_ns + 1))
+    assert index.names() == ["a.pptx", "b.txt"]
+    assert index.stat("../etc/passwd") is None
+
+
+def test_list_pages_and_filters(tmp_path: Path):
+    """Tests pagination, glob filtering and entry metadata."""
+    for i in range(5):
+        (tmp_path / f"slide{i}.pptx").write_bytes(b"x" * i)
+    (tmp_path / "notes.md").write_text("notes")
+    index = WorkspaceIndex(tmp_path)
+
+    total, entries = index.list(offset=1, limit=2, pattern="*.PPTX")
+    assert total == 5
+    assert [(e["name"], e["size"]) for e in entries] == [
+        ("slide1.pptx", 1),
+        ("slide2.pptx", 2),
+    ]
+
+
+def test_zip_stream(tmp_path: Path):
+    """Tests that the streamed archive contains the requested files."""
+    (tmp_path / "a.txt").write_text("alpha")
+    (tmp_path / "b.txt").write_text("beta")
+    index = WorkspaceIndex(tmp_path)
+
+    data = b"".join(index.iter_zip(["a.txt", "b.txt"], chunk_size=2))
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.read("a.txt") == b"alpha"
+        assert zf.read("b.txt") == b"beta"
+
+
+def test_conditional_headers(tmp_path: Path):
+    """Tests ETag and Last-Modified revalidation."""
+    path = tmp_path / "a.txt"
+    path.write_text("alpha")
+    st = os.stat(path)
+    etag = file_etag(st)
+
+    assert not_modified({"if-none-match": f'W/{etag}, "other"'}, etag, st.st_mtime)
+    assert not not_modified({"if-none-match": '"other"'}, etag, st.st_mtime)
+    since = http_date(st.st_mtime)
+    assert not_modified({"if-modified-since": since}, etag, st.st_mtime)
+    assert not not_modified(
+        {"if-modified-since": http_date(st.st_mtime - 10)}, etag, st.st_mtime
+    )
+    assert not not_modified({}, etag, st.st_mtime)
@@ -0,0 +1,158 @@
+import asyncio
+import socket
+import subprocess
+from contextlib import contextmanager
+
+import pytest
+from app.cancellation import guard
+from app.server.events import EventLog
+from app.server.runs import Run, RunManager, RunStatus
+from app.server.scheduler import RunScheduler
+from app.server.store import SQLiteRunStore
+
+
+@pytest.mark.asyncio
+async def test_tokens_are_batched():
+    """Tests that streamed tokens are appended as one event after the interval."""
+    run = Run("run", "prompt", "client", EventLog(), token_flush_interval=0.01)
+    for text in ("a", "b", "c"):
+        run.on_token(text)
+    assert run.events.next_offset == 0
+
+    await asyncio.sleep(0.05)
+    assert run.events.read(0) == [{"type": "token", "content": "abc"}]
+
+
+@pytest.mark.asyncio
+async def test_tokens_flush_before_other_events():
+    """Tests that pending tokens keep their order relative to other output."""
+    run = Run("run", "prompt", "client", EventLog(), token_flush_interval=10)
+    run.on_token("Hel")
+    run.on_token("lo")
+    run.on_stream_end()
+    run.put("done thinking")
+    run.on_stream_end()  # Nothing streamed since the last end
+    run.on_token("Hel")
+    run.on_stream_end(discarded=True)
+
+    assert run.events.read(0) == [
+        {"type": "token", "content": "Hello"},
+        {"type": "token_end"},
+        {"type": "log", "content": "done thinking"},
+        {"type": "token", "content": "Hel"},
+        {"type": "token_end", "discarded": True},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_run_state_is_written_to_store(tmp_path):
+    """Tests that events and token usage reach the shared store."""
+    store = SQLiteRunStore(str(tmp_path / "runs.sqlite3"))
+    run = Run("run", "prompt", "client", EventLog(), store=store)
+    run.save()
+    run.put("hello")
+    run.on_usage("gpt-4o", 10, 2)
+    store.flush()
+
+    info = store.get_run("run")
+    assert info["prompt"] == "prompt"
+    assert info["tokens"] == {"gpt-4o": {"input": 10, "completion": 2}}
+    assert store.read_events("run", 0) == [{"type": "log", "content": "hello"}]
+    store.close()
+
+
+@pytest.mark.asyncio
+async def test_runs_of_stopped_workers_are_failed(tmp_path):
+    """Tests that unfinished runs of a dead worker are failed on startup."""
+    store = SQLiteRunStore(str(tmp_path / "runs.sqlite3"))
+    live = Run("live", "prompt", "client", EventLog(), store=store)
+    live.save()
+    orphan = Run("orphan", "prompt", "client", EventLog(), store=store)
+    orphan.put("hello")
+    stopped = subprocess.Popen(["true"])
+    stopped.wait()
+    worker_id = f"{socket.gethostname()}:{stopped.pid}"
+    store.save_run({**orphan.to_dict(), "worker_id": worker_id})
+    store.flush()
+
+    assert await RunManager(RunScheduler(1), store=store).fail_orphaned() == 1
+    store.flush()
+
+    info = store.get_run("orphan")
+    assert info["status"] == RunStatus.FAILED.value
+    assert info["finished_at"] is not None
+    assert store.read_events("orphan", 1)[0]["type"] == "error"
+    assert store.get_run("live")["status"] == RunStatus.QUEUED.value
+    store.close()
+
+
+class SlowAgent:
+    """Agent stand-in whose single step never finishes by itself."""
+
+    def set_input_callback(self, callback):
+        pass
+
+    async def run(self, prompt):
+        await guard(asyncio.sleep(10))
+
+    async def cleanup(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_cancel_releases_running_run(monkeypatch, tmp_path):
+    """Tests that a cancelled run stops promptly and reports its release time."""
+    monkeypatch.setattr("app.server.runs.Manus", SlowAgent)
+    manager = RunManager(RunScheduler(1, 1, 1), spill_dir=str(tmp_path))
+    run = manager.start("prompt", "client")
+    while run.status != RunStatus.RUNNING:
+        await asyncio.sleep(0.01)
+
+    assert manager.cancel(run.run_id)
+    assert not manager.cancel(run.run_id)
+    await asyncio.wait_for(run.task, timeout=1)
+
+    assert run.status == RunStatus.CANCELLED
+    assert run.release_seconds < 1
+    assert run.events.read(0)[-1]["type"] == "cancelled"
+    await manager.shutdown()
+
+
+class EndingClient:
+    """Sandbox client stand-in recording whether its session was ended."""
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.ended = False
+
+    async def end_session(self):
+        self.ended = True
+
+
+@pytest.mark.asyncio
+async def test_runs_share_sandbox_only_by_explicit_session(monkeypatch, tmp_path):
+    """Tests that sandboxes are keyed on client-supplied sessions, not clients."""
+    clients = []
+
+    @contextmanager
+    def sandbox_session(session_id):
+        clients.append(EndingClient(session_id))
+        yield clients[-1]
+
+    monkeypatch.setattr("app.server.runs.Manus", SlowAgent)
+    monkeypatch.setattr("app.server.runs.sandbox_session", sandbox_session)
+    manager = RunManager(RunScheduler(4, 4, 4), spill_dir=str(tmp_path))
+    first = manager.start("prompt", "client", session_id="session")
+    busy = manager.start("prompt", "client", session_id="session")
+    anonymous = manager.start("prompt", "client")
+    while len(clients) < 3:
+        await asyncio.sleep(0.01)
+    for run in (first, busy, anonymous):
+        manager.cancel(run.run_id)
+        await asyncio.wait_for(run.task, timeout=1)
+
+    sessions = {client.session_id: client.ended for client in clients}
+    # The session is kept for later runs; a concurrent run of it and a run
+    # without session use sandboxes of their own, removed at their end
+    assert sessions == {"session": False, busy.run_id: True, anonymous.run_id: True}
+    await manager.shutdown()
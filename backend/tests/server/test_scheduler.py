@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+from app.exceptions import RunRejected
+from app.server.scheduler import RunScheduler
+
+
+@pytest.mark.asyncio
+async def test_admits_up_to_limit():
+    """Tests that runs are admitted immediately while slots are free."""
+    scheduler = RunScheduler(max_concurrent_runs=2, max_queue_size=2)
+
+    assert await scheduler.acquire("a") == 0.0
+    assert await scheduler.acquire("b") == 0.0
+    assert scheduler.active_runs == 2
+    assert scheduler.queued_runs == 0
+
+
+@pytest.mark.asyncio
+async def test_overflow_is_rejected():
+    """Tests fast rejection when the queue is full."""
+    scheduler = RunScheduler(max_concurrent_runs=1, max_queue_size=1)
+    await scheduler.acquire("a")
+    waiter = asyncio.create_task(scheduler.acquire("b"))
+    await asyncio.sleep(0)
+
+    with pytest.raises(RunRejected):
+        await scheduler.acquire("c")
+    assert scheduler.get_stats()["rejected_runs"] == 1
+
+    scheduler.release()
+    await waiter
+    assert scheduler.active_runs == 1
+
+
+@pytest.mark.asyncio
+async def test_round_robin_between_clients():
+    """Tests that waiting clients are served round-robin."""
+    scheduler = RunScheduler(
+        max_concurrent_runs=1, max_queue_size=10, max_queued_per_client=10
+    )
+    await scheduler.acquire("busy")
+
+    order = []
+
+    async def run(client_id: str):
+        async with scheduler.slot(client_id):
+            order.append(client_id)
+
+    tasks = [asyncio.create_task(run(c)) for c in ("a", "a", "a", "b")]
+    await asyncio.sleep(0)
+    scheduler.release()
+    await asyncio.gather(*tasks)
+
+    assert order == ["a", "b", "a", "a"]
+
+
+@pytest.mark.asyncio
+async def test_position_updates_and_cancellation():
+    """Tests queue position updates and removal of cancelled waiters."""
+    scheduler = RunScheduler(max_concurrent_runs=1, max_queue_size=10)
+    await scheduler.acquire("busy")
+
+    positions = []
+
+    async def on_position(position: int):
+        positions.append(position)
+
+    first = asyncio.create_task(scheduler.acquire("a"))
+    second = asyncio.create_task(scheduler.acquire("b", on_position=on_position))
+    await asyncio.sleep(0)
+    assert positions == [2]
+
+    first.cancel()
+    await asyncio.gather(first, return_exceptions=True)
+    await asyncio.sleep(0)
+    assert positions == [2, 1]
+    assert scheduler.queued_runs == 1
+
+    scheduler.release()
+    await second
+    assert scheduler.active_runs == 1
+    assert scheduler.queued_runs == 0
@@ -0,0 +1,48 @@
+from pathlib import Path
+
+from app.server.store import SQLiteRunStore
+
+
+def test_run_state_round_trip(tmp_path: Path):
+    """Tests that a second connection sees metadata, events and tokens."""
+    writer = SQLiteRunStore(str(tmp_path / "runs.sqlite3"))
+    writer.save_run({"run_id": "r1", "status": "running", "finished_at": None})
+    for offset in range(3):
+        writer.append_event("r1", offset, {"type": "log", "content": str(offset)})
+    writer.add_tokens("r1", "gpt-4o", 100, 10)
+    writer.add_tokens("r1", "gpt-4o", 50, 5)
+    writer.save_artifacts("r1", [{"name": "deck.pptx", "size": 3, "mtime": 1.0}])
+    writer.flush()
+
+    reader = SQLiteRunStore(str(tmp_path / "runs.sqlite3"))
+    run = reader.get_run("r1")
+    assert run["status"] == "running"
+    assert run["next_offset"] == 3
+    assert run["tokens"] == {"gpt-4o": {"input": 150, "completion": 15}}
+    assert [e["content"] for e in reader.read_events("r1", 1, limit=1)] == ["1"]
+    assert reader.list_artifacts("r1") == [
+        {"name": "deck.pptx", "size": 3, "mtime": 1.0}
+    ]
+    assert reader.get_run("unknown") is None
+
+    writer.close()
+    reader.close()
+
+
+def test_expired_runs_are_deleted(tmp_path: Path):
+    """Tests that only runs finished before the cutoff are removed."""
+    store = SQLiteRunStore(str(tmp_path / "runs.sqlite3"))
+    store.save_run({"run_id": "old", "finished_at": 10.0})
+    store.append_event("old", 0, {"type": "done"})
+    store.save_run({"run_id": "new", "finished_at": 30.0})
+    store.save_run({"run_id": "running", "finished_at": None})
+
+    store.delete_expired(20.0)
+    store.flush()
+
+    assert store.get_run("old") is None
+    assert store.read_events("old", 0) == []
+    assert store.get_run("new") is not None
+    assert store.get_run("running") is not None
+    assert [run["run_id"] for run in store.list_unfinished()] == ["running"]
+    store.close()
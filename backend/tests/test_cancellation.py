@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+from app.cancellation import CancellationToken, cancellation_scope, guard
+from app.exceptions import RunCancelled
+
+
+@pytest.mark.asyncio
+async def test_guard_interrupts_awaitable():
+    """Tests that cancelling the token interrupts and unwinds a guarded call."""
+    token = CancellationToken()
+    released = asyncio.Event()
+
+    async def slow_call():
+        try:
+            await asyncio.sleep(10)
+        finally:
+            released.set()
+
+    async def cancel_soon():
+        await asyncio.sleep(0.01)
+        token.cancel("stop")
+
+    asyncio.create_task(cancel_soon())
+    with cancellation_scope(token):
+        with pytest.raises(RunCancelled, match="stop"):
+            await asyncio.wait_for(guard(slow_call()), timeout=1)
+    assert released.is_set()
+
+
+@pytest.mark.asyncio
+async def test_guard_passes_results_through():
+    """Tests guarded calls without cancellation and without a token."""
+
+    async def value():
+        return 42
+
+    with cancellation_scope(CancellationToken()):
+        assert await guard(value()) == 42
+    assert await guard(value()) == 42
+
+
+@pytest.mark.asyncio
+async def test_cancelled_token_rejects_new_calls():
+    """Tests that no new work starts once the token is cancelled."""
+    token = CancellationToken()
+    token.cancel()
+    with pytest.raises(RunCancelled):
+        token.raise_if_cancelled()
+    with pytest.raises(RunCancelled):
+        await token.guard(asyncio.sleep(10))
@@ -0,0 +1,55 @@
+import pytest
+from app.exceptions import ToolError
+from app.tool.file_operators import LocalFileOperator
+from app.tool.str_replace_editor import StrReplaceEditor
+
+
+class CountingOperator(LocalFileOperator):
+    """Local operator counting status lookups."""
+
+    def __init__(self):
+        self.stat_calls = 0
+
+    async def stat_files(self, paths):
+        self.stat_calls += 1
+        return await super().stat_files(paths)
+
+
+@pytest.mark.asyncio
+async def test_stat_files(tmp_path):
+    """Tests that one call reports every path in order."""
+    (tmp_path / "file.txt").write_text("hello")
+    operator = LocalFileOperator()
+
+    file, directory, missing = await operator.stat_files(
+        [tmp_path / "file.txt", tmp_path, tmp_path / "missing"]
+    )
+
+    assert file.exists and not file.is_dir and file.size == 5 and file.mtime > 0
+    assert directory.exists and directory.is_dir
+    assert not missing.exists
+    assert missing.path == str(tmp_path / "missing")
+
+
+@pytest.mark.asyncio
+async def test_editor_stats_once_per_command(tmp_path, monkeypatch):
+    """Tests that validating and viewing a path share one status lookup."""
+    operator = CountingOperator()
+    monkeypatch.setattr(StrReplaceEditor, "_get_operator", lambda self: operator)
+    editor = StrReplaceEditor()
+    path = str(tmp_path / "file.txt")
+
+    await editor.execute(command="create", path=path, file_text="a\nb\n")
+    assert operator.stat_calls == 1
+
+    result = await editor.execute(command="view", path=path)
+    assert "a" in result
+    assert operator.stat_calls == 2
+
+    await editor.execute(command="str_replace", path=path, old_str="b", new_str="c")
+    assert operator.stat_calls == 3
+
+    # Each command looks the path up again, as other tools may change it
+    with pytest.raises(ToolError, match="already exists"):
+        await editor.execute(command="create", path=path, file_text="")
+    assert operator.stat_calls == 4
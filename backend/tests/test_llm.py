@@ -0,0 +1,243 @@
+import httpx
+import pytest
+from app.config import LLMSettings
+from app.llm import LLM, stream_tokens
+from openai import APIConnectionError, BadRequestError
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+from tenacity import wait_none
+
+
+class FakeTokenizer:
+    """Tokenizer stand-in counting whitespace-separated words."""
+
+    def encode(self, text):
+        return text.split()
+
+
+class FakeCompletions:
+    """Chat completions stand-in replaying prepared responses in order."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    async def create(self, **params):
+        self.requests.append(params)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        if isinstance(response, list):
+            return _stream(response)
+        return response
+
+
+async def _stream(chunks):
+    for chunk in chunks:
+        if isinstance(chunk, Exception):
+            raise chunk
+        yield chunk
+
+
+class TokenRecorder:
+    """Token stream handler recording what it receives."""
+
+    def __init__(self):
+        self.tokens = []
+        self.ends = []
+
+    def on_token(self, text):
+        self.tokens.append(text)
+
+    def on_stream_end(self, discarded=False):
+        self.ends.append(discarded)
+
+
+def chunk(delta=None, usage=None):
+    return ChatCompletionChunk.model_validate(
+        {
+            "id": "chunk",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": "gpt-4o",
+            "choices": [] if delta is None else [{"index": 0, "delta": delta}],
+            "usage": usage,
+        }
+    )
+
+
+def completion(content):
+    return ChatCompletion.model_validate(
+        {
+            "id": "completion",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "gpt-4o",
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": content},
+                }
+            ],
+            "usage": {"prompt_tokens": 7, "completion_tokens": 2, "total_tokens": 9},
+        }
+    )
+
+
+REQUEST = httpx.Request("POST", "http://localhost/chat/completions")
+
+
+def bad_request():
+    return BadRequestError(
+        "stream_options is not supported",
+        response=httpx.Response(400, request=REQUEST),
+        body=None,
+    )
+
+
+@pytest.fixture
+def make_llm(monkeypatch):
+    """Creates LLM clients that do not load tokenizer files or reach an API."""
+    monkeypatch.setattr("tiktoken.encoding_for_model", lambda model: FakeTokenizer())
+    monkeypatch.setattr(LLM, "_instances", {})
+    monkeypatch.setattr(LLM.ask_tool.retry, "wait", wait_none())
+
+    def make(completions, api_type=""):
+        settings = LLMSettings(
+            model="gpt-4o",
+            base_url="http://localhost",
+            api_key="key",
+            api_type=api_type,
+            api_version="",
+        )
+        llm = LLM("default", {"default": settings})
+        llm.client.chat.completions = completions
+        return llm
+
+    return make
+
+
+@pytest.mark.asyncio
+async def test_rejected_tool_stream_falls_back_to_plain_request(make_llm):
+    """Tests that a rejected streaming request is sent again without streaming."""
+    completions = FakeCompletions(bad_request(), completion("hi"), completion("again"))
+    llm = make_llm(completions, api_type="azure")
+
+    with stream_tokens(TokenRecorder()):
+        assert (await llm.ask_tool([{"role": "user", "content": "hi"}])).content == "hi"
+        await llm.ask_tool([{"role": "user", "content": "hi"}])
+
+    first, fallback, later = completions.requests
+    assert first["stream"] and "stream_options" not in first
+    assert not fallback["stream"] and not later["stream"]
+    assert not llm.stream_tools
+
+
+@pytest.mark.asyncio
+async def test_broken_tool_stream_is_discarded_before_retry(make_llm):
+    """Tests that text streamed before a failure is marked void, then resent."""
+    completions = FakeCompletions(
+        [chunk({"content": "Hel"}), APIConnectionError(request=REQUEST)],
+        [chunk({"content": "Hello"})],
+    )
+    llm = make_llm(completions)
+    recorder = TokenRecorder()
+
+    with stream_tokens(recorder):
+        message = await llm.ask_tool([{"role": "user", "content": "hi"}])
+
+    assert message.content == "Hello"
+    assert recorder.tokens == ["Hel", "Hello"]
+    assert recorder.ends == [True, False]
+
+
+@pytest.mark.asyncio
+async def test_tool_stream_is_reassembled(make_llm):
+    """Tests that tool call deltas split across chunks rebuild the message."""
+    completions = FakeCompletions(
+        [
+            chunk({"role": "assistant", "content": "Let me "}),
+            chunk({"content": "check."}),
+            chunk(
+                {
+                    "tool_calls": [
+                        {"index": 0, "id": "call_a", "function": {"name": "web_"}}
+                    ]
+                }
+            ),
+            chunk(
+                {
+                    "tool_calls": [
+                        {"index": 0, "function": {"name": "search", "arguments": '{"q'}}
+                    ]
+                }
+            ),
+            chunk(
+                {
+                    "tool_calls": [
+                        {
+                            "index": 1,
+                            "id": "call_b",
+                            "function": {"name": "terminate", "arguments": "{}"},
+                        },
+                        {"index": 0, "function": {"arguments": '": "x"}'}},
+                    ]
+                }
+            ),
+            chunk(
+                usage={"prompt_tokens": 12, "completion_tokens": 5, "total_tokens": 17}
+            ),
+        ]
+    )
+    llm = make_llm(completions)
+    recorder = TokenRecorder()
+
+    with stream_tokens(recorder):
+        message = await llm.ask_tool([{"role": "user", "content": "hi"}])
+
+    assert completions.requests[0]["stream_options"] == {"include_usage": True}
+    assert message.content == "Let me check."
+    assert [call.model_dump() for call in message.tool_calls] == [
+        {
+            "id": "call_a",
+            "type": "function",
+            "function": {"name": "web_search", "arguments": '{"q": "x"}'},
+        },
+        {
+            "id": "call_b",
+            "type": "function",
+            "function": {"name": "terminate", "arguments": "{}"},
+        },
+    ]
+    assert recorder.tokens == ["Let me ", "check."]
+    assert recorder.ends == [False]
+    assert (llm.total_input_tokens, llm.total_completion_tokens) == (12, 5)
+
+
+@pytest.mark.asyncio
+async def test_tool_stream_without_usage_estimates_tokens(make_llm):
+    """Tests that token counts are estimated if the stream reports no usage."""
+    completions = FakeCompletions(
+        [
+            chunk(
+                {
+                    "tool_calls": [
+                        {
+                            "index": 0,
+                            "id": "call_a",
+                            "function": {"name": "bash", "arguments": "one two"},
+                        }
+                    ]
+                }
+            )
+        ]
+    )
+    llm = make_llm(completions, api_type="ollama")
+
+    with stream_tokens(TokenRecorder()):
+        message = await llm.ask_tool([{"role": "user", "content": "hi"}])
+
+    assert "stream_options" not in completions.requests[0]
+    assert message.content is None
+    assert message.tool_calls[0].function.arguments == "one two"
+    assert llm.total_completion_tokens == 2
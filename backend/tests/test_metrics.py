@@ -0,0 +1,49 @@
+from app.metrics import MetricsRegistry, track_duration
+
+
+def test_counter_and_gauge_rendering():
+    """Tests the text exposition of labelled counters and gauges."""
+    registry = MetricsRegistry()
+    tokens = registry.counter("tokens_total", "Tokens used", labels=("model",))
+    tokens.inc(3, model="gpt-4o")
+    tokens.inc(2, model="gpt-4o")
+    sessions = registry.gauge("sessions", "Open sessions")
+    registry.add_collector(lambda: sessions.set(7))
+
+    assert registry.render().splitlines() == [
+        "# HELP sessions Open sessions",
+        "# TYPE sessions gauge",
+        "sessions 7",
+        "# HELP tokens_total Tokens used",
+        "# TYPE tokens_total counter",
+        'tokens_total{model="gpt-4o"} 5',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    """Tests histogram bucket, sum and count samples."""
+    registry = MetricsRegistry()
+    duration = registry.histogram(
+        "duration_seconds", "Durations", labels=("tool",), buckets=(0.1, 1.0)
+    )
+    for value in (0.05, 0.5, 5.0):
+        duration.observe(value, tool="bash")
+
+    lines = registry.render().splitlines()[2:]
+    assert lines == [
+        'duration_seconds_bucket{tool="bash",le="0.1"} 1',
+        'duration_seconds_bucket{tool="bash",le="1"} 2',
+        'duration_seconds_bucket{tool="bash",le="+Inf"} 3',
+        'duration_seconds_sum{tool="bash"} 5.55',
+        'duration_seconds_count{tool="bash"} 3',
+    ]
+
+
+def test_track_duration_records_updated_labels():
+    """Tests that labels changed inside the block are used."""
+    registry = MetricsRegistry()
+    duration = registry.histogram("op_seconds", "Durations", labels=("status",))
+    with track_duration(duration, status="error") as labels:
+        labels["status"] = "ok"
+
+    assert 'op_seconds_count{status="ok"} 1' in registry.render()
@@ -0,0 +1,56 @@
+import pytest
+from app.tool.python_workers import PythonWorkerPool
+
+
+@pytest.fixture
+def pool():
+    pool = PythonWorkerPool(size=1, max_runs=3, preload_modules=["json", "missing"])
+    yield pool
+    pool.close()
+
+
+async def _pid(pool: PythonWorkerPool) -> str:
+    result = await pool.run("import os; print(os.getpid())", timeout=10)
+    return result["observation"].strip()
+
+
+@pytest.mark.asyncio
+async def test_run_reuses_warm_worker(pool):
+    """Tests that runs share a worker but not their globals."""
+    assert await _pid(pool) == await _pid(pool)
+    await pool.run("x = 1", timeout=10)
+    result = await pool.run("print(x)", timeout=10)
+    assert not result["success"]
+    assert "not defined" in result["observation"]
+
+
+@pytest.mark.asyncio
+async def test_worker_recycled_after_max_runs(pool):
+    """Tests that a worker is replaced once it reached ``max_runs``."""
+    pids = [await _pid(pool) for _ in range(4)]
+    assert len(set(pids[:3])) == 1
+    assert pids[3] != pids[0]
+
+
+@pytest.mark.asyncio
+async def test_timeout_kills_worker(pool):
+    """Tests that a timed out run's worker is killed and replaced."""
+    before = await _pid(pool)
+    result = await pool.run("while True: pass", timeout=0.5)
+    assert result == {
+        "observation": "Execution timeout after 0.5 seconds",
+        "success": False,
+    }
+    assert await _pid(pool) != before
+
+
+@pytest.mark.asyncio
+async def test_exiting_code_and_preload(pool):
+    """Tests code ending its worker, and that preload failures are skipped."""
+    result = await pool.run("import sys; sys.exit(3)", timeout=10)
+    assert result == {
+        "observation": "Execution process exited with code 3",
+        "success": False,
+    }
+    result = await pool.run("import sys; print('json' in sys.modules)", timeout=10)
+    assert result["observation"] == "True\n"